@@ -3,187 +3,276 @@
 '''
 HBTWN v. 0.05
 Project with application which allow to calculate telescope size which is needed to achieve expected angular resolution.
+Command line application:
+python HBTWN.py telescope-size --size 139822 km --distance 600000000 km [--shape spherical] [--pixels 100] [--wavelength 522 nm] [--unit mm]
+python HBTWN.py object-size --distance 364397 km (--resolution 1 arcsec | --telescope 8 inch) [--unit m]
+python HBTWN.py resolution --telescope 8 inch [--wavelength 522 nm] [--unit arcsec]
+python HBTWN.py examples / python HBTWN.py gui / python HBTWN.py serve (one query per line on standard input, one result line on standard output)
+Single value queries use pure Python ScalarMathModule (NumPy is not imported), options with many values (ex. --size 1 2 3 km) use
+vectorized batch functions of CoreNumericalModule which are imported only then. PyQt5 is imported only by gui command.
 HBTWN  Copyright (C) 2021  Jan Bielański
 '''
-print("------------------------------------------------------------------------------------------------------------")
-print("                                             HBTWN v. 0.05                                                  ")
-print("Application allow to calculate telescope size which is needed to achieve expected angular resolution.       ")
-print("                              HBTWN  Copyright (C) 2021  Jan Bielański                                      ")
-print("------------------------------------------------------------------------------------------------------------")
-print("")
-
 # 3-RD party dependency
-import numpy as np
-from enum import Enum
+import argparse
+import json
+import shlex
+import sys
 
 # Project modules
-import modules.UnitsConstantsModule as HBTWN_UCM
-import modules.CoreNumericalModule as HBTWN_CNM
-
-
-# JUPITER
-obj_name = "Jupiter"
-obj_size = [ 2*69911.0, 'km' ]
-obj_dist = [ 600000000.0, 'km' ]
-obj_dist_au = HBTWN_UCM.dist_units_converter(obj_dist[0], obj_dist[1], 'au')
-obj_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-number_of_pixels = 100
-wavelength = [522.0, 'nm']
-telescope_size_unit = 'mm'
-
-print(str(obj_name) + " diameter: " + str(obj_size[0]) + " " + str(obj_size[1]))
-print(str(obj_name) + " distance: " + str(obj_dist[0]) + " " + str(obj_dist[1]) + " / " + str(obj_dist_au[0]) + " " + str(obj_dist_au[1]))
-print("Expected size on image: " + str(number_of_pixels) + " pixels")
-print("Light wavelength: " + str(wavelength[0]) + str(wavelength[1]))
-telescope_size, object_size = HBTWN_CNM.calculate_telescope_size(obj_size, obj_dist, obj_dist, number_of_pixels, wavelength, telescope_size_unit)
-print("Mirror/lens size in telescope: " + str(telescope_size[0]) + " " + str(telescope_size[1]) + ", object size on sky: " + str(object_size[0]) + " " + str(object_size[1]))
-
-print("")
-print("-----------------------------------------------------------------------------")
-print("")
-
-# EARTH from 1 au
-obj_name = "Earth"
-obj_size = [ 2*6371.0, 'km' ]
-obj_dist = [ 1.0, 'au' ]
-obj_dist_au = HBTWN_UCM.dist_units_converter(obj_dist[0], obj_dist[1], 'au')
-obj_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-number_of_pixels = 100
-wavelength = [522.0, 'nm']
-telescope_size_unit = 'mm'
-
-print(str(obj_name) + " diameter: " + str(obj_size[0]) + " " + str(obj_size[1]))
-print(str(obj_name) + " distance: " + str(obj_dist[0]) + " " + str(obj_dist[1]) + " / " + str(obj_dist_au[0]) + " " + str(obj_dist_au[1]))
-print("Expected size on image: " + str(number_of_pixels) + " pixels")
-print("Light wavelength: " + str(wavelength[0]) + str(wavelength[1]))
-telescope_size, object_size = HBTWN_CNM.calculate_telescope_size(obj_size, obj_dist, obj_dist, number_of_pixels, wavelength, telescope_size_unit)
-print("Mirror/lens size in telescope: " + str(telescope_size[0]) + " " + str(telescope_size[1]) + ", object size on sky: " + str(object_size[0]) + " " + str(object_size[1]))
-
-print("")
-print("-----------------------------------------------------------------------------")
-print("")
-
-# EARTH from 1 ly
-obj_name = "Earth"
-obj_size = [ 2*6371.0, 'km' ]
-obj_dist = [ 1.0, 'ly' ]
-obj_dist_au = HBTWN_UCM.dist_units_converter(obj_dist[0], obj_dist[1], 'au')
-obj_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-number_of_pixels = 100
-wavelength = [522.0, 'nm']
-telescope_size_unit = 'km'
-
-print(str(obj_name) + " diameter: " + str(obj_size[0]) + " " + str(obj_size[1]))
-print(str(obj_name) + " distance: " + str(obj_dist[0]) + " " + str(obj_dist[1]) + " / " + str(obj_dist_au[0]) + " " + str(obj_dist_au[1]))
-print("Expected size on image: " + str(number_of_pixels) + " pixels")
-print("Light wavelength: " + str(wavelength[0]) + str(wavelength[1]))
-telescope_size, object_size = HBTWN_CNM.calculate_telescope_size(obj_size, obj_dist, obj_dist, number_of_pixels, wavelength, telescope_size_unit)
-print("Mirror/lens size in telescope: " + str(telescope_size[0]) + " " + str(telescope_size[1]) + ", object size on sky: " + str(object_size[0]) + " " + str(object_size[1]))
-
-print("")
-print("-----------------------------------------------------------------------------")
-print("")
-
-# EARTH from 100 ly
-# Article test: Slava G. Turyshev, "DIRECT MULTIPIXEL IMAGING AND SPECTROSCOPY OF AN EXOPLANET WITH A SOLAR GRAVITY LENS MISSION"
-obj_name = "Earth"
-obj_size = [ 2*6371.0, 'km' ]
-obj_dist = [ 30, 'pc' ]
-obj_dist_au = HBTWN_UCM.dist_units_converter(obj_dist[0], obj_dist[1], 'ly')
-obj_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-number_of_pixels = 1
-wavelength = [1.0, 'um']
-telescope_size_unit = 'km'
-
-print(str(obj_name) + " diameter: " + str(obj_size[0]) + " " + str(obj_size[1]))
-print(str(obj_name) + " distance: " + str(obj_dist[0]) + " " + str(obj_dist[1]) + " / " + str(obj_dist_au[0]) + " " + str(obj_dist_au[1]))
-print("Expected size on image: " + str(number_of_pixels) + " pixels")
-print("Light wavelength: " + str(wavelength[0]) + str(wavelength[1]))
-telescope_size, object_size = HBTWN_CNM.calculate_telescope_size(obj_size, obj_dist, obj_dist, number_of_pixels, wavelength, telescope_size_unit)
-print("Mirror/lens size in telescope: " + str(telescope_size[0]) + " " + str(telescope_size[1]) + ", object size on sky: " + str(object_size[0]) + " " + str(object_size[1]))
-
-print("")
-print("-----------------------------------------------------------------------------")
-print("")
-
-# EARTH from 22180 ly im M13
-obj_name = "Earth"
-obj_size = [ 2*6371.0, 'km' ]
-obj_dist = [ 22180.0, 'ly' ]
-obj_dist_au = HBTWN_UCM.dist_units_converter(obj_dist[0], obj_dist[1], 'au')
-obj_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-number_of_pixels = 100
-wavelength = [522.0, 'nm']
-telescope_size_unit = 'km'
-
-print(str(obj_name) + " diameter: " + str(obj_size[0]) + " " + str(obj_size[1]))
-print(str(obj_name) + " distance: " + str(obj_dist[0]) + " " + str(obj_dist[1]) + " / " + str(obj_dist_au[0]) + " " + str(obj_dist_au[1]))
-print("Expected size on image: " + str(number_of_pixels) + " pixels")
-print("Light wavelength: " + str(wavelength[0]) + str(wavelength[1]))
-telescope_size, object_size = HBTWN_CNM.calculate_telescope_size(obj_size, obj_dist, obj_dist, number_of_pixels, wavelength, telescope_size_unit)
-print("Mirror/lens size in telescope: " + str(telescope_size[0]) + " " + str(telescope_size[1]) + ", object size on sky: " + str(object_size[0]) + " " + str(object_size[1]))
-
-print("")
-print("-----------------------------------------------------------------------------")
-print("")
-
-# Tennis ball on the Moon
-obj_name = "Tennis ball"
-obj_size = [ 6.86, 'cm' ]
-obj_dist = [ 384400, 'km' ]
-obj_dist_au = HBTWN_UCM.dist_units_converter(obj_dist[0], obj_dist[1], 'au')
-obj_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-number_of_pixels = 100
-wavelength = [1.3, 'mm']
-telescope_size_unit = 'km'
-
-print(str(obj_name) + " diameter: " + str(obj_size[0]) + " " + str(obj_size[1]))
-print(str(obj_name) + " distance: " + str(obj_dist[0]) + " " + str(obj_dist[1]) + " / " + str(obj_dist_au[0]) + " " + str(obj_dist_au[1]))
-print("Expected size on image: " + str(number_of_pixels) + " pixels")
-print("Light wavelength: " + str(wavelength[0]) + str(wavelength[1]))
-telescope_size, object_size = HBTWN_CNM.calculate_telescope_size(obj_size, obj_dist, obj_shape, number_of_pixels, wavelength, telescope_size_unit)
-print("Mirror/lens size in telescope: " + str(telescope_size[0]) + " " + str(telescope_size[1]) + ", object size on sky: " + str(object_size[0]) + " " + str(object_size[1]))
-
-print("")
-print("-----------------------------------------------------------------------------")
-print("")
-
-# Moon lander
-obj_name = "Moon lander Apollo"
-obj_size = [ 9.4, 'm' ]
-obj_dist = [ 364397, 'km' ]
-obj_dist_au = HBTWN_UCM.dist_units_converter(obj_dist[0], obj_dist[1], 'au')
-obj_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-number_of_pixels = 10
-wavelength = [522.0, 'nm']
-telescope_size_unit = 'm'
-
-print(str(obj_name) + " diameter: " + str(obj_size[0]) + " " + str(obj_size[1]))
-print(str(obj_name) + " distance: " + str(obj_dist[0]) + " " + str(obj_dist[1]) + " / " + str(obj_dist_au[0]) + " " + str(obj_dist_au[1]))
-print("Expected size on image: " + str(number_of_pixels) + " pixels")
-print("Light wavelength: " + str(wavelength[0]) + str(wavelength[1]))
-telescope_size, object_size = HBTWN_CNM.calculate_telescope_size(obj_size, obj_dist, obj_shape, number_of_pixels, wavelength, telescope_size_unit)
-print("Mirror/lens size in telescope: " + str(telescope_size[0]) + " " + str(telescope_size[1]) + ", object size on sky: " + str(object_size[0]) + " " + str(object_size[1]))
-
-print("")
-print("-----------------------------------------------------------------------------")
-print("")
-
-print("Telescope resolution for wavelenght 522 [nm] and possible visible object size on Moon from distance 364397.0 [km]:")
-print("Telescope 5\" (127mm): " + str(HBTWN_CNM.calculate_telescope_resolution([5,'inch'])) + " Object size: " + str(HBTWN_CNM.calculate_object_size([364397.0, 'km'],'m',HBTWN_CNM.calculate_telescope_resolution([5,'inch']))))
-print("Telescope 8\" (203.2mm): " + str(HBTWN_CNM.calculate_telescope_resolution([8,'inch'])) + " Object size: " + str(HBTWN_CNM.calculate_object_size([364397.0, 'km'],'m',HBTWN_CNM.calculate_telescope_resolution([8,'inch']))))
-print("Telescope 10\" (254mm): " + str(HBTWN_CNM.calculate_telescope_resolution([10,'inch'])) + " Object size: " + str(HBTWN_CNM.calculate_object_size([364397.0, 'km'],'m',HBTWN_CNM.calculate_telescope_resolution([10,'inch']))))
-print("Telescope 16\" (406.4mm): " + str(HBTWN_CNM.calculate_telescope_resolution([16,'inch'])) + " Object size: " + str(HBTWN_CNM.calculate_object_size([364397.0, 'km'],'m',HBTWN_CNM.calculate_telescope_resolution([16,'inch']))))
-print("Telescope 20\" (500.9mm): " + str(HBTWN_CNM.calculate_telescope_resolution([20,'inch'])) + " Object size: " + str(HBTWN_CNM.calculate_object_size([364397.0, 'km'],'m',HBTWN_CNM.calculate_telescope_resolution([20,'inch']))))
-print("Telescope 24\" (609.6mm): " + str(HBTWN_CNM.calculate_telescope_resolution([24,'inch'])) + " Object size: " + str(HBTWN_CNM.calculate_object_size([364397.0, 'km'],'m',HBTWN_CNM.calculate_telescope_resolution([24,'inch']))))
-print("Telescope 1m: " + str(HBTWN_CNM.calculate_telescope_resolution([1,'m'])) + " Object size: " + str(HBTWN_CNM.calculate_object_size([364397.0, 'km'],'m',HBTWN_CNM.calculate_telescope_resolution([1,'m']))))
+import modules.ScalarMathModule as HBTWN_SMM
 
 
+'''
+QUERY_COMMANDS - commands which could be used in server mode
+SHAPES - object shapes names
+'''
+QUERY_COMMANDS = ( 'telescope-size', 'object-size', 'resolution' )
+SHAPES = ( 'spherical', 'flat' )
 
+'''
+EXAMPLES - examples printed by examples command: name, size, distance, distance unit printed next to distance, shape, pixels, wavelength, telescope size unit
+EXAMPLE_TELESCOPES - telescopes of resolution example (wavelength 522 [nm], object on Moon from distance 364397.0 [km])
+'''
+EXAMPLES = (
+    ( 'Jupiter', [ 2*69911.0, 'km' ], [ 600000000.0, 'km' ], 'au', 'SPHERICAL', 100, [522.0, 'nm'], 'mm' ),
+    ( 'Earth', [ 2*6371.0, 'km' ], [ 1.0, 'au' ], 'au', 'SPHERICAL', 100, [522.0, 'nm'], 'mm' ),
+    ( 'Earth', [ 2*6371.0, 'km' ], [ 1.0, 'ly' ], 'au', 'SPHERICAL', 100, [522.0, 'nm'], 'km' ),
+    # Article test: Slava G. Turyshev, "DIRECT MULTIPIXEL IMAGING AND SPECTROSCOPY OF AN EXOPLANET WITH A SOLAR GRAVITY LENS MISSION"
+    ( 'Earth', [ 2*6371.0, 'km' ], [ 30, 'pc' ], 'ly', 'SPHERICAL', 1, [1.0, 'um'], 'km' ),
+    # EARTH from 22180 ly im M13
+    ( 'Earth', [ 2*6371.0, 'km' ], [ 22180.0, 'ly' ], 'au', 'SPHERICAL', 100, [522.0, 'nm'], 'km' ),
+    ( 'Tennis ball', [ 6.86, 'cm' ], [ 384400, 'km' ], 'au', 'SPHERICAL', 100, [1.3, 'mm'], 'km' ),
+    ( 'Moon lander Apollo', [ 9.4, 'm' ], [ 364397, 'km' ], 'au', 'SPHERICAL', 10, [522.0, 'nm'], 'm' ),
+)
+EXAMPLE_TELESCOPES = (
+    ( '5" (127mm)', [5,'inch'] ), ( '8" (203.2mm)', [8,'inch'] ), ( '10" (254mm)', [10,'inch'] ), ( '16" (406.4mm)', [16,'inch'] ),
+    ( '20" (500.9mm)', [20,'inch'] ), ( '24" (609.6mm)', [24,'inch'] ), ( '1m', [1,'m'] ),
+)
 
 
+'''
+_QueryParser - argument parser of server mode, errors are raised as ValueError instead of exit
+'''
+class _QueryParser(argparse.ArgumentParser):
+    def __init__(self, *_arguments, **_keywords):
+        _keywords['add_help'] = False
+        super().__init__(*_arguments, **_keywords)
+    def error(self, _message):
+        raise ValueError(_message)
 
 
+'''
+build_parser - command line parser
+_parser_class - parser class (default: argparse.ArgumentParser)
+'''
+def build_parser(_parser_class = argparse.ArgumentParser):
+    parser = _parser_class(prog='HBTWN.py', description='Calculate telescope size which is needed to achieve expected angular resolution. Quantities are given as values followed by unit, many values give vectorized calculation (one result per value).')
+    commands = parser.add_subparsers(dest='command', required=True)
+    output = _parser_class(add_help=False)
+    output.add_argument('--json', action='store_true', help='JSON output')
+
+    telescope_parser = commands.add_parser('telescope-size', parents=[output], help='telescope size needed to see object in given number of pixels')
+    telescope_parser.add_argument('--size', nargs='+', required=True, metavar='VALUE', help='object size, values and unit (ex. --size 139822 km)')
+    telescope_parser.add_argument('--distance', nargs='+', required=True, metavar='VALUE', help='object distance, values and unit (ex. --distance 4 au)')
+    telescope_parser.add_argument('--shape', choices=SHAPES, default='spherical', help='object shape (default: spherical)')
+    telescope_parser.add_argument('--pixels', nargs='+', type=float, default=[100], help='object size on image in pixels (default: 100)')
+    telescope_parser.add_argument('--wavelength', nargs='+', default=['522.0', 'nm'], metavar='VALUE', help='wavelength, values and unit (default: 522 nm)')
+    telescope_parser.add_argument('--unit', default='mm', help='telescope size unit (default: mm)')
+
+    object_parser = commands.add_parser('object-size', parents=[output], help='the smallest object size which could be seen with telescope')
+    object_parser.add_argument('--distance', nargs='+', required=True, metavar='VALUE', help='object distance, values and unit')
+    telescope_group = object_parser.add_mutually_exclusive_group(required=True)
+    telescope_group.add_argument('--resolution', nargs='+', metavar='VALUE', help='telescope angular resolution, values and unit (ex. --resolution 0.5 arcsec)')
+    telescope_group.add_argument('--telescope', nargs='+', metavar='VALUE', help='telescope size, values and unit (ex. --telescope 8 inch)')
+    object_parser.add_argument('--wavelength', nargs='+', default=['522.0', 'nm'], metavar='VALUE', help='wavelength used with --telescope, values and unit (default: 522 nm)')
+    object_parser.add_argument('--shape', choices=SHAPES, default='spherical', help='object shape (default: spherical)')
+    object_parser.add_argument('--pixels', nargs='+', type=float, default=[1], help='object size on image in pixels (default: 1)')
+    object_parser.add_argument('--unit', default='m', help='object size unit (default: m)')
+
+    resolution_parser = commands.add_parser('resolution', parents=[output], help='telescope angular resolution')
+    resolution_parser.add_argument('--telescope', nargs='+', required=True, metavar='VALUE', help='telescope size, values and unit')
+    resolution_parser.add_argument('--wavelength', nargs='+', default=['522.0', 'nm'], metavar='VALUE', help='wavelength, values and unit (default: 522 nm)')
+    resolution_parser.add_argument('--unit', default='arcsec', help='resolution unit (default: arcsec)')
+
+    commands.add_parser('examples', help='print examples (Jupiter, Earth, Moon)')
+    commands.add_parser('gui', help='start graphics application (requires PyQt5)')
+    commands.add_parser('serve', parents=[output], help='server mode: read queries (command line arguments, ex. resolution --telescope 8 inch) from standard input, write one result line per query')
+    return parser
 
 
+'''
+quantity - parse option tokens: values followed by unit
+@return list of values and unit
+'''
+def quantity(_tokens, _option):
+    if len(_tokens) < 2:
+        raise ValueError(_option + ' requires values followed by unit (ex. ' + _option + ' 1.0 km)')
+    try:
+        return [ float(token) for token in _tokens[:-1] ], _tokens[-1]
+    except ValueError:
+        raise ValueError(_option + ' values have to be numbers: ' + ' '.join(_tokens[:-1])) from None
+
+def _is_vector(*_values):
+    return any(len(values) > 1 for values in _values)
+
+def _batch_rows(_names, _results, _statuses):
+    # Vectorized path, NumPy is imported with batch functions, the first error of chained calculations is reported
+    import numpy as np
+    import modules.StatusModule as HBTWN_STM
+    status = _statuses[0]
+    for next_status in _statuses[1:]:
+        status = np.where(status != 0, status, next_status)
+    rows = []
+    for index, code in enumerate(status.reshape(-1).tolist()):
+        if code:
+            rows.append({ 'error':HBTWN_STM.CalculationStatus(code).name })
+        else:
+            rows.append({ name:[ float(result.values.reshape(-1)[index]), result.unit ] for name, result in zip(_names, _results) })
+    return rows
 
+'''
+run_query - calculate result of telescope-size, object-size or resolution command
+_args - parsed arguments
+@return list of result rows: dictionary name:[ value, unit ] or { error:message }
+'''
+def run_query(_args):
+    try:
+        if _args.command == 'telescope-size':
+            return _telescope_size(_args)
+        if _args.command == 'object-size':
+            return _object_size(_args)
+        return _resolution(_args)
+    except ValueError as e:
+        return [ { 'error':str(e) } ]
+
+def _telescope_size(_args):
+    size = quantity(_args.size, '--size')
+    distance = quantity(_args.distance, '--distance')
+    wavelength = quantity(_args.wavelength, '--wavelength')
+    if _is_vector(size[0], distance[0], _args.pixels, wavelength[0]):
+        import modules.CoreNumericalModule as HBTWN_CNM
+        telescope_size, object_size, status = HBTWN_CNM.calculate_telescope_size_batch(size, distance, HBTWN_CNM.HBTWN_UCM.ObjectShape[_args.shape.upper()], _args.pixels, wavelength, _args.unit, _return_status=True)
+        return _batch_rows(('telescope_size', 'angular_size'), (telescope_size, object_size), (status,))
+    telescope_size, object_size = HBTWN_SMM.calculate_telescope_size([ size[0][0], size[1] ], [ distance[0][0], distance[1] ], _args.shape, _args.pixels[0], [ wavelength[0][0], wavelength[1] ], _args.unit)
+    return [ { 'telescope_size':telescope_size, 'angular_size':object_size } ]
+
+def _object_size(_args):
+    distance = quantity(_args.distance, '--distance')
+    if _args.telescope:
+        telescope = quantity(_args.telescope, '--telescope')
+        wavelength = quantity(_args.wavelength, '--wavelength')
+        vector = _is_vector(distance[0], _args.pixels, telescope[0], wavelength[0])
+    else:
+        resolution = quantity(_args.resolution, '--resolution')
+        vector = _is_vector(distance[0], _args.pixels, resolution[0])
+    if vector:
+        import modules.CoreNumericalModule as HBTWN_CNM
+        if _args.telescope:
+            resolution, resolution_status = HBTWN_CNM.calculate_telescope_resolution_batch(telescope, wavelength, 'arcsec', _return_status=True)
+        object_size, status = HBTWN_CNM.calculate_object_size_batch(distance, _args.unit, resolution, HBTWN_CNM.HBTWN_UCM.ObjectShape[_args.shape.upper()], _args.pixels, _return_status=True)
+        return _batch_rows(('object_size',), (object_size,), (resolution_status, status) if _args.telescope else (status,))
+    if _args.telescope:
+        resolution = HBTWN_SMM.calculate_telescope_resolution([ telescope[0][0], telescope[1] ], [ wavelength[0][0], wavelength[1] ], 'arcsec')
+    else:
+        resolution = [ resolution[0][0], resolution[1] ]
+    return [ { 'object_size':HBTWN_SMM.calculate_object_size([ distance[0][0], distance[1] ], _args.unit, resolution, _args.shape, _args.pixels[0]) } ]
+
+def _resolution(_args):
+    telescope = quantity(_args.telescope, '--telescope')
+    wavelength = quantity(_args.wavelength, '--wavelength')
+    if _is_vector(telescope[0], wavelength[0]):
+        import modules.CoreNumericalModule as HBTWN_CNM
+        resolution, status = HBTWN_CNM.calculate_telescope_resolution_batch(telescope, wavelength, _args.unit, _return_status=True)
+        return _batch_rows(('resolution',), (resolution,), (status,))
+    return [ { 'resolution':HBTWN_SMM.calculate_telescope_resolution([ telescope[0][0], telescope[1] ], [ wavelength[0][0], wavelength[1] ], _args.unit) } ]
+
+
+'''
+format_rows - result rows as text lines (values with units, error: message for wrong rows) or JSON (object for single row, array for many rows)
+@return list of lines
+'''
+def format_rows(_rows, _json = False):
+    if _json:
+        return [ json.dumps(_rows[0] if len(_rows) == 1 else _rows) ]
+    return [ 'error: ' + row['error'] if 'error' in row else ' '.join(str(value) + ' ' + unit for value, unit in row.values()) for row in _rows ]
+
+
+'''
+serve - server mode: every input line is query (command line arguments of QUERY_COMMANDS), every query gives exactly one output line
+(rows of vectorized query are joined with ' | '), empty lines and lines started with # are skipped, quit or exit ends server
+_input - input text stream
+_output - output text stream (flushed after every result)
+_json - JSON output for all queries (default: False)
+@return exit code
+'''
+def serve(_input, _output, _json = False):
+    parser = build_parser(_QueryParser)
+    for line in _input:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line in ('quit', 'exit'):
+            break
+        json_output = _json
+        try:
+            args = parser.parse_args(shlex.split(line))
+            if args.command not in QUERY_COMMANDS:
+                raise ValueError(args.command + ' command is not available in server mode')
+            json_output = json_output or args.json
+            rows = run_query(args)
+        except ValueError as e:
+            rows = [ { 'error':str(e) } ]
+        _output.write(' | '.join(format_rows(rows, json_output)) + '\n')
+        _output.flush()
+    return 0
+
+
+'''
+print_examples - print examples (output of previous HBTWN.py versions)
+'''
+def print_examples():
+    print("------------------------------------------------------------------------------------------------------------")
+    print("                                             HBTWN v. 0.05                                                  ")
+    print("Application allow to calculate telescope size which is needed to achieve expected angular resolution.       ")
+    print("                              HBTWN  Copyright (C) 2021  Jan Bielański                                      ")
+    print("------------------------------------------------------------------------------------------------------------")
+    print("")
+
+    for obj_name, obj_size, obj_dist, obj_dist_unit, obj_shape, number_of_pixels, wavelength, telescope_size_unit in EXAMPLES:
+        obj_dist_au = HBTWN_SMM.dist_units_converter(obj_dist[0], obj_dist[1], obj_dist_unit)
+        print(str(obj_name) + " diameter: " + str(obj_size[0]) + " " + str(obj_size[1]))
+        print(str(obj_name) + " distance: " + str(obj_dist[0]) + " " + str(obj_dist[1]) + " / " + str(obj_dist_au[0]) + " " + str(obj_dist_au[1]))
+        print("Expected size on image: " + str(number_of_pixels) + " pixels")
+        print("Light wavelength: " + str(wavelength[0]) + str(wavelength[1]))
+        telescope_size, object_size = HBTWN_SMM.calculate_telescope_size(obj_size, obj_dist, obj_shape, number_of_pixels, wavelength, telescope_size_unit)
+        print("Mirror/lens size in telescope: " + str(telescope_size[0]) + " " + str(telescope_size[1]) + ", object size on sky: " + str(object_size[0]) + " " + str(object_size[1]))
+
+        print("")
+        print("-----------------------------------------------------------------------------")
+        print("")
+
+    print("Telescope resolution for wavelenght 522 [nm] and possible visible object size on Moon from distance 364397.0 [km]:")
+    for name, telescope in EXAMPLE_TELESCOPES:
+        resolution = HBTWN_SMM.calculate_telescope_resolution(telescope)
+        print("Telescope " + name + ": " + str(resolution) + " Object size: " + str(HBTWN_SMM.calculate_object_size([364397.0, 'km'],'m',resolution)))
+
+
+def main(_argv = None):
+    args = build_parser().parse_args(_argv)
+    if args.command == 'examples':
+        print_examples()
+        return 0
+    if args.command == 'gui':
+        import HBTWN_gui
+        return HBTWN_gui.main([ sys.argv[0] ])
+    if args.command == 'serve':
+        return serve(sys.stdin, sys.stdout, args.json)
+
+    rows = run_query(args)
+    for line in format_rows(rows, args.json):
+        print(line)
+    return 1 if any('error' in row for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
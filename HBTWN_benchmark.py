@@ -0,0 +1,67 @@
+#!/bin/python3
+
+'''
+HBTWN benchmark
+Command line application which runs benchmark suite (BenchmarkModule) and compares results with stored baseline.
+python HBTWN_benchmark.py run -o current.json [--baseline baseline.json]
+python HBTWN_benchmark.py compare baseline.json current.json
+Exit code 1 means regression (slower than threshold) or wrong results.
+HBTWN  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import argparse
+import sys
+
+# Project modules
+import modules.BenchmarkModule as HBTWN_BM
+
+
+def compare(_baseline, _current, _threshold):
+    comparison = HBTWN_BM.compare_reports(_baseline, _current, _threshold)
+    for record in comparison:
+        print(HBTWN_BM.format_comparison(record))
+    failed = [ record for record in comparison if record['regression'] or record['incorrect'] ]
+    failed += [ record for record in _current['results'] if not record['correct'] and not any(record['case'] == other['case'] and record['rows'] == other['rows'] for other in comparison) ]
+    print('Compared: ' + str(len(comparison)) + ', regressions: ' + str(sum(record['regression'] for record in comparison)) + ' (threshold ' + '%g' % (100.0*_threshold) + '%), wrong results: ' + str(sum(not record['correct'] for record in _current['results'])))
+    return 1 if failed else 0
+
+
+def main(_argv = None):
+    parser = argparse.ArgumentParser(description='HBTWN benchmark suite with regression tracking.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run benchmarks and save JSON report')
+    run_parser.add_argument('-o', '--output', help='JSON report file')
+    run_parser.add_argument('-c', '--cases', nargs='+', help='case names or groups: ' + ', '.join(case.name for case in HBTWN_BM.CASES))
+    run_parser.add_argument('-s', '--sizes', nargs='+', type=int, default=HBTWN_BM.SIZES, help='input sizes in rows (default: ' + ' '.join(str(size) for size in HBTWN_BM.SIZES) + ')')
+    run_parser.add_argument('-r', '--repeat', type=int, default=3, help='number of measurements, the best time is used (default: 3)')
+    run_parser.add_argument('-w', '--workers', type=int, help='process pool size of parallel cases (default: number of CPU cores)')
+    run_parser.add_argument('-b', '--baseline', help='baseline JSON report compared with results')
+    run_parser.add_argument('-t', '--threshold', type=float, default=HBTWN_BM.DEFAULT_THRESHOLD, help='regression threshold, relative slow down (default: ' + str(HBTWN_BM.DEFAULT_THRESHOLD) + ')')
+
+    compare_parser = commands.add_parser('compare', help='compare two JSON reports')
+    compare_parser.add_argument('baseline', help='baseline JSON report')
+    compare_parser.add_argument('current', help='current JSON report')
+    compare_parser.add_argument('-t', '--threshold', type=float, default=HBTWN_BM.DEFAULT_THRESHOLD, help='regression threshold, relative slow down (default: ' + str(HBTWN_BM.DEFAULT_THRESHOLD) + ')')
+    args = parser.parse_args(_argv)
+
+    try:
+        if args.command == 'compare':
+            return compare(HBTWN_BM.load_report(args.baseline), HBTWN_BM.load_report(args.current), args.threshold)
+
+        if args.repeat < 1 or any(size < 1 for size in args.sizes):
+            parser.error('repeat and sizes have to be positive')
+        baseline = HBTWN_BM.load_report(args.baseline) if args.baseline else None
+        report = HBTWN_BM.run_benchmarks(args.cases, args.sizes, args.repeat, _workers=args.workers, _progress=lambda _record: print(HBTWN_BM.format_result(_record), flush=True))
+        if args.output:
+            HBTWN_BM.save_report(report, args.output)
+        if baseline is not None:
+            return compare(baseline, report, args.threshold)
+        return 0 if all(record['correct'] for record in report['results']) else 1
+    except (OSError, ValueError) as e:
+        print('Benchmark failure: ' + str(e), file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
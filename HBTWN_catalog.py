@@ -0,0 +1,66 @@
+#!/bin/python3
+
+'''
+HBTWN catalog
+Command line application which calculate telescope size for every object in CSV/JSONL catalog.
+Catalog is processed as a stream in vectorized blocks, memory usage does not depend on catalog size.
+HBTWN  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import argparse
+import sys
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CatalogStreamModule as HBTWN_CSM
+
+
+def main(_argv = None):
+    parser = argparse.ArgumentParser(description='Calculate telescope size for every object in catalog. Input columns: ' + ', '.join(HBTWN_CSM.CATALOG_COLUMNS) + ' (shape, pixels and wavelength are optional).')
+    parser.add_argument('input', help='input catalog file, - for standard input')
+    parser.add_argument('-o', '--output', default='-', help='output file, - for standard output (default: -)')
+    parser.add_argument('--input-format', choices=HBTWN_CSM.INPUT_FORMATS, help='input format (default: detected from file extension, csv for standard input)')
+    parser.add_argument('--output-format', choices=HBTWN_CSM.OUTPUT_FORMATS + ('store',), help='output format, store writes memory mapped result store directory which is resumed when run is interrupted (default: detected from file extension, csv for standard output)')
+    parser.add_argument('--restart', action='store_true', help='do not resume existing result store, calculate whole catalog again')
+    parser.add_argument('-b', '--block-size', type=int, default=65536, help='number of rows calculated at once (default: 65536)')
+    parser.add_argument('-u', '--telescope-size-unit', default='mm', choices=HBTWN_UCM.DIST_UNITS.symbols, help='telescope size unit (default: mm)')
+    args = parser.parse_args(_argv)
+    if args.block_size < 1:
+        parser.error('block size has to be positive')
+
+    input_format = args.input_format or HBTWN_CSM.detect_format(args.input)
+    output_format = args.output_format or HBTWN_CSM.detect_format(args.output)
+    if output_format == 'store' and args.output == '-':
+        parser.error('result store requires output directory')
+
+    input_file = sys.stdin if args.input == '-' else open(args.input, 'r', newline='', encoding='utf-8')
+    if output_format == 'store':
+        try:
+            rows = HBTWN_CSM.process_catalog_to_store(input_file, args.output, input_format, args.block_size, args.telescope_size_unit, not args.restart)
+        except ValueError as e:
+            print('Catalog processing failure: ' + str(e), file=sys.stderr)
+            return 1
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+        print('Rows in result store: ' + str(rows), file=sys.stderr)
+        return 0
+
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        rows = HBTWN_CSM.process_catalog(input_file, output_file, input_format, output_format, args.block_size, args.telescope_size_unit)
+    except ValueError as e:
+        print('Catalog processing failure: ' + str(e), file=sys.stderr)
+        return 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    print('Processed rows: ' + str(rows), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+#!/bin/python3
+
+'''
+HBTWN GUI
+Graphics application which allow to calculate telescope size which is needed to achieve expected angular resolution.
+HBTWN  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import sys
+from PyQt5 import QtWidgets
+
+# Project modules
+from Main_HBTWN import Ui_MainWindow
+import modules.GuiControllerModule as HBTWN_GCM
+
+
+def main(_argv = None):
+    application = QtWidgets.QApplication(sys.argv if _argv is None else _argv)
+    window = QtWidgets.QMainWindow()
+    ui = Ui_MainWindow()
+    ui.setupUi(window)
+    window.setWindowTitle('HBTWN')
+    controller = HBTWN_GCM.MainWindowController(ui, _parent=window)
+
+    # Initial example: Jupiter
+    ui.lineEdit_in_0.setText('Jupiter')
+    ui.lineEdit_in_1.setText('600000000')
+    ui.lineEdit_in_2.setText(str(2*69911.0))
+    ui.comboBox_in_2a.setCurrentText('km')
+    ui.comboBox_in_2b.setCurrentIndex(HBTWN_GCM.SHAPES.index(HBTWN_GCM.HBTWN_UCM.ObjectShape.SPHERICAL))
+    ui.lineEdit_in_3.setText('522')
+    ui.lineEdit_in_4.setText('100')
+    controller.recalculate()
+
+    window.show()
+    result = application.exec_()
+    controller.wait_for_done()
+    return result
+
+
+if __name__ == '__main__':
+    sys.exit(main())
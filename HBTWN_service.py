@@ -0,0 +1,67 @@
+#!/bin/python3
+
+'''
+HBTWN service
+Command line application which runs local calculation service (ServiceModule) or load test of running service.
+python HBTWN_service.py serve [--port 8765 | --unix /tmp/hbtwn.sock] [--window 0.002] [--max-batch 4096] [--max-queue 65536]
+python HBTWN_service.py load [--port 8765 | --unix /tmp/hbtwn.sock] [--requests 10000] [--concurrency 64]
+HBTWN  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import argparse
+import asyncio
+import json
+import sys
+
+# Project modules
+import modules.ServiceModule as HBTWN_SVM
+
+'''
+LOAD_QUERIES - queries sent by load test
+'''
+LOAD_QUERIES = {
+    '/telescope-size':[ { 'size':[ 2*69911.0, 'km' ], 'distance':[ 600000000.0, 'km' ] }, { 'size':[ 2*6371.0, 'km' ], 'distance':[ 30, 'pc' ], 'pixels':1, 'wavelength':[ 1.0, 'um' ], 'unit':'km' },
+                        { 'size':[ 9.4, 'm' ], 'distance':[ 364397, 'km' ], 'pixels':10, 'unit':'m' } ],
+    '/resolution':[ { 'telescope':[ 8, 'inch' ] }, { 'telescope':[ 1, 'm' ], 'unit':'mas' }, { 'telescope':[ 10, 'km' ], 'wavelength':[ 1.3, 'mm' ] } ],
+}
+
+
+def main(_argv = None):
+    parser = argparse.ArgumentParser(description='HBTWN local calculation service (HTTP/JSON, requests coalesced into vectorized batches).')
+    commands = parser.add_subparsers(dest='command', required=True)
+    address = argparse.ArgumentParser(add_help=False)
+    address.add_argument('--host', default='127.0.0.1', choices=HBTWN_SVM.LOCAL_HOSTS, help='localhost address (default: 127.0.0.1)')
+    address.add_argument('-p', '--port', type=int, default=HBTWN_SVM.DEFAULT_PORT, help='TCP port (default: ' + str(HBTWN_SVM.DEFAULT_PORT) + ')')
+    address.add_argument('--unix', help='Unix socket path used instead of TCP port')
+
+    serve_parser = commands.add_parser('serve', parents=[address], help='run service')
+    serve_parser.add_argument('-w', '--window', type=float, default=HBTWN_SVM.DEFAULT_BATCH_WINDOW, help='batch window [s] (default: ' + str(HBTWN_SVM.DEFAULT_BATCH_WINDOW) + ')')
+    serve_parser.add_argument('-b', '--max-batch', type=int, default=HBTWN_SVM.DEFAULT_MAX_BATCH_SIZE, help='maximal batch size (default: ' + str(HBTWN_SVM.DEFAULT_MAX_BATCH_SIZE) + ')')
+    serve_parser.add_argument('-q', '--max-queue', type=int, default=HBTWN_SVM.DEFAULT_MAX_QUEUE, help='maximal number of waiting queries per endpoint, full queue gives HTTP 503 (default: ' + str(HBTWN_SVM.DEFAULT_MAX_QUEUE) + ')')
+
+    load_parser = commands.add_parser('load', parents=[address], help='load test of running service')
+    load_parser.add_argument('-e', '--endpoint', choices=sorted(LOAD_QUERIES), default='/telescope-size', help='tested endpoint (default: /telescope-size)')
+    load_parser.add_argument('-n', '--requests', type=int, default=10000, help='number of requests (default: 10000)')
+    load_parser.add_argument('-c', '--concurrency', type=int, default=64, help='number of concurrent connections (default: 64)')
+    args = parser.parse_args(_argv)
+
+    try:
+        if args.command == 'serve':
+            if args.window < 0.0 or args.max_batch < 1 or args.max_queue < 1:
+                parser.error('window has to be non-negative, batch and queue sizes have to be positive')
+            print('HBTWN service: ' + (args.unix or ('http://' + args.host + ':' + str(args.port))), file=sys.stderr)
+            HBTWN_SVM.run_service(args.host, args.port, args.unix, args.window, args.max_batch, args.max_queue)
+            return 0
+
+        if args.requests < 1 or args.concurrency < 1:
+            parser.error('requests and concurrency have to be positive')
+        result = asyncio.run(HBTWN_SVM.load_test(args.endpoint, LOAD_QUERIES[args.endpoint], args.requests, args.concurrency, args.host, args.port, args.unix))
+        print(json.dumps(result, indent=1))
+        return 0 if not result['errors'] else 1
+    except OSError as e:
+        print('Service failure: ' + str(e), file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/bin/python3
+
+'''
+HBTWN - BackendModule
+Module storage compute backends of core formulas (telescope size, object size, telescope resolution) with automatic dispatch by input size:
+math - pure Python math module, the fastest for single values and very small inputs (no NumPy overhead per element)
+numpy - NumPy ufuncs, large arrays
+numba - optional (when Numba is installed), the same element kernels as math backend compiled to one fused loop: units conversions,
+        trigonometric functions and 1.22*lambda/theta without temporary arrays
+Backends calculate in one pass from values in input units to output unit (one unit per quantity), wrong elements give NaN
+(status codes are available in CoreNumericalModule batch functions). Results of all backends are consistent within CONSISTENCY_TOLERANCE
+(math and NumPy trigonometric functions could differ in the last bit).
+HBTWN BackendModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import importlib.util
+import logging
+import math
+import os
+
+# Project modules
+import modules.UnitsTablesModule as HBTWN_UTM
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.ScalarMathModule as HBTWN_SMM
+
+'''
+LOGGER - module logger
+'''
+LOGGER = logging.getLogger(__name__)
+
+'''
+ENVIRONMENT_VARIABLE - environment variable which forces backend (math/numpy/numba/auto), checked on import
+AUTO - name of automatic dispatch
+MATH_MAX_ELEMENTS - inputs up to this number of elements use math backend
+NUMBA_MIN_ELEMENTS - inputs from this number of elements use numba backend (if available), other inputs use numpy backend
+CONSISTENCY_TOLERANCE - maximal relative difference between backends results
+'''
+ENVIRONMENT_VARIABLE = 'HBTWN_BACKEND'
+AUTO = 'auto'
+MATH_MAX_ELEMENTS = 8
+NUMBA_MIN_ELEMENTS = 4096
+CONSISTENCY_TOLERANCE = 1e-12
+
+_RAD = HBTWN_UTM.ANGLE_SCALES['rad']
+_ARCSEC = HBTWN_UTM.ANGLE_SCALES['arcsec']
+
+
+'''
+Element kernels - pure math formulas of single element (used by math backend and compiled by numba backend)
+Values are converted with scales to base units: (value * scale) / 1.0, the same as UnitRegistry.convert, wrong elements give NaN.
+'''
+def _telescope_size_element(_size, _size_scale, _dist, _dist_scale, _flat, _pixels, _wavelength, _wavelength_scale, _unit_scale):
+    size_m = _size*_size_scale
+    dist_m = _dist*_dist_scale
+    wavelength_m = _wavelength*_wavelength_scale
+    if not (size_m > 0.0 and dist_m > 0.0 and _pixels > 0.0 and wavelength_m > 0.0) or math.isinf(size_m) or math.isinf(dist_m) or math.isinf(_pixels) or math.isinf(wavelength_m):
+        return math.nan, math.nan
+    size_scaled_m = size_m*(1.0/_pixels)
+    if _flat:
+        angular_size_in_rads = 2.0 * math.atan(size_m/(dist_m+dist_m))
+        angular_size_in_rads_for_pixel = 2.0 * math.atan(size_scaled_m/(dist_m+dist_m))
+    else:
+        if size_m > dist_m+dist_m:
+            return math.nan, math.nan
+        angular_size_in_rads = 2.0 * math.asin(size_m/(dist_m+dist_m))
+        angular_size_in_rads_for_pixel = 2.0 * math.asin(size_scaled_m/(dist_m+dist_m))
+    D = 1.22*(wavelength_m/angular_size_in_rads_for_pixel)
+    return D/_unit_scale, (angular_size_in_rads*_RAD)/_ARCSEC
+
+def _object_size_element(_dist, _dist_scale, _resolution, _resolution_scale, _flat, _pixels, _unit_scale):
+    dist_m = _dist*_dist_scale
+    if not (dist_m > 0.0 and _resolution > 0.0 and _pixels > 0.0) or math.isinf(dist_m) or math.isinf(_resolution) or math.isinf(_pixels):
+        return math.nan
+    angular_size_in_rads = (_resolution*_resolution_scale)/_RAD
+    if _flat:
+        object_size_in_m = math.tan(angular_size_in_rads*0.5)*(2.0*dist_m)
+    else:
+        object_size_in_m = math.sin(angular_size_in_rads*0.5)*(2.0*dist_m)
+    return (object_size_in_m * _pixels)/_unit_scale
+
+def _resolution_element(_size, _size_scale, _wavelength, _wavelength_scale, _unit_scale):
+    size_m = _size*_size_scale
+    wavelength_m = _wavelength*_wavelength_scale
+    if not (size_m > 0.0 and wavelength_m > 0.0) or math.isinf(size_m) or math.isinf(wavelength_m):
+        return math.nan
+    theta = 1.22*(wavelength_m/size_m)
+    return (theta*_RAD)/_unit_scale
+
+
+'''
+Backend - compute backend, every method gets values (numbers or arrays broadcast together), flat mask and scales of input and output units
+Fields:
+name - backend name
+Methods:
+available - True if backend could be used
+telescope_size - telescope sizes and angular sizes [arcsec]
+object_size - objects sizes
+resolution - telescopes resolutions
+'''
+class Backend:
+    name = ''
+    def available(self):
+        return True
+
+'''
+MathBackend - element kernels in Python loop (arrays are converted to lists)
+'''
+class MathBackend(Backend):
+    name = 'math'
+    def telescope_size(self, _size, _dist, _flat, _pixels, _wavelength, _scales):
+        size_scale, dist_scale, wavelength_scale, unit_scale = _scales
+        return _elements(lambda _s, _d, _f, _p, _w: _telescope_size_element(_s, size_scale, _d, dist_scale, _f, _p, _w, wavelength_scale, unit_scale), 2, (_size, _dist, _flat, _pixels, _wavelength))
+    def object_size(self, _dist, _resolution, _flat, _pixels, _scales):
+        dist_scale, resolution_scale, unit_scale = _scales
+        return _elements(lambda _d, _r, _f, _p: _object_size_element(_d, dist_scale, _r, resolution_scale, _f, _p, unit_scale), 1, (_dist, _resolution, _flat, _pixels))
+    def resolution(self, _size, _wavelength, _scales):
+        size_scale, wavelength_scale, unit_scale = _scales
+        return _elements(lambda _s, _w: _resolution_element(_s, size_scale, _w, wavelength_scale, unit_scale), 1, (_size, _wavelength))
+
+_SCALAR_TYPES = ( int, float, bool, np.float64, np.bool_ )
+
+def _elements(_function, _outputs, _values):
+    if all(type(value) in _SCALAR_TYPES for value in _values):
+        return _function(*_values)
+    arrays = np.broadcast_arrays(*(np.asarray(value) for value in _values))
+    results = [ _function(*row) for row in zip(*(array.reshape(-1).tolist() for array in arrays)) ]
+    if _outputs == 1:
+        return np.array(results, dtype=np.float64).reshape(arrays[0].shape)
+    return tuple(np.array(result, dtype=np.float64).reshape(arrays[0].shape) for result in zip(*results)) if results else tuple(np.empty(arrays[0].shape) for _ in range(_outputs))
+
+'''
+NumpyBackend - NumPy ufuncs, wrong elements are masked after calculation
+'''
+class NumpyBackend(Backend):
+    name = 'numpy'
+    def telescope_size(self, _size, _dist, _flat, _pixels, _wavelength, _scales):
+        size_m = np.asarray(_size, dtype=np.float64)*_scales[0]
+        dist_m = np.asarray(_dist, dtype=np.float64)*_scales[1]
+        pixels = np.asarray(_pixels, dtype=np.float64)
+        wavelength_m = np.asarray(_wavelength, dtype=np.float64)*_scales[2]
+        flat = np.asarray(_flat, dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            double_dist_m = dist_m+dist_m
+            ratio = size_m/double_dist_m
+            ratio_for_pixel = (size_m*(1.0/pixels))/double_dist_m
+            angular_size_in_rads = 2.0 * np.where(flat, np.arctan(ratio), np.arcsin(ratio))
+            angular_size_in_rads_for_pixel = 2.0 * np.where(flat, np.arctan(ratio_for_pixel), np.arcsin(ratio_for_pixel))
+            D = 1.22*(wavelength_m/angular_size_in_rads_for_pixel)
+            telescope_size = D/_scales[3]
+            angular_size = (angular_size_in_rads*_RAD)/_ARCSEC
+            wrong = ~(_positive_finite(size_m) & _positive_finite(dist_m) & _positive_finite(pixels) & _positive_finite(wavelength_m) & (flat | (size_m <= double_dist_m)))
+        return _masked(telescope_size, wrong), _masked(angular_size, wrong)
+    def object_size(self, _dist, _resolution, _flat, _pixels, _scales):
+        dist_m = np.asarray(_dist, dtype=np.float64)*_scales[0]
+        resolution = np.asarray(_resolution, dtype=np.float64)
+        pixels = np.asarray(_pixels, dtype=np.float64)
+        with np.errstate(invalid='ignore', over='ignore'):
+            half_angle = ((resolution*_scales[1])/_RAD)*0.5
+            object_size_in_m = np.where(np.asarray(_flat, dtype=bool), np.tan(half_angle), np.sin(half_angle))*(2.0*dist_m)
+            object_size = (object_size_in_m * pixels)/_scales[2]
+            wrong = ~(_positive_finite(dist_m) & _positive_finite(resolution) & _positive_finite(pixels))
+        return _masked(object_size, wrong)
+    def resolution(self, _size, _wavelength, _scales):
+        size_m = np.asarray(_size, dtype=np.float64)*_scales[0]
+        wavelength_m = np.asarray(_wavelength, dtype=np.float64)*_scales[1]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            theta = 1.22*(wavelength_m/size_m)
+            resolution = (theta*_RAD)/_scales[2]
+            wrong = ~(_positive_finite(size_m) & _positive_finite(wavelength_m))
+        return _masked(resolution, wrong)
+
+def _positive_finite(_values):
+    return (_values > 0.0) & (_values < np.inf)
+
+def _masked(_values, _wrong):
+    values = np.array(np.broadcast_to(_values, np.broadcast_shapes(np.shape(_values), np.shape(_wrong))), dtype=np.float64)
+    values[_wrong] = np.nan
+    return values if values.ndim else float(values)
+
+'''
+NumbaBackend - element kernels compiled with Numba (compiled on the first use), inputs are broadcast and flattened
+'''
+class NumbaBackend(Backend):
+    name = 'numba'
+    def __init__(self):
+        self._kernels = None
+    def available(self):
+        return importlib.util.find_spec('numba') is not None
+    def _compiled(self):
+        if self._kernels is None:
+            self._kernels = _compile_numba_kernels()
+        return self._kernels
+    def telescope_size(self, _size, _dist, _flat, _pixels, _wavelength, _scales):
+        arrays = _flat_arrays(_size, _dist, _flat, _pixels, _wavelength)
+        telescope_size, angular_size = np.empty(math.prod(arrays[0])), np.empty(math.prod(arrays[0]))
+        self._compiled()[0](arrays[1][0], _scales[0], arrays[1][1], _scales[1], arrays[1][2], arrays[1][3], arrays[1][4], _scales[2], _scales[3], telescope_size, angular_size)
+        return telescope_size.reshape(arrays[0]), angular_size.reshape(arrays[0])
+    def object_size(self, _dist, _resolution, _flat, _pixels, _scales):
+        arrays = _flat_arrays(_dist, _resolution, _flat, _pixels)
+        object_size = np.empty(math.prod(arrays[0]))
+        self._compiled()[1](arrays[1][0], _scales[0], arrays[1][1], _scales[1], arrays[1][2], arrays[1][3], _scales[2], object_size)
+        return object_size.reshape(arrays[0])
+    def resolution(self, _size, _wavelength, _scales):
+        arrays = _flat_arrays(_size, _wavelength)
+        resolution = np.empty(math.prod(arrays[0]))
+        self._compiled()[2](arrays[1][0], _scales[0], arrays[1][1], _scales[1], _scales[2], resolution)
+        return resolution.reshape(arrays[0])
+
+def _flat_arrays(*_values):
+    # Shape of result and flattened (1-D) inputs, float64 except of flat mask
+    arrays = np.broadcast_arrays(*(np.asarray(value) for value in _values))
+    flattened = [ np.ascontiguousarray(array.reshape(-1), dtype=(bool if array.dtype == bool else np.float64)) for array in arrays ]
+    return arrays[0].shape, flattened
+
+def _compile_numba_kernels():
+    import numba
+    telescope_size_element = numba.njit(_telescope_size_element)
+    object_size_element = numba.njit(_object_size_element)
+    resolution_element = numba.njit(_resolution_element)
+
+    @numba.njit
+    def telescope_size(_size, _size_scale, _dist, _dist_scale, _flat, _pixels, _wavelength, _wavelength_scale, _unit_scale, _telescope_size, _angular_size):
+        for i in range(_size.shape[0]):
+            telescope_size_value, angular_size_value = telescope_size_element(_size[i], _size_scale, _dist[i], _dist_scale, _flat[i], _pixels[i], _wavelength[i], _wavelength_scale, _unit_scale)
+            _telescope_size[i] = telescope_size_value
+            _angular_size[i] = angular_size_value
+
+    @numba.njit
+    def object_size(_dist, _dist_scale, _resolution, _resolution_scale, _flat, _pixels, _unit_scale, _object_size):
+        for i in range(_dist.shape[0]):
+            _object_size[i] = object_size_element(_dist[i], _dist_scale, _resolution[i], _resolution_scale, _flat[i], _pixels[i], _unit_scale)
+
+    @numba.njit
+    def resolution(_size, _size_scale, _wavelength, _wavelength_scale, _unit_scale, _resolution):
+        for i in range(_size.shape[0]):
+            _resolution[i] = resolution_element(_size[i], _size_scale, _wavelength[i], _wavelength_scale, _unit_scale)
+
+    return telescope_size, object_size, resolution
+
+
+'''
+BACKENDS - all backends: name:Backend
+'''
+BACKENDS = { backend.name:backend for backend in (MathBackend(), NumpyBackend(), NumbaBackend()) }
+_FORCED = [ None ]
+
+'''
+available_backends - names of backends which could be used
+'''
+def available_backends():
+    return [ name for name, backend in BACKENDS.items() if backend.available() ]
+
+'''
+set_backend - force backend for all calls without _backend argument
+_name - backend name or auto (automatic dispatch, default)
+'''
+def set_backend(_name = AUTO):
+    _FORCED[0] = None if _name in (None, AUTO) else _backend_of(_name).name
+
+'''
+get_backend - name of forced backend or auto
+'''
+def get_backend():
+    return _FORCED[0] or AUTO
+
+def _backend_of(_name):
+    backend = BACKENDS.get(_name)
+    if backend is None:
+        raise ValueError('Unknown backend: ' + repr(_name) + ' (available: ' + ', '.join(available_backends()) + ')')
+    if not backend.available():
+        raise ValueError('Backend ' + _name + ' is not available (' + _name + ' is not installed)')
+    return backend
+
+'''
+select_backend - backend used for given number of elements
+_elements - number of result elements
+_backend - backend name, auto or None (default: forced backend or automatic dispatch)
+@return Backend
+'''
+def select_backend(_elements, _backend = None):
+    name = _backend if _backend not in (None, AUTO) else _FORCED[0] if _backend is None else None
+    if name is not None:
+        return _backend_of(name)
+    if _elements <= MATH_MAX_ELEMENTS:
+        return BACKENDS['math']
+    if _elements >= NUMBA_MIN_ELEMENTS and BACKENDS['numba'].available():
+        return BACKENDS['numba']
+    return BACKENDS['numpy']
+
+def _elements_count(*_values):
+    if all(type(value) in _SCALAR_TYPES for value in _values):
+        return 1
+    return math.prod(np.broadcast_shapes(*(np.shape(value) for value in _values)))
+
+def _flat_mask(_object_shape):
+    if isinstance(_object_shape, (str, int, HBTWN_UCM.ObjectShape)):
+        return HBTWN_SMM.is_flat(_object_shape)
+    return HBTWN_UCM.object_shape_codes(_object_shape) == HBTWN_UCM.ObjectShape.FLAT.value
+
+def _scale(_scales, _registry_name, _unit):
+    return HBTWN_UTM.scale_of(_scales, _registry_name, _unit)
+
+'''
+calculate_telescope_size - telescope size with selected backend (see CoreNumericalModule.calculate_telescope_size_batch)
+_target_obj_physical_size - target object physical sizes as array: [ sizes, unit ]
+_target_obj_physical_dist - target object physical distances as array: [ distances, unit ]
+_object_shape - object shape or array of shapes (default: ObjectShape.SPHERICAL)
+_number_of_pixels - number of pixels on image, number or array (default: 100)
+_wavelength - wavelength values as array: [ wavelengths, unit ] (default: [522.0, nm])
+_telescope_size_unit - telescope size unit (default: mm)
+_backend - backend name, auto or None (default: forced backend or automatic dispatch by number of elements)
+@return telescope sizes [ values, unit ] and objects sizes on sky [ values, arcsec ], values are numbers for numbers inputs (NaN for wrong elements)
+'''
+def calculate_telescope_size(_target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 100, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm', _backend = None):
+    scales = ( _scale(HBTWN_UTM.DIST_SCALES, 'distance', _target_obj_physical_size[1]), _scale(HBTWN_UTM.DIST_SCALES, 'distance', _target_obj_physical_dist[1]),
+               _scale(HBTWN_UTM.DIST_SCALES, 'distance', _wavelength[1]), _scale(HBTWN_UTM.DIST_SCALES, 'distance', _telescope_size_unit) )
+    flat = _flat_mask(_object_shape)
+    backend = select_backend(_elements_count(_target_obj_physical_size[0], _target_obj_physical_dist[0], flat, _number_of_pixels, _wavelength[0]), _backend)
+    telescope_size, angular_size = backend.telescope_size(_target_obj_physical_size[0], _target_obj_physical_dist[0], flat, _number_of_pixels, _wavelength[0], scales)
+    return [ telescope_size, _telescope_size_unit ], [ angular_size, 'arcsec' ]
+
+'''
+calculate_object_size - object size with selected backend (see CoreNumericalModule.calculate_object_size_batch)
+_target_obj_physical_dist - target object physical distances as array: [ distances, unit ]
+_target_obj_size_unit - expected unit for object size
+_telescope_angular_resolution - telescope angular resolutions: [ angular resolutions, unit ]
+_object_shape - object shape or array of shapes (default: ObjectShape.SPHERICAL)
+_number_of_pixels - number of pixels on image, number or array (default: 1)
+_backend - backend name, auto or None (default: forced backend or automatic dispatch by number of elements)
+@return objects sizes [ values, unit ]
+'''
+def calculate_object_size(_target_obj_physical_dist, _target_obj_size_unit, _telescope_angular_resolution, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 1, _backend = None):
+    scales = ( _scale(HBTWN_UTM.DIST_SCALES, 'distance', _target_obj_physical_dist[1]), _scale(HBTWN_UTM.ANGLE_SCALES, 'angle', _telescope_angular_resolution[1]),
+               _scale(HBTWN_UTM.DIST_SCALES, 'distance', _target_obj_size_unit) )
+    flat = _flat_mask(_object_shape)
+    backend = select_backend(_elements_count(_target_obj_physical_dist[0], _telescope_angular_resolution[0], flat, _number_of_pixels), _backend)
+    return [ backend.object_size(_target_obj_physical_dist[0], _telescope_angular_resolution[0], flat, _number_of_pixels, scales), _target_obj_size_unit ]
+
+'''
+calculate_telescope_resolution - telescope resolution with selected backend (see CoreNumericalModule.calculate_telescope_resolution_batch)
+_telescope_parameters - telescope sizes as array: [ sizes, unit ]
+_wavelength - wavelength values as array: [ wavelengths, unit ] (default: [522.0, nm])
+_resolution_unit - telescope resolution unit (default: arcsec)
+_backend - backend name, auto or None (default: forced backend or automatic dispatch by number of elements)
+@return telescopes resolutions [ values, unit ]
+'''
+def calculate_telescope_resolution(_telescope_parameters, _wavelength = [522.0, 'nm'], _resolution_unit = 'arcsec', _backend = None):
+    scales = ( _scale(HBTWN_UTM.DIST_SCALES, 'distance', _telescope_parameters[1]), _scale(HBTWN_UTM.DIST_SCALES, 'distance', _wavelength[1]),
+               _scale(HBTWN_UTM.ANGLE_SCALES, 'angle', _resolution_unit) )
+    backend = select_backend(_elements_count(_telescope_parameters[0], _wavelength[0]), _backend)
+    return [ backend.resolution(_telescope_parameters[0], _wavelength[0], scales), _resolution_unit ]
+
+'''
+check_consistency - compare results of available backends with numpy backend on random inputs (with wrong elements)
+_elements - number of random elements (default: 1000)
+_seed - random generator seed (default: 0)
+@return dictionary backend name:maximal relative difference (NaN elements have to be equal), raise ValueError if difference exceeds CONSISTENCY_TOLERANCE
+'''
+def check_consistency(_elements = 1000, _seed = 0):
+    rng = np.random.default_rng(_seed)
+    size, dist = rng.uniform(-1.0, 1.0e5, _elements), rng.uniform(1.0e-3, 1.0e12, _elements)
+    shape = rng.choice([ HBTWN_UCM.ObjectShape.FLAT.value, HBTWN_UCM.ObjectShape.SPHERICAL.value ], _elements)
+    pixels, wavelength = rng.integers(0, 1000, _elements).astype(np.float64), rng.uniform(300.0, 1000.0, _elements)
+    resolution, telescope = rng.uniform(-1.0, 10.0, _elements), rng.uniform(-1.0, 50.0, _elements)
+    def results(_backend):
+        return ( list(calculate_telescope_size([ size, 'km' ], [ dist, 'km' ], shape, pixels, [ wavelength, 'nm' ], 'm', _backend)) +
+                 [ calculate_object_size([ dist, 'km' ], 'km', [ resolution, 'arcsec' ], shape, pixels, _backend), calculate_telescope_resolution([ telescope, 'm' ], [ wavelength, 'nm' ], 'mas', _backend) ] )
+    reference = results('numpy')
+    differences = {}
+    for name in available_backends():
+        difference = 0.0
+        for expected, result in zip(reference, results(name)):
+            expected, result = np.asarray(expected[0]), np.asarray(result[0])
+            if not np.array_equal(np.isnan(expected), np.isnan(result)):
+                raise ValueError('Backend ' + name + ' gives different wrong elements than numpy backend')
+            valid = ~np.isnan(expected)
+            difference = max(difference, float(np.max(np.abs(result[valid]-expected[valid])/np.abs(expected[valid]), initial=0.0)))
+        if difference > CONSISTENCY_TOLERANCE:
+            raise ValueError('Backend ' + name + ' relative difference ' + repr(difference) + ' exceeds ' + repr(CONSISTENCY_TOLERANCE))
+        differences[name] = difference
+    return differences
+
+
+'''
+Backend forced with HBTWN_BACKEND environment variable (unknown or not available backend is reported and automatic dispatch is used)
+'''
+if os.environ.get(ENVIRONMENT_VARIABLE):
+    try:
+        set_backend(os.environ[ENVIRONMENT_VARIABLE].strip().lower())
+    except ValueError as e:
+        LOGGER.warning(str(e) + ', automatic dispatch is used')
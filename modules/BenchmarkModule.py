@@ -0,0 +1,285 @@
+#!/bin/python3
+
+'''
+HBTWN - BenchmarkModule
+Module storage benchmark suite of scalar, unit conversion, batch, cached, parallel and compute backends calculation paths with correctness check
+against scalar reference on the same inputs, JSON reports with machine metadata and comparison of reports (regression tracking).
+Command line interface: HBTWN_benchmark.py
+HBTWN BenchmarkModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.CacheModule as HBTWN_KM
+import modules.ParallelModule as HBTWN_PM
+import modules.BackendModule as HBTWN_BEM
+
+'''
+REPORT_VERSION - version of JSON report format
+SIZES - default input sizes [rows]
+CHECK_ROWS - maximal number of rows checked against scalar reference (evenly spaced sample)
+TOLERANCE - maximal relative error of correct result
+DEFAULT_THRESHOLD - relative slow down reported as regression by compare_reports (0.1 - 10% slower)
+'''
+REPORT_VERSION = 1
+SIZES = ( 1, 10, 100, 1000, 10**4, 10**5, 10**6, 10**7 )
+CHECK_ROWS = 1000
+TOLERANCE = 1e-12
+DEFAULT_THRESHOLD = 0.1
+
+'''
+benchmark_inputs - reproducible random inputs
+_rows - number of rows
+_seed - random generator seed (default: 0)
+@return dictionary: size [km], distance [km], shape (ObjectShape values), pixels, wavelength [nm], telescope_size [m], resolution [arcsec]
+'''
+def benchmark_inputs(_rows, _seed = 0):
+    rng = np.random.default_rng(_seed)
+    return { 'size':rng.uniform(1.0, 1.0e5, _rows),
+             'distance':rng.uniform(1.0e6, 1.0e12, _rows),
+             'shape':rng.choice([ HBTWN_UCM.ObjectShape.FLAT.value, HBTWN_UCM.ObjectShape.SPHERICAL.value ], _rows),
+             'pixels':rng.integers(1, 1000, _rows).astype(np.float64),
+             'wavelength':rng.uniform(300.0, 1000.0, _rows),
+             'telescope_size':rng.uniform(0.01, 50.0, _rows),
+             'resolution':rng.uniform(1.0e-3, 10.0, _rows) }
+
+def _shape(_code):
+    return HBTWN_UCM.ObjectShape(int(_code))
+
+'''
+Scalar references - results of scalar core functions for selected rows (NaN for failed calculations)
+'''
+def reference_telescope_size(_inputs, _indices):
+    return np.array([ _value(HBTWN_CNM.calculate_telescope_size([ _inputs['size'][i], 'km' ], [ _inputs['distance'][i], 'km' ], _shape(_inputs['shape'][i]), _inputs['pixels'][i], [ _inputs['wavelength'][i], 'nm' ], 'm')[0]) for i in _indices ])
+
+def reference_object_size(_inputs, _indices):
+    return np.array([ _value(HBTWN_CNM.calculate_object_size([ _inputs['distance'][i], 'km' ], 'km', [ _inputs['resolution'][i], 'arcsec' ], _shape(_inputs['shape'][i]), _inputs['pixels'][i])) for i in _indices ])
+
+def reference_resolution(_inputs, _indices):
+    return np.array([ _value(HBTWN_CNM.calculate_telescope_resolution([ _inputs['telescope_size'][i], 'm' ], [ _inputs['wavelength'][i], 'nm' ], 'arcsec')) for i in _indices ])
+
+def reference_conversion(_inputs, _indices):
+    return np.array([ _value(HBTWN_UCM.dist_units_converter(_inputs['distance'][i], 'km', 'ly')) for i in _indices ])
+
+def _value(_quantity):
+    return math.nan if _quantity is None or _quantity[0] is None else float(_quantity[0])
+
+'''
+math_telescope_size - independent pure math formula of telescope size [m], reference of scalar core function
+'''
+def math_telescope_size(_size_km, _distance_km, _shape_code, _pixels, _wavelength_nm):
+    size_m, dist_m = _size_km*1000.0, _distance_km*1000.0
+    ratio = (size_m/_pixels)/(2.0*dist_m)
+    angle = 2.0*(math.atan(ratio) if _shape_code == HBTWN_UCM.ObjectShape.FLAT.value else math.asin(ratio))
+    return 1.22*(_wavelength_nm*1.0e-9/angle)
+
+'''
+BenchmarkCase - single benchmark
+_name - case name (group.function)
+_prepare - function (inputs, rows, context) returning function without arguments which is timed
+_result - function (result, indices) returning values of checked rows
+_reference - function (inputs, indices) returning expected values of checked rows
+_min_rows, _max_rows - range of input sizes used by case (default: all sizes)
+Context of prepare contains shared resources of run: executor - process pool of parallel cases
+'''
+class BenchmarkCase:
+    def __init__(self, _name, _prepare, _result, _reference, _min_rows = 1, _max_rows = None):
+        self.name = _name
+        self.prepare = _prepare
+        self.result = _result
+        self.reference = _reference
+        self.min_rows = _min_rows
+        self.max_rows = _max_rows
+    def accepts(self, _rows):
+        return _rows >= self.min_rows and (self.max_rows is None or _rows <= self.max_rows)
+
+def _scalar_loop(_function):
+    return lambda _inputs, _rows, _context: lambda: [ _function(_inputs, i) for i in range(_rows) ]
+
+def _scalar_results(_result, _indices):
+    return np.array([ _value(_result[i]) for i in _indices ])
+
+def _batch_results(_result, _indices):
+    # QuantityArray, [ values, unit ] list or plain array (the first result of tuple)
+    result = _result[0] if isinstance(_result, tuple) else _result
+    return np.asarray(result[0] if isinstance(result, list) else result, dtype=np.float64).reshape(-1)[_indices]
+
+def _telescope_size_scalar(_inputs, _i):
+    return HBTWN_CNM.calculate_telescope_size([ _inputs['size'][_i], 'km' ], [ _inputs['distance'][_i], 'km' ], _shape(_inputs['shape'][_i]), _inputs['pixels'][_i], [ _inputs['wavelength'][_i], 'nm' ], 'm')[0]
+
+def _telescope_size_batch(_inputs, _rows, _context):
+    return lambda: HBTWN_CNM.calculate_telescope_size_batch([ _inputs['size'], 'km' ], [ _inputs['distance'], 'km' ], _inputs['shape'], _inputs['pixels'], [ _inputs['wavelength'], 'nm' ], 'm')
+
+def _telescope_size_cached(_inputs, _rows, _context):
+    # Repeated queries (10 distinct objects), typical for interactive usage
+    core = HBTWN_KM.CachedCore()
+    return lambda: [ core.calculate_telescope_size([ _inputs['size'][i % 10], 'km' ], [ _inputs['distance'][i % 10], 'km' ], _shape(_inputs['shape'][i % 10]), _inputs['pixels'][i % 10], [ _inputs['wavelength'][i % 10], 'nm' ], 'm')[0] for i in range(_rows) ]
+
+def _cached_results(_result, _indices):
+    return np.array([ _value(_result[i]) for i in _indices ])
+
+def _cached_reference(_inputs, _indices):
+    return reference_telescope_size(_inputs, [ i % 10 for i in _indices ])
+
+def _telescope_size_parallel(_inputs, _rows, _context):
+    return lambda: HBTWN_PM.calculate_telescope_size_batch_parallel([ _inputs['size'], 'km' ], [ _inputs['distance'], 'km' ], _inputs['shape'], _inputs['pixels'], [ _inputs['wavelength'], 'nm' ], 'm', _executor=_context['executor'])
+
+def _telescope_size_backend(_name):
+    return lambda _inputs, _rows, _context: lambda: HBTWN_BEM.calculate_telescope_size([ _inputs['size'], 'km' ], [ _inputs['distance'], 'km' ], _inputs['shape'], _inputs['pixels'], [ _inputs['wavelength'], 'nm' ], 'm', _name)
+
+def _scalar_math_reference(_inputs, _indices):
+    return np.array([ math_telescope_size(_inputs['size'][i], _inputs['distance'][i], _inputs['shape'][i], _inputs['pixels'][i], _inputs['wavelength'][i]) for i in _indices ])
+
+'''
+CASES - all benchmark cases, scalar paths (and math backend) are limited to 10**5 rows (Python loop), backend cases use available backends
+'''
+CASES = ( BenchmarkCase('scalar.calculate_telescope_size', _scalar_loop(_telescope_size_scalar), _scalar_results, _scalar_math_reference, _max_rows=10**5),
+          BenchmarkCase('scalar.calculate_object_size', _scalar_loop(lambda _inputs, _i: HBTWN_CNM.calculate_object_size([ _inputs['distance'][_i], 'km' ], 'km', [ _inputs['resolution'][_i], 'arcsec' ], _shape(_inputs['shape'][_i]), _inputs['pixels'][_i])), _scalar_results,
+                        lambda _inputs, _indices: _batch_results(HBTWN_CNM.calculate_object_size_batch([ _inputs['distance'], 'km' ], 'km', [ _inputs['resolution'], 'arcsec' ], _inputs['shape'], _inputs['pixels']), _indices), _max_rows=10**5),
+          BenchmarkCase('scalar.calculate_telescope_resolution', _scalar_loop(lambda _inputs, _i: HBTWN_CNM.calculate_telescope_resolution([ _inputs['telescope_size'][_i], 'm' ], [ _inputs['wavelength'][_i], 'nm' ], 'arcsec')), _scalar_results,
+                        lambda _inputs, _indices: _batch_results(HBTWN_CNM.calculate_telescope_resolution_batch([ _inputs['telescope_size'], 'm' ], [ _inputs['wavelength'], 'nm' ], 'arcsec'), _indices), _max_rows=10**5),
+          BenchmarkCase('convert.dist_units_converter', _scalar_loop(lambda _inputs, _i: HBTWN_UCM.dist_units_converter(_inputs['distance'][_i], 'km', 'ly')), _scalar_results,
+                        lambda _inputs, _indices: HBTWN_UCM.DIST_UNITS.convert_array(_inputs['distance'], 'km', 'ly')[_indices], _max_rows=10**5),
+          BenchmarkCase('convert.convert_array', lambda _inputs, _rows, _context: lambda: HBTWN_UCM.DIST_UNITS.convert_array(_inputs['distance'], 'km', 'ly'), _batch_results, reference_conversion),
+          BenchmarkCase('batch.calculate_telescope_size_batch', _telescope_size_batch, _batch_results, reference_telescope_size),
+          BenchmarkCase('batch.calculate_object_size_batch', lambda _inputs, _rows, _context: lambda: HBTWN_CNM.calculate_object_size_batch([ _inputs['distance'], 'km' ], 'km', [ _inputs['resolution'], 'arcsec' ], _inputs['shape'], _inputs['pixels']), _batch_results, reference_object_size),
+          BenchmarkCase('batch.calculate_telescope_resolution_batch', lambda _inputs, _rows, _context: lambda: HBTWN_CNM.calculate_telescope_resolution_batch([ _inputs['telescope_size'], 'm' ], [ _inputs['wavelength'], 'nm' ], 'arcsec'), _batch_results, reference_resolution),
+          BenchmarkCase('cached.calculate_telescope_size', _telescope_size_cached, _cached_results, _cached_reference, _max_rows=10**5),
+          BenchmarkCase('parallel.calculate_telescope_size_batch_parallel', _telescope_size_parallel, _batch_results, reference_telescope_size, _min_rows=10**5) ) + tuple(
+          BenchmarkCase('backend.' + name + '.calculate_telescope_size', _telescope_size_backend(name), _batch_results, reference_telescope_size, _max_rows=10**5 if name == 'math' else None) for name in HBTWN_BEM.available_backends())
+
+'''
+machine_metadata - description of machine and software versions stored in report
+'''
+def machine_metadata():
+    try:
+        commit = subprocess.run([ 'git', 'rev-parse', 'HEAD' ], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return { 'timestamp':datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+             'platform':platform.platform(), 'machine':platform.machine(), 'processor':platform.processor(), 'cpu_count':os.cpu_count(),
+             'python':platform.python_version(), 'implementation':platform.python_implementation(), 'numpy':np.__version__, 'commit':commit }
+
+'''
+measure - time function, small inputs are called in loop until measurement lasts at least _min_time
+_function - function without arguments
+_repeat - number of measurements (default: 3)
+_min_time - minimal time of single measurement [s] (default: 0.05)
+@return list of times of single call [s] and the last result
+'''
+def measure(_function, _repeat = 3, _min_time = 0.05):
+    start_time = time.perf_counter()
+    result = _function()
+    number = max(1, int(_min_time/max(time.perf_counter() - start_time, 1e-9)))
+    times = []
+    for i in range(_repeat):
+        start_time = time.perf_counter()
+        for j in range(number):
+            result = _function()
+        times.append((time.perf_counter() - start_time)/number)
+    return times, result
+
+'''
+check_result - compare result with scalar reference on evenly spaced sample of rows
+@return maximal relative error (inf if result is NaN where reference is not)
+'''
+def check_result(_case, _inputs, _rows, _result):
+    indices = np.unique(np.linspace(0, _rows - 1, min(_rows, CHECK_ROWS)).astype(np.intp))
+    values = np.asarray(_case.result(_result, indices), dtype=np.float64)
+    expected = np.asarray(_case.reference(_inputs, indices), dtype=np.float64)
+    if not np.array_equal(np.isnan(values), np.isnan(expected)):
+        return math.inf
+    valid = ~np.isnan(expected)
+    if not np.any(valid):
+        return 0.0
+    return float(np.max(np.abs(values[valid] - expected[valid])/np.abs(expected[valid])))
+
+'''
+run_benchmarks - run benchmark cases for all input sizes
+_cases - names (or name prefixes ex. batch) of cases (default: all CASES)
+_sizes - input sizes (default: SIZES)
+_repeat - number of measurements of every case, the best time is reported (default: 3)
+_min_time - minimal time of single measurement [s] (default: 0.05)
+_workers - process pool size of parallel cases (default: number of CPU cores)
+_progress - optional function called with every result
+@return report dictionary: version, metadata (machine_metadata) and results (case, rows, best, mean, rows_per_second, max_relative_error, correct)
+'''
+def run_benchmarks(_cases = None, _sizes = SIZES, _repeat = 3, _min_time = 0.05, _workers = None, _progress = None):
+    cases = [ case for case in CASES if _cases is None or any(case.name == name or case.name.startswith(name + '.') for name in _cases) ]
+    if not cases:
+        raise ValueError('Unknown benchmark cases: ' + ', '.join(_cases))
+    results = []
+    executor = ProcessPoolExecutor(max_workers=_workers or HBTWN_PM.default_workers()) if any(case.name.startswith('parallel.') for case in cases) else None
+    context = { 'executor':executor }
+    try:
+        for rows in sorted(int(size) for size in _sizes):
+            inputs = benchmark_inputs(rows)
+            for case in cases:
+                if not case.accepts(rows):
+                    continue
+                times, result = measure(case.prepare(inputs, rows, context), _repeat, _min_time)
+                error = check_result(case, inputs, rows, result)
+                del result
+                record = { 'case':case.name, 'rows':rows, 'best':min(times), 'mean':sum(times)/len(times), 'rows_per_second':rows/min(times) if min(times) > 0.0 else math.inf,
+                           'max_relative_error':error, 'correct':error <= TOLERANCE }
+                results.append(record)
+                if _progress is not None:
+                    _progress(record)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return { 'version':REPORT_VERSION, 'metadata':machine_metadata(), 'results':results }
+
+'''
+save_report / load_report - JSON report file
+'''
+def save_report(_report, _path):
+    with open(_path, 'w', encoding='utf-8') as file:
+        json.dump(_report, file, indent=1, allow_nan=True)
+
+def load_report(_path):
+    with open(_path, 'r', encoding='utf-8') as file:
+        report = json.load(file)
+    if report.get('version') != REPORT_VERSION:
+        raise ValueError('Unsupported benchmark report version: ' + repr(report.get('version')))
+    return report
+
+'''
+compare_reports - compare best times of cases measured in both reports
+_baseline - baseline report
+_current - current report
+_threshold - relative slow down reported as regression (default: DEFAULT_THRESHOLD)
+@return list of dictionaries: case, rows, baseline, current (best times), ratio (current/baseline), regression, incorrect
+'''
+def compare_reports(_baseline, _current, _threshold = DEFAULT_THRESHOLD):
+    baseline = { (record['case'], record['rows']):record for record in _baseline['results'] }
+    comparison = []
+    for record in _current['results']:
+        reference = baseline.get((record['case'], record['rows']))
+        if reference is None:
+            continue
+        ratio = record['best']/reference['best'] if reference['best'] > 0.0 else math.inf
+        comparison.append({ 'case':record['case'], 'rows':record['rows'], 'baseline':reference['best'], 'current':record['best'], 'ratio':ratio,
+                            'regression':ratio > 1.0 + _threshold, 'incorrect':not record['correct'] })
+    return comparison
+
+'''
+format_result / format_comparison - single line text descriptions
+'''
+def format_result(_record):
+    return '%-52s %9d rows %12.4g s %12.4g rows/s  %s' % (_record['case'], _record['rows'], _record['best'], _record['rows_per_second'], 'OK' if _record['correct'] else 'WRONG (error %.3g)' % _record['max_relative_error'])
+
+def format_comparison(_record):
+    flags = ('REGRESSION ' if _record['regression'] else '') + ('WRONG' if _record['incorrect'] else '')
+    return '%-52s %9d rows %12.4g s -> %12.4g s  x%.3f  %s' % (_record['case'], _record['rows'], _record['baseline'], _record['current'], _record['ratio'], flags)
@@ -0,0 +1,195 @@
+#!/bin/python3
+
+'''
+HBTWN - CacheModule
+Module storage opt-in memoization of core calculations, inputs are normalized to SI units so equal quantities in different units share cache entry.
+Repeated calls with the same raw arguments are found by raw key first, without units conversions and normalization.
+HBTWN CacheModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import math
+import threading
+from collections import OrderedDict
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.UnitsTablesModule as HBTWN_UTM
+import modules.CoreNumericalModule as HBTWN_CNM
+
+'''
+KEY_SIGNIFICANT_BITS - number of significant bits of normalized values in cache keys (40 bits - about 12 decimal digits),
+values which differ only by unit conversion rounding (ex. [5, inch] and [127, mm]) have the same key
+'''
+KEY_SIGNIFICANT_BITS = 40
+_KEY_SCALE = float(2**KEY_SIGNIFICANT_BITS)
+_RAD_SCALE = HBTWN_UTM.ANGLE_SCALES['rad']
+
+'''
+LRUCache - bounded cache with least recently used eviction and statistics
+_maxsize - maximal number of entries (default: 1024)
+Methods:
+get - return (True, value) for cached key or (False, None), _count_miss=False for lookups followed by other lookup of the same call
+put - store value, the least recently used entry is removed when cache is full
+clear - remove all entries and reset statistics
+stats - return dictionary with hits, misses, evictions, size, maxsize and hit_rate
+'''
+class LRUCache:
+    def __init__(self, _maxsize = 1024):
+        if _maxsize < 1:
+            raise ValueError('Cache size has to be positive')
+        self.maxsize = int(_maxsize)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, _key, _count_miss = True):
+        with self._lock:
+            try:
+                value = self._entries[_key]
+            except KeyError:
+                self.misses += _count_miss
+                return False, None
+            self._entries.move_to_end(_key)
+            self.hits += 1
+            return True, value
+
+    def put(self, _key, _value):
+        with self._lock:
+            self._entries[_key] = _value
+            self._entries.move_to_end(_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return { 'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions, 'size':len(self._entries), 'maxsize':self.maxsize,
+                     'hit_rate':self.hits/lookups if lookups else 0.0 }
+
+'''
+normalized - value with mantissa rounded to KEY_SIGNIFICANT_BITS bits, raise ValueError for NaN and infinity (never equal keys)
+dist_key / angle_key - quantity [ value, unit ] converted to [m] / [rad] and normalized, used as cache keys (ImageSimulationModule.psf_key uses them as SI values)
+'''
+def normalized(_value):
+    mantissa, exponent = math.frexp(_value)
+    if not math.isfinite(mantissa):
+        raise ValueError('Cache key value has to be finite')
+    return math.ldexp(round(mantissa*_KEY_SCALE), exponent - KEY_SIGNIFICANT_BITS)
+
+def dist_key(_quantity):
+    try:
+        return normalized(float(_quantity[0])*HBTWN_UTM.DIST_SCALES[_quantity[1]])
+    except KeyError:
+        raise HBTWN_UTM.UnsupportedUnitError(_quantity[1], 'distance') from None
+
+def angle_key(_quantity):
+    try:
+        return normalized((float(_quantity[0])*HBTWN_UTM.ANGLE_SCALES[_quantity[1]])/_RAD_SCALE)
+    except KeyError:
+        raise HBTWN_UTM.UnsupportedUnitError(_quantity[1], 'angle') from None
+
+'''
+Failed calculations (None results or [None, None] from units converters) are not cached
+'''
+def _failed(_result):
+    if isinstance(_result, tuple):
+        return any(_failed(result) for result in _result)
+    return _result is None or (isinstance(_result, list) and _result[0] is None)
+
+_new_quantity = object.__new__
+
+def _copy(_result):
+    # Cached results are never shared with caller, cached Quantity value is already Python float (no conversion of constructor)
+    if type(_result) is HBTWN_UCM.Quantity:
+        copy = _new_quantity(HBTWN_UCM.Quantity)
+        copy.value, copy.unit = _result.value, _result.unit
+        return copy
+    return list(_result) if isinstance(_result, list) else _result
+
+'''
+CachedCore - CoreNumericalModule functions with LRU cache, functions have the same arguments and results as CoreNumericalModule
+_maxsize - maximal number of cached results (default: 1024)
+Every result is stored under normalized key and raw key (raw arguments), so both entries count to _maxsize.
+Inputs which can not be normalized (unknown units, not numerical values, NaN) are passed to CoreNumericalModule without caching.
+Methods:
+calculate_telescope_size, calculate_object_size, calculate_telescope_resolution - cached core functions
+stats - cache statistics (hits, misses, evictions, size, maxsize, hit_rate)
+clear - remove all cached results
+'''
+class CachedCore:
+    def __init__(self, _maxsize = 1024):
+        self.cache = LRUCache(_maxsize)
+
+    def stats(self):
+        return self.cache.stats()
+
+    def clear(self):
+        self.cache.clear()
+
+    def calculate_telescope_size(self, _target_obj_physical_size, _target_obj_physical_dist , _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 100, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm'):
+        flat = _object_shape is HBTWN_UCM.ObjectShape.FLAT
+        try:
+            raw_key = ('calculate_telescope_size', float(_target_obj_physical_size[0]), _target_obj_physical_size[1], float(_target_obj_physical_dist[0]), _target_obj_physical_dist[1],
+                       flat, float(_number_of_pixels), float(_wavelength[0]), _wavelength[1], _telescope_size_unit)
+            found, result = self.cache.get(raw_key, False)
+        except (TypeError, ValueError):
+            raw_key, found = None, False
+        if not found:
+            result = self._cached(raw_key, lambda: ('calculate_telescope_size', dist_key(_target_obj_physical_size), dist_key(_target_obj_physical_dist), flat, normalized(_number_of_pixels), dist_key(_wavelength), _telescope_size_unit),
+                                  lambda: HBTWN_CNM.calculate_telescope_size(_target_obj_physical_size, _target_obj_physical_dist, _object_shape, _number_of_pixels, _wavelength, _telescope_size_unit))
+        return _copy(result[0]), _copy(result[1])
+
+    def calculate_object_size(self, _target_obj_physical_dist, _target_obj_size_unit, _telescope_angular_resolution, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 1):
+        flat = _object_shape is HBTWN_UCM.ObjectShape.FLAT
+        try:
+            raw_key = ('calculate_object_size', float(_target_obj_physical_dist[0]), _target_obj_physical_dist[1], _target_obj_size_unit, float(_telescope_angular_resolution[0]), _telescope_angular_resolution[1],
+                       flat, float(_number_of_pixels))
+            found, result = self.cache.get(raw_key, False)
+        except (TypeError, ValueError):
+            raw_key, found = None, False
+        if not found:
+            result = self._cached(raw_key, lambda: ('calculate_object_size', dist_key(_target_obj_physical_dist), _target_obj_size_unit, angle_key(_telescope_angular_resolution), flat, normalized(_number_of_pixels)),
+                                  lambda: HBTWN_CNM.calculate_object_size(_target_obj_physical_dist, _target_obj_size_unit, _telescope_angular_resolution, _object_shape, _number_of_pixels))
+        return _copy(result)
+
+    def calculate_telescope_resolution(self, _telescope_parameters, _wavelength = [522.0, 'nm'], _resolution_unit = 'arcsec'):
+        try:
+            raw_key = ('calculate_telescope_resolution', float(_telescope_parameters[0]), _telescope_parameters[1], float(_wavelength[0]), _wavelength[1], _resolution_unit)
+            found, result = self.cache.get(raw_key, False)
+        except (TypeError, ValueError):
+            raw_key, found = None, False
+        if not found:
+            result = self._cached(raw_key, lambda: ('calculate_telescope_resolution', dist_key(_telescope_parameters), dist_key(_wavelength), _resolution_unit),
+                                  lambda: HBTWN_CNM.calculate_telescope_resolution(_telescope_parameters, _wavelength, _resolution_unit))
+        return _copy(result)
+
+    def _cached(self, _raw_key, _key, _calculate):
+        # Called after raw key miss (raw key hit needs no normalization), inputs which can not be keys (TypeError, ValueError) are not cached.
+        # Raw key of NaN input is never stored, because NaN can not be normalized.
+        if _raw_key is None:
+            return _calculate()
+        try:
+            key = _key()
+        except (TypeError, ValueError):
+            return _calculate()
+        found, value = self.cache.get(key)
+        if not found:
+            value = _calculate()
+            if _failed(value):
+                return value
+            self.cache.put(key, value)
+        self.cache.put(_raw_key, value)
+        return value
@@ -0,0 +1,200 @@
+#!/bin/python3
+
+'''
+HBTWN - CatalogStreamModule
+Module storage streaming catalog processing, objects are read from CSV/JSONL, calculated in vectorized blocks and written incrementally.
+HBTWN CatalogStreamModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import csv
+import json
+import math
+import itertools
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+import modules.ResultStoreModule as HBTWN_RSM
+
+'''
+CATALOG_COLUMNS - catalog input columns with default values (None - column is required)
+RESULT_COLUMNS - catalog output columns
+INPUT_FORMATS / OUTPUT_FORMATS - supported files formats
+'''
+CATALOG_COLUMNS = { 'name':'', 'size':None, 'size_unit':None, 'distance':None, 'distance_unit':None, 'shape':'SPHERICAL', 'pixels':100, 'wavelength':522.0, 'wavelength_unit':'nm' }
+RESULT_COLUMNS = ( 'name', 'telescope_size', 'telescope_size_unit', 'angular_size', 'angular_size_unit', 'status' )
+INPUT_FORMATS = ( 'csv', 'jsonl' )
+OUTPUT_FORMATS = ( 'csv', 'jsonl' )
+
+'''
+detect_format - detect file format from file name extension
+_path - file path
+_default - format used when extension is unknown (default: csv)
+@return one of csv/jsonl
+'''
+def detect_format(_path, _default = 'csv'):
+    path = str(_path).lower()
+    if path.endswith('.jsonl') or path.endswith('.ndjson') or path.endswith('.json'):
+        return 'jsonl'
+    if path.endswith('.csv'):
+        return 'csv'
+    return _default
+
+'''
+read_blocks - read catalog as blocks of columns (generator, file is never loaded at once)
+Missing values of optional columns are replaced by defaults, missing values of required columns give NaN results.
+_file - opened text file
+_format - csv/jsonl
+@return generator of dictionaries column:list of values, raise ValueError with line number for jsonl line which is not JSON object
+@return generator of dictionaries column:list of values
+'''
+def read_blocks(_file, _format, _block_size):
+    if _format == 'csv':
+        # Empty lines are skipped
+        reader = filter(None, csv.reader(_file, skipinitialspace=True))
+        header = [ column.strip() for column in next(reader, []) ]
+        while True:
+            rows = list(itertools.islice(reader, _block_size))
+            if not rows:
+                return
+            # Short rows are padded with empty values, zip would truncate all columns to the shortest row
+            if min(map(len, rows)) < len(header):
+                rows = [ row + ['']*(len(header)-len(row)) for row in rows ]
+            columns = dict(zip(header, zip(*rows)))
+            yield _block_columns(columns.get, len(rows))
+    elif _format == 'jsonl':
+        lines = ( (number, line) for number, line in enumerate(_file, 1) if line.strip() )
+        while True:
+            rows = [ _jsonl_row(number, line) for number, line in itertools.islice(lines, _block_size) ]
+            if not rows:
+                return
+            yield _block_columns(lambda column: [ row.get(column) for row in rows ] if any(column in row for row in rows) else None, len(rows))
+    else:
+        raise ValueError('Unsupported catalog format: ' + repr(_format))
+
+def _jsonl_row(_number, _line):
+    # Every line has to be JSON object, wrong lines stop processing with ValueError (reported as input error)
+    try:
+        row = json.loads(_line)
+    except ValueError as e:
+        raise ValueError('Line ' + str(_number) + ': wrong JSON: ' + str(e)) from None
+    if not isinstance(row, dict):
+        raise ValueError('Line ' + str(_number) + ': JSON object expected, got ' + type(row).__name__)
+    return row
+
+def _block_columns(_column, _rows):
+    block = {}
+    for column, default in CATALOG_COLUMNS.items():
+        values = _column(column)
+        if values is None:
+            if default is None:
+                raise ValueError('Catalog column ' + repr(column) + ' is required')
+            values = [ default ]*_rows
+        elif default is not None and ('' in values or None in values):
+            values = [ default if value is None or value == '' else value for value in values ]
+        block[column] = values
+    return block
+
+'''
+calculate_block - calculate telescope size for catalog block with calculate_telescope_size_batch
+Unknown units and wrong values give NaN results only for affected rows, reason is stored in status array.
+_block - dictionary column:list of values (from read_blocks)
+_telescope_size_unit - telescope size unit
+@return telescope sizes array, angular sizes (arcsec) array and status array
+'''
+def calculate_block(_block, _telescope_size_unit):
+    telescope_size, angular_size, status = HBTWN_CNM.calculate_telescope_size_batch(
+        [ HBTWN_STM.float_values(_block['size']), HBTWN_UCM.DIST_UNITS.codes(_block['size_unit'], _strict=False) ],
+        [ HBTWN_STM.float_values(_block['distance']), HBTWN_UCM.DIST_UNITS.codes(_block['distance_unit'], _strict=False) ],
+        HBTWN_UCM.object_shape_codes(_block['shape']),
+        HBTWN_STM.float_values(_block['pixels']),
+        [ HBTWN_STM.float_values(_block['wavelength']), HBTWN_UCM.DIST_UNITS.codes(_block['wavelength_unit'], _strict=False) ],
+        _telescope_size_unit, _return_status=True)
+    return telescope_size[0], angular_size[0], status
+
+'''
+ResultWriter - incremental results writer
+_file - opened text file
+_format - csv/jsonl
+_telescope_size_unit - telescope size unit written with results
+Methods:
+write_block - write results of single block
+'''
+class ResultWriter:
+    def __init__(self, _file, _format, _telescope_size_unit):
+        if _format not in OUTPUT_FORMATS:
+            raise ValueError('Unsupported output format: ' + repr(_format))
+        self._file = _file
+        self._format = _format
+        self._telescope_size_unit = _telescope_size_unit
+        if _format == 'csv':
+            self._csv = csv.writer(_file, lineterminator='\n')
+            self._csv.writerow(RESULT_COLUMNS)
+
+    def write_block(self, _names, _telescope_size, _angular_size, _status):
+        telescope_size = _telescope_size.tolist()
+        angular_size = _angular_size.tolist()
+        status = HBTWN_STM.STATUS_NAMES[_status].tolist()
+        if self._format == 'csv':
+            self._csv.writerows(zip(_names, telescope_size, itertools.repeat(self._telescope_size_unit), angular_size, itertools.repeat('arcsec'), status))
+        else:
+            self._file.writelines(json.dumps(dict(zip(RESULT_COLUMNS, (name, _json_float(size), self._telescope_size_unit, _json_float(angle), 'arcsec', code)))) + '\n' for name, size, angle, code in zip(_names, telescope_size, angular_size, status))
+
+def _json_float(_value):
+    return _value if math.isfinite(_value) else None
+
+'''
+process_catalog - stream catalog from input file to output file, memory usage depends only on block size
+_input - opened input text file
+_output - opened output text file
+_input_format - csv/jsonl (default: csv)
+_output_format - csv/jsonl (default: csv)
+_block_size - number of rows calculated at once (default: 65536)
+_telescope_size_unit - telescope size unit (default: mm)
+@return number of processed rows
+'''
+def process_catalog(_input, _output, _input_format = 'csv', _output_format = 'csv', _block_size = 65536, _telescope_size_unit = 'mm'):
+    HBTWN_UCM.DIST_UNITS.code(_telescope_size_unit)
+    writer = ResultWriter(_output, _output_format, _telescope_size_unit)
+    rows = 0
+    for block in read_blocks(_input, _input_format, _block_size):
+        telescope_size, angular_size, status = calculate_block(block, _telescope_size_unit)
+        writer.write_block(block['name'], telescope_size, angular_size, status)
+        rows += len(telescope_size)
+    return rows
+
+'''
+process_catalog_to_store - stream catalog into appendable result store (columns telescope_size, angular_size, status),
+row i of store columns is result of catalog row i. Every block is appended with hash of its input rows, interrupted run
+started again reads catalog with stored block size, checks hashes of completed blocks and skips their calculation.
+_input - opened input text file
+_path - result store directory
+_input_format - csv/jsonl (default: csv)
+_block_size - number of rows calculated at once, stored block size is used when run is resumed (default: 65536)
+_telescope_size_unit - telescope size unit (default: mm)
+_resume - continue existing store (default: True), store of other catalog or settings raises ValueError
+@return number of rows in store
+'''
+def process_catalog_to_store(_input, _path, _input_format = 'csv', _block_size = 65536, _telescope_size_unit = 'mm', _resume = True):
+    HBTWN_UCM.DIST_UNITS.code(_telescope_size_unit)
+    settings_hash = HBTWN_RSM.inputs_hash(_input_format, _telescope_size_unit)
+    if _resume and HBTWN_RSM.exists(_path):
+        store = HBTWN_RSM.open_store(_path, 'r+', settings_hash)
+    else:
+        store = HBTWN_RSM.create_store(_path, { 'telescope_size':(np.float64, _telescope_size_unit), 'angular_size':(np.float64, 'arcsec'), 'status':(HBTWN_STM.STATUS_DTYPE, None) },
+                                       _inputs_hash=settings_hash, _attributes={ 'kind':'catalog', 'block_size':int(_block_size) }, _overwrite=True)
+    if store.complete:
+        store.set_complete(False)
+    completed = store.chunk_hashes()
+    for chunk, block in enumerate(read_blocks(_input, _input_format, store.attributes['block_size'])):
+        block_hash = HBTWN_RSM.inputs_hash(block)
+        if chunk < len(completed):
+            if completed[chunk] != block_hash:
+                raise ValueError('Catalog block ' + str(chunk) + ' differs from block stored in ' + repr(_path))
+            continue
+        telescope_size, angular_size, status = calculate_block(block, _telescope_size_unit)
+        store.append({ 'telescope_size':telescope_size, 'angular_size':angular_size, 'status':status }, block_hash)
+    store.set_complete()
+    return store.rows
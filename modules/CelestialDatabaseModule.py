@@ -0,0 +1,150 @@
+#!/bin/python3
+
+'''
+HBTWN - CelestialDatabaseModule
+Module storage celestial objects database (SQLite), objects are stored in SI units with precomputed angular sizes.
+HBTWN CelestialDatabaseModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import sqlite3
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+
+'''
+PREDEFINED_OBJECTS - predefined celestial objects (example distances from Earth): (name, [ size, unit ], [ distance, unit ], shape)
+'''
+PREDEFINED_OBJECTS = [
+    ('Sun', [ 1392700.0, 'km' ], [ 1.0, 'au' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Moon', [ 3474.8, 'km' ], [ 384400.0, 'km' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Mercury', [ 2*2439.7, 'km' ], [ 0.61, 'au' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Venus', [ 2*6051.8, 'km' ], [ 0.28, 'au' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Mars', [ 2*3389.5, 'km' ], [ 0.52, 'au' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Jupiter', [ 2*69911.0, 'km' ], [ 600000000.0, 'km' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Saturn', [ 2*58232.0, 'km' ], [ 8.5, 'au' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Uranus', [ 2*25362.0, 'km' ], [ 18.2, 'au' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Neptune', [ 2*24622.0, 'km' ], [ 29.1, 'au' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Pluto', [ 2*1188.3, 'km' ], [ 33.0, 'au' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+    ('Moon lander Apollo', [ 9.4, 'm' ], [ 364397.0, 'km' ], HBTWN_UCM.ObjectShape.FLAT),
+    ('Earth from Proxima Centauri', [ 2*6371.0, 'km' ], [ 1.3020, 'pc' ], HBTWN_UCM.ObjectShape.SPHERICAL),
+]
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    size_m REAL NOT NULL,
+    distance_m REAL NOT NULL,
+    shape INTEGER NOT NULL,
+    angular_size_arcsec REAL
+);
+CREATE INDEX IF NOT EXISTS objects_angular_size ON objects (angular_size_arcsec);
+CREATE INDEX IF NOT EXISTS objects_distance ON objects (distance_m);
+CREATE INDEX IF NOT EXISTS objects_name ON objects (name);
+'''
+
+_COLUMNS = ( 'id', 'name', 'size_m', 'distance_m', 'shape', 'angular_size_arcsec' )
+
+'''
+CelestialObjectDatabase - celestial objects catalog stored in SQLite database
+_path - database file path (default: in-memory database)
+Every object is stored with size and distance in [m] and angular size in [arcsec] calculated at insert time,
+queries by angular size and distance use indexes and never calculate over the whole table.
+Methods:
+insert_object - insert single object: name, [ size, unit ], [ distance, unit ], shape
+insert_objects - insert many objects at once: names, [ sizes, unit(s) ], [ distances, unit(s) ], shapes (vectorized angular size calculation)
+insert_predefined - insert PREDEFINED_OBJECTS
+count - number of objects in database
+find - objects with given name
+objects_larger_than - objects with angular size larger than [ angle, unit ], sorted by angular size
+objects_within - objects closer than [ distance, unit ], sorted by distance
+telescope_sizes_within - telescope size needed for every object closer than [ distance, unit ]
+query_plan - SQLite query plan of query used by method (for checking index usage)
+close - close database
+Query methods return dictionary column:NumPy array with columns: id, name, size_m, distance_m, shape, angular_size_arcsec
+'''
+class CelestialObjectDatabase:
+    def __init__(self, _path = ':memory:'):
+        self._connection = sqlite3.connect(_path)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, _type, _value, _traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def insert_object(self, _name, _target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL):
+        return self.insert_objects([ _name ], [ [ _target_obj_physical_size[0] ], _target_obj_physical_size[1] ], [ [ _target_obj_physical_dist[0] ], _target_obj_physical_dist[1] ], [ int(_object_shape) ])
+
+    def insert_objects(self, _names, _target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL):
+        size_m = HBTWN_UCM.DIST_UNITS.convert_array(_target_obj_physical_size[0], _target_obj_physical_size[1], 'm')
+        dist_m = HBTWN_UCM.DIST_UNITS.convert_array(_target_obj_physical_dist[0], _target_obj_physical_dist[1], 'm')
+        shapes = HBTWN_UCM.object_shape_codes(int(_object_shape) if isinstance(_object_shape, HBTWN_UCM.ObjectShape) else _object_shape)
+        size_m, dist_m, shapes = np.broadcast_arrays(size_m, dist_m, shapes)
+        angular_size = HBTWN_CNM.calculate_angular_size_batch([ size_m, 'm' ], [ dist_m, 'm' ], shapes, 'arcsec')[0]
+        # NaN angular size (ex. spherical object larger than its distance) is stored as NULL
+        angular_size = np.where(np.isnan(angular_size), None, angular_size)
+        names = list(_names)
+        if len(names) != len(size_m):
+            raise ValueError('Number of names and objects is different')
+        with self._connection:
+            self._connection.executemany('INSERT INTO objects (name, size_m, distance_m, shape, angular_size_arcsec) VALUES (?, ?, ?, ?, ?)',
+                                         zip(names, size_m.tolist(), dist_m.tolist(), shapes.tolist(), angular_size.tolist()))
+        return len(names)
+
+    def insert_predefined(self):
+        for name, size, distance, shape in PREDEFINED_OBJECTS:
+            self.insert_object(name, size, distance, shape)
+        return len(PREDEFINED_OBJECTS)
+
+    def count(self):
+        return self._connection.execute('SELECT COUNT(*) FROM objects').fetchone()[0]
+
+    def find(self, _name):
+        return self._select('SELECT ' + ', '.join(_COLUMNS) + ' FROM objects WHERE name = ? ORDER BY id', (_name,))
+
+    def objects_larger_than(self, _angular_size, _limit = None):
+        return self._select(*self._larger_than_query(_angular_size, _limit))
+
+    def objects_within(self, _distance, _limit = None):
+        return self._select(*self._within_query(_distance, _limit))
+
+    def telescope_sizes_within(self, _distance, _number_of_pixels = 100, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm'):
+        objects = self.objects_within(_distance)
+        telescope_size = HBTWN_CNM.calculate_telescope_size_batch([ objects['size_m'], 'm' ], [ objects['distance_m'], 'm' ], objects['shape'], _number_of_pixels, _wavelength, _telescope_size_unit)[0]
+        return objects, telescope_size
+
+    def query_plan(self, _method, *_arguments):
+        query, parameters = { 'objects_larger_than':self._larger_than_query, 'objects_within':self._within_query }[_method](*_arguments)
+        return [ row[-1] for row in self._connection.execute('EXPLAIN QUERY PLAN ' + query, parameters) ]
+
+    def _larger_than_query(self, _angular_size, _limit = None):
+        angular_size = HBTWN_UCM.ANGLE_UNITS.convert(float(_angular_size[0]), _angular_size[1], 'arcsec')
+        return self._limited('SELECT ' + ', '.join(_COLUMNS) + ' FROM objects WHERE angular_size_arcsec > ? ORDER BY angular_size_arcsec', (angular_size,), _limit)
+
+    def _within_query(self, _distance, _limit = None):
+        distance = HBTWN_UCM.DIST_UNITS.convert(float(_distance[0]), _distance[1], 'm')
+        return self._limited('SELECT ' + ', '.join(_COLUMNS) + ' FROM objects WHERE distance_m <= ? ORDER BY distance_m', (distance,), _limit)
+
+    def _limited(self, _query, _parameters, _limit):
+        if _limit is None:
+            return _query, _parameters
+        return _query + ' LIMIT ?', _parameters + (int(_limit),)
+
+    def _select(self, _query, _parameters):
+        rows = self._connection.execute(_query, _parameters).fetchall()
+        columns = list(zip(*rows)) if rows else [ () ]*len(_COLUMNS)
+        result = {}
+        for name, values in zip(_COLUMNS, columns):
+            if name == 'name':
+                result[name] = np.array(values, dtype=object)
+            elif name in ('id', 'shape'):
+                result[name] = np.array(values, dtype=np.int64)
+            else:
+                result[name] = np.array([ np.nan if value is None else value for value in values ], dtype=np.float64)
+        return result
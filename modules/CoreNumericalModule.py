@@ -7,27 +7,36 @@ HBTWN CoreNumericalModule  Copyright (C) 2021  Jan Bielański
 '''
 # 3-RD party dependency
 import numpy as np
+import logging
 from enum import Enum
 
 # Project modules
 import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.StatusModule as HBTWN_STM
+import modules.MetricsModule as HBTWN_MM
+
+'''
+LOGGER - module logger, scalar functions report failures as warnings (nothing is written to stdout)
+'''
+LOGGER = logging.getLogger(__name__)
 
 '''
 calculate_telescope_size - calculate telescope size which is needed to see object in input resolution
-_target_obj_physical_size - target object physical size as array: [ size, unit ]
-_target_obj_physical_dist - target object physical distance as array: [ distance, unit ]
+_target_obj_physical_size - target object physical size as array: [ size, unit ] or Quantity
+_target_obj_physical_dist - target object physical distance as array: [ distance, unit ] or Quantity
 _object_shape - object shape (default: ObjectShape.SPHERICAL)
 _number_of_pixels - number of pixels on image (default: 100)
 _wavelength - wavelength value (default: [522.0, nm])
 _telescope_size_unit - telescope size unit (default: mm)
-@return calculated telescope size value and unit as array and object size in arcsec
+@return calculated telescope size and object size in arcsec as Quantity (behaves like array [ value, unit ])
 '''
 def calculate_telescope_size(_target_obj_physical_size, _target_obj_physical_dist , _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 100, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm'):
 
     try:
-        size_m = HBTWN_UCM.dist_units_converter(_target_obj_physical_size[0], _target_obj_physical_size[1], 'm')
-        size_scaled_m = [ size_m[0]*(1.0/_number_of_pixels), size_m[1] ]
-        dist_m = HBTWN_UCM.dist_units_converter(_target_obj_physical_dist[0], _target_obj_physical_dist[1], 'm')
+        # Input quantities are converted with registry directly (no intermediate [ value, unit ] objects)
+        size_m = HBTWN_UCM.DIST_UNITS.convert(_target_obj_physical_size[0], _target_obj_physical_size[1], 'm')
+        size_scaled_m = size_m*(1.0/_number_of_pixels)
+        dist_m = HBTWN_UCM.DIST_UNITS.convert(_target_obj_physical_dist[0], _target_obj_physical_dist[1], 'm')
 
         '''
         Angular size of objects in radians and arcsec
@@ -37,15 +46,14 @@ def calculate_telescope_size(_target_obj_physical_size, _target_obj_physical_dis
         angular_size_in_rads = 0.0
         angular_size_in_rads_for_pixel = 0.0
         if _object_shape is HBTWN_UCM.ObjectShape.FLAT:
-            angular_size_in_rads = 2.0 * np.arctan(size_m[0]/(dist_m[0]+dist_m[0]))
-            angular_size_in_rads_for_pixel = 2.0 * np.arctan(size_scaled_m[0]/(dist_m[0]+dist_m[0]))
+            angular_size_in_rads = 2.0 * np.arctan(size_m/(dist_m+dist_m))
+            angular_size_in_rads_for_pixel = 2.0 * np.arctan(size_scaled_m/(dist_m+dist_m))
         else:
             _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-            angular_size_in_rads = 2.0 * np.arcsin(size_m[0]/(dist_m[0]+dist_m[0]))
-            angular_size_in_rads_for_pixel = 2.0 * np.arcsin(size_scaled_m[0]/(dist_m[0]+dist_m[0]))
+            angular_size_in_rads = 2.0 * np.arcsin(size_m/(dist_m+dist_m))
+            angular_size_in_rads_for_pixel = 2.0 * np.arcsin(size_scaled_m/(dist_m+dist_m))
 
-        angular_size_in_arcsec = HBTWN_UCM.angle_units_converter(angular_size_in_rads, 'rad', 'arcsec')[0]
-        angular_size_in_arcsec_for_pixel = HBTWN_UCM.angle_units_converter(angular_size_in_rads_for_pixel, 'rad', 'arcsec')[0]
+        angular_size_in_arcsec = HBTWN_UCM.ANGLE_UNITS.convert(angular_size_in_rads, 'rad', 'arcsec')
 
         '''
         Telescope angular resolution
@@ -53,15 +61,15 @@ def calculate_telescope_size(_target_obj_physical_size, _target_obj_physical_dis
         D = 1.22 * (lambda/theta)
         '''
 
-        wavelength_m = HBTWN_UCM.dist_units_converter(_wavelength[0],_wavelength[1],'m')
+        wavelength_m = HBTWN_UCM.DIST_UNITS.convert(_wavelength[0],_wavelength[1],'m')
 
-        D = 1.22*(wavelength_m[0]/angular_size_in_rads_for_pixel)
+        D = 1.22*(wavelength_m/angular_size_in_rads_for_pixel)
         telescope_diameter = HBTWN_UCM.dist_units_converter(D,'m',_telescope_size_unit)
 
-        return telescope_diameter, [ angular_size_in_arcsec, 'arcsec' ]
+        return telescope_diameter, HBTWN_UCM.Quantity(angular_size_in_arcsec, 'arcsec')
 
-    except TypeError as e:
-        print('Calculation failure!!!')
+    except (TypeError, HBTWN_UCM.UnsupportedUnitError) as e:
+        LOGGER.warning('Calculation failure!!!')
         return None, None
 
 
@@ -72,13 +80,13 @@ _target_obj_size_unit - expected unit for object size: unit
 _telescope_angular_resolution - telescope angular resolution: [ angular resolution, unit ]
 _object_shape - object shape (default: ObjectShape.SPHERICAL)
 _number_of_pixels - number of pixels on image (default: 1)
-@return calculated object size in given unit
+@return calculated object size in given unit as Quantity
 '''
 def calculate_object_size(_target_obj_physical_dist, _target_obj_size_unit, _telescope_angular_resolution, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 1):
 
     try:
-        dist_m = HBTWN_UCM.dist_units_converter(_target_obj_physical_dist[0], _target_obj_physical_dist[1], 'm')
-        angular_size_in_rads = HBTWN_UCM.angle_units_converter(_telescope_angular_resolution[0], _telescope_angular_resolution[1], 'rad')[0]
+        dist_m = HBTWN_UCM.DIST_UNITS.convert(_target_obj_physical_dist[0], _target_obj_physical_dist[1], 'm')
+        angular_size_in_rads = HBTWN_UCM.ANGLE_UNITS.convert(_telescope_angular_resolution[0], _telescope_angular_resolution[1], 'rad')
 
         '''
         Observed object diameter in m for flat and spherical objects
@@ -96,18 +104,18 @@ def calculate_object_size(_target_obj_physical_dist, _target_obj_size_unit, _tel
 
         object_size_in_m = 0.0
         if _object_shape is HBTWN_UCM.ObjectShape.FLAT:
-            object_size_in_m = np.tan(angular_size_in_rads*0.5)*(2.0*dist_m[0])
+            object_size_in_m = np.tan(angular_size_in_rads*0.5)*(2.0*dist_m)
         else:
             _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL
-            object_size_in_m = np.sin(angular_size_in_rads*0.5)*(2.0*dist_m[0])
+            object_size_in_m = np.sin(angular_size_in_rads*0.5)*(2.0*dist_m)
 
         # Scale object
         object_size_in_m = object_size_in_m * _number_of_pixels
 
         return HBTWN_UCM.dist_units_converter(object_size_in_m,'m',_target_obj_size_unit)
 
-    except TypeError as e:
-        print('Calculation failure!!!')
+    except (TypeError, HBTWN_UCM.UnsupportedUnitError) as e:
+        LOGGER.warning('Calculation failure!!!')
         return None
 
 '''
@@ -115,24 +123,395 @@ calculate_telescope_resolution - calculate telescope angular resolution
 _telescope_parameters - telescope size as array: [size, unit]
 _wavelength - wavelength value (default: [522.0, nm])
 _resolution_unit - telescope resolution unit (default: arcsec)
-@return telescope resolution as array resolution and unit
+@return telescope resolution as Quantity (resolution and unit)
 '''
 def calculate_telescope_resolution(_telescope_parameters, _wavelength = [522.0, 'nm'], _resolution_unit = 'arcsec'):
     try:
 
-        size_m = HBTWN_UCM.dist_units_converter(_telescope_parameters[0], _telescope_parameters[1], 'm')
-        wavelength_m = HBTWN_UCM.dist_units_converter(_wavelength[0],_wavelength[1],'m')
+        size_m = HBTWN_UCM.DIST_UNITS.convert(_telescope_parameters[0], _telescope_parameters[1], 'm')
+        wavelength_m = HBTWN_UCM.DIST_UNITS.convert(_wavelength[0],_wavelength[1],'m')
 
         '''
         Telescope angular resolution
         theta [rad] = 1.22 * ( lambda [m] / D [m] ), where lambda - wavelength, D - telescope diameter
         '''
-        theta = 1.22*(wavelength_m[0]/size_m[0])
+        theta = 1.22*(wavelength_m/size_m)
 
-        telescope_resolution = HBTWN_UCM.angle_units_converter(theta, 'rad', 'arcsec')
+        telescope_resolution = HBTWN_UCM.angle_units_converter(theta, 'rad', _resolution_unit)
         return telescope_resolution
 
-    except TypeError as e:
-        print('Calculation failure!!!')
+    except (TypeError, HBTWN_UCM.UnsupportedUnitError) as e:
+        LOGGER.warning('Calculation failure!!!')
         return None
 
+
+
+'''
+object_shape_mask - per-element FLAT mask used by batch functions instead of the scalar if/else shape branch
+_object_shape - single ObjectShape or array of shapes (ObjectShape, numerical values or names FLAT/SPHERICAL)
+_shape - shape of the evaluated batch
+@return boolean array, True for FLAT objects, False for SPHERICAL (and any other shape, same as scalar functions)
+'''
+def object_shape_mask(_object_shape, _shape):
+    if isinstance(_object_shape, HBTWN_UCM.ObjectShape):
+        return np.full(_shape, _object_shape is HBTWN_UCM.ObjectShape.FLAT)
+    return np.broadcast_to(HBTWN_UCM.object_shape_codes(_object_shape) == HBTWN_UCM.ObjectShape.FLAT.value, _shape)
+
+
+'''
+angular_size_rads - angular size of objects in radians, FLAT objects use arctan, all other objects use arcsin (same as scalar branch)
+_size_m - objects sizes in [m]
+_double_dist_m - doubled objects distances in [m]
+_flat - FLAT objects mask (from object_shape_mask)
+_shape - shape of the evaluated batch
+@return array with angular sizes in radians
+'''
+def angular_size_rads(_size_m, _double_dist_m, _flat, _shape):
+    angular_size = np.empty(_shape)
+    with np.errstate(invalid='ignore'):
+        ratio = np.broadcast_to(_size_m/_double_dist_m, _shape)
+        np.arctan(ratio, out=angular_size, where=_flat)
+        np.arcsin(ratio, out=angular_size, where=~_flat)
+    angular_size *= 2.0
+    return angular_size
+
+
+'''
+Batch functions error model (StatusModule): wrong elements give NaN results, status codes are returned with _return_status.
+_strict - False (default, never raise), True (raise CalculationError for any wrong element) or collection of CalculationStatus which raise
+_return_status - return status array (CalculationStatus values) as the last result (default: False)
+Batch functions accept [ values, unit ] lists and QuantityArray, results are QuantityArray (behave like [ values, unit ]).
+Status masks are built only when fast check of whole batch (positive_finite) fails.
+'''
+def _from_base(_values, _registry, _base_unit, _unit, _status):
+    if _unit not in _registry:
+        HBTWN_STM.mark(_status, True, HBTWN_STM.CalculationStatus.UNSUPPORTED_UNIT)
+        return np.full(np.shape(_values), np.nan)
+    return np.asarray(_registry.convert(_values, _base_unit, _unit), dtype=np.float64)
+
+def _batch_shape(_arrays, _object_shape):
+    return np.broadcast_shapes(*(np.shape(array) for array in _arrays), np.shape(_object_shape) if not isinstance(_object_shape, HBTWN_UCM.ObjectShape) else ())
+
+def _finish(_status, _results, _strict, _return_status):
+    HBTWN_STM.finish(_status, _results, _strict)
+    return _status if _return_status else None
+
+
+'''
+calculate_angular_size_batch - calculate angular size of objects on sky (the first stage of calculate_telescope_size_batch)
+_target_obj_physical_size - target object physical sizes as array: [ sizes, unit or array of units ]
+_target_obj_physical_dist - target object physical distances as array: [ distances, unit or array of units ]
+_object_shape - object shape or array of shapes (default: ObjectShape.SPHERICAL)
+_angular_size_unit - angular size unit (default: arcsec)
+_strict, _return_status - error model (see above)
+@return objects angular sizes and unit as array (and status array)
+'''
+def calculate_angular_size_batch(_target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _angular_size_unit = 'arcsec', _strict = False, _return_status = False):
+
+    size_m, size, size_scales = HBTWN_STM.to_base(_target_obj_physical_size, HBTWN_UCM.DIST_UNITS, 'm')
+    dist_m, dist, dist_scales = HBTWN_STM.to_base(_target_obj_physical_dist, HBTWN_UCM.DIST_UNITS, 'm')
+
+    shape = _batch_shape((size_m, dist_m, size_scales, dist_scales), _object_shape)
+    flat = object_shape_mask(_object_shape, shape)
+
+    angular_size_in_rads = angular_size_rads(size_m, dist_m+dist_m, flat, shape)
+
+    status = HBTWN_STM.new_status(shape)
+    if not (HBTWN_STM.positive_finite(size, dist, size_scales, dist_scales) and np.isfinite(np.sum(angular_size_in_rads))):
+        HBTWN_STM.mark_input(status, size, size_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_SIZE)
+        HBTWN_STM.mark_input(status, dist, dist_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_DISTANCE)
+        HBTWN_STM.mark(status, (size_m > dist_m+dist_m) & ~flat, HBTWN_STM.CalculationStatus.SIZE_EXCEEDS_DISTANCE)
+    angular_size = _from_base(angular_size_in_rads, HBTWN_UCM.ANGLE_UNITS, 'rad', _angular_size_unit, status)
+
+    status = _finish(status, [ angular_size ], _strict, _return_status)
+    result = HBTWN_UCM.QuantityArray(angular_size, _angular_size_unit, HBTWN_UCM.ANGLE_UNITS)
+    return (result, status) if _return_status else result
+
+
+'''
+TelescopeSizeGeometry - wavelength independent stage of calculate_telescope_size_batch (depends on sizes, distances, shapes and pixels)
+Fields:
+shape - batch shape of geometry stage
+angular_size_in_rads_for_pixel - angular size of single pixel [rad]
+angular_size_in_arcsec - objects angular sizes [arcsec]
+status - status array of geometry inputs (wavelength errors are added by telescope size stage)
+'''
+class TelescopeSizeGeometry:
+    def __init__(self, _angular_size_in_rads_for_pixel, _angular_size_in_arcsec, _status):
+        self.shape = _status.shape
+        self.angular_size_in_rads_for_pixel = _angular_size_in_rads_for_pixel
+        self.angular_size_in_arcsec = _angular_size_in_arcsec
+        self.status = _status
+
+'''
+calculate_telescope_size_geometry - the first stage of calculate_telescope_size_batch: units conversions, arctan/arcsin of object and single pixel
+_target_obj_physical_size - target object physical sizes as array: [ sizes, unit or array of units ]
+_target_obj_physical_dist - target object physical distances as array: [ distances, unit or array of units ]
+_object_shape - object shape or array of shapes (default: ObjectShape.SPHERICAL)
+_number_of_pixels - number of pixels on image, number or array (default: 100)
+@return TelescopeSizeGeometry
+'''
+def calculate_telescope_size_geometry(_target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 100):
+
+    size_m, size, size_scales = HBTWN_STM.to_base(_target_obj_physical_size, HBTWN_UCM.DIST_UNITS, 'm')
+    dist_m, dist, dist_scales = HBTWN_STM.to_base(_target_obj_physical_dist, HBTWN_UCM.DIST_UNITS, 'm')
+    number_of_pixels = HBTWN_STM.float_values(_number_of_pixels)
+
+    shape = _batch_shape((size_m, dist_m, number_of_pixels, size_scales, dist_scales), _object_shape)
+    flat = object_shape_mask(_object_shape, shape)
+
+    with np.errstate(divide='ignore'):
+        size_scaled_m = size_m*(1.0/number_of_pixels)
+    double_dist_m = dist_m+dist_m
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angular_size_in_rads = angular_size_rads(size_m, double_dist_m, flat, shape)
+        angular_size_in_rads_for_pixel = angular_size_rads(size_scaled_m, double_dist_m, flat, shape)
+
+        angular_size_in_arcsec = np.asarray(HBTWN_UCM.ANGLE_UNITS.convert(angular_size_in_rads, 'rad', 'arcsec'))
+
+    status = HBTWN_STM.new_status(shape)
+    if not (HBTWN_STM.positive_finite(size, dist, number_of_pixels, size_scales, dist_scales) and np.isfinite(np.sum(angular_size_in_rads))):
+        HBTWN_STM.mark_input(status, size, size_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_SIZE)
+        HBTWN_STM.mark_input(status, dist, dist_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_DISTANCE)
+        HBTWN_STM.mark_values(status, number_of_pixels, HBTWN_STM.CalculationStatus.NON_POSITIVE_PIXELS)
+        HBTWN_STM.mark(status, (size_m > double_dist_m) & ~flat, HBTWN_STM.CalculationStatus.SIZE_EXCEEDS_DISTANCE)
+    return TelescopeSizeGeometry(angular_size_in_rads_for_pixel, angular_size_in_arcsec, status)
+
+'''
+calculate_telescope_size_from_geometry - the final stage of calculate_telescope_size_batch: D = 1.22 * wavelength / angular size of single pixel
+Geometry is not modified, so it could be reused for many wavelengths and telescope size units.
+_geometry - TelescopeSizeGeometry (from calculate_telescope_size_geometry)
+_wavelength - wavelength values as array: [ wavelengths, unit or array of units ] (default: [522.0, nm])
+_telescope_size_unit - telescope size unit (default: mm)
+_strict, _return_status - error model (see above)
+@return calculated telescope sizes and unit as array and objects sizes in arcsec (and status array)
+'''
+def calculate_telescope_size_from_geometry(_geometry, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm', _strict = False, _return_status = False):
+    return _telescope_size_stage(_geometry, _wavelength, _telescope_size_unit, _strict, _return_status, True)
+
+def _telescope_size_stage(_geometry, _wavelength, _telescope_size_unit, _strict, _return_status, _copy):
+    wavelength_m, wavelength, wavelength_scales = HBTWN_STM.to_base(_wavelength, HBTWN_UCM.DIST_UNITS, 'm')
+    shape = np.broadcast_shapes(_geometry.shape, np.shape(wavelength_m), np.shape(wavelength_scales))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        D = 1.22*(wavelength_m/_geometry.angular_size_in_rads_for_pixel)
+
+    # Results of finished batch are modified in place (NaN for wrong elements), reused geometry is copied
+    if _copy or shape != _geometry.shape:
+        status = np.array(np.broadcast_to(_geometry.status, shape))
+        angular_size_in_arcsec = np.array(np.broadcast_to(_geometry.angular_size_in_arcsec, shape))
+    else:
+        status, angular_size_in_arcsec = _geometry.status, _geometry.angular_size_in_arcsec
+    if not HBTWN_STM.positive_finite(wavelength, wavelength_scales):
+        HBTWN_STM.mark_input(status, wavelength, wavelength_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_WAVELENGTH)
+    telescope_size = _from_base(np.broadcast_to(D, shape), HBTWN_UCM.DIST_UNITS, 'm', _telescope_size_unit, status)
+
+    status = _finish(status, [ telescope_size, angular_size_in_arcsec ], _strict, _return_status)
+    result = HBTWN_UCM.QuantityArray(telescope_size, _telescope_size_unit, HBTWN_UCM.DIST_UNITS), HBTWN_UCM.QuantityArray(angular_size_in_arcsec, 'arcsec', HBTWN_UCM.ANGLE_UNITS)
+    return result + (status,) if _return_status else result
+
+
+'''
+calculate_telescope_size_batch - vectorized calculate_telescope_size, every value could be NumPy array (arrays are broadcast together)
+Calculated in two stages: calculate_telescope_size_geometry and calculate_telescope_size_from_geometry (see ScenarioModule for reuse of geometry).
+_target_obj_physical_size - target object physical sizes as array: [ sizes, unit or array of units ]
+_target_obj_physical_dist - target object physical distances as array: [ distances, unit or array of units ]
+_object_shape - object shape or array of shapes (default: ObjectShape.SPHERICAL)
+_number_of_pixels - number of pixels on image, number or array (default: 100)
+_wavelength - wavelength values as array: [ wavelengths, unit or array of units ] (default: [522.0, nm])
+_telescope_size_unit - telescope size unit (default: mm)
+_strict, _return_status - error model (see above)
+_precision - float64 (default) or float32 (half memory and bandwidth, see precision mode below)
+_tolerance - maximal relative error bound of float32 elements, elements with greater bound are calculated in float64 (default: FLOAT32_TOLERANCE)
+_return_bound - return array of relative error bounds (relative to float64 results, NaN for wrong elements) before status array (default: False)
+@return calculated telescope sizes and unit as array and objects sizes in arcsec (and bound array and status array), correct float64 results are equal to calculate_telescope_size
+'''
+def calculate_telescope_size_batch(_target_obj_physical_size, _target_obj_physical_dist , _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 100, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm', _strict = False, _return_status = False, _precision = 'float64', _tolerance = None, _return_bound = False):
+    if _precision == 'float32':
+        return _telescope_size_float32(_target_obj_physical_size, _target_obj_physical_dist, _object_shape, _number_of_pixels, _wavelength, _telescope_size_unit, _strict, _return_status, FLOAT32_TOLERANCE if _tolerance is None else _tolerance, _return_bound)
+    check_precision(_precision)
+    geometry = calculate_telescope_size_geometry(_target_obj_physical_size, _target_obj_physical_dist, _object_shape, _number_of_pixels)
+    result = _telescope_size_stage(geometry, _wavelength, _telescope_size_unit, _strict, _return_status, False)
+    if _return_bound:
+        bound = np.where(np.isnan(result[0].values), np.nan, 0.0)
+        return result[:2] + (bound,) + result[2:]
+    return result
+
+
+'''
+Precision mode float32 of calculate_telescope_size_batch
+Formulas are rescaled, so float32 never holds values in [m] (distances of parsecs) and results are calculated from values in input units:
+    ratio = size * (0.5 * size_scale / dist_scale) / dist, ratio for pixel = ratio / pixels
+    telescope size = wavelength * (0.61 * wavelength_scale / unit_scale) / arcsin(ratio for pixel)   (1.22 * lambda / (2 * arcsin))
+    angular size = arcsin(ratio) * (2 * rad / arcsec)
+Factors are calculated in float64 and rounded to float32 once. Small angles (ratio < SMALL_ANGLE_RATIO) use series:
+    arcsin(r) = r * (1 + r^2/6 + 3r^4/40), arctan(r) = r * (1 - r^2/3 + r^4/5), truncation error is far below float32 precision.
+Error bound (first order, relative to float64 result, FLOAT32_EPSILON - float32 unit roundoff) of every element:
+    telescope size: FLOAT32_EPSILON * (12 + 7 * k(ratio for pixel)), angular size: FLOAT32_EPSILON * (10 + 5 * k(ratio)),
+    where k - condition number of arcsin (r / (sqrt(1 - r^2) * arcsin(r))) or arctan (r / ((1 + r^2) * arctan(r))), k is about 1 for small angles
+    and grows without limit for spherical objects with size close to doubled distance.
+Elements with bound greater than tolerance (or overflow/underflow of float32) are calculated in float64 and rounded to float32 (bound FLOAT32_EPSILON).
+PRECISIONS - supported precisions
+FLOAT32_EPSILON - float32 unit roundoff (2^-24)
+FLOAT32_TOLERANCE - default maximal error bound of float32 elements
+SMALL_ANGLE_RATIO - ratios below use small angle series
+'''
+PRECISIONS = ( 'float64', 'float32' )
+FLOAT32_EPSILON = 2.0**-24
+FLOAT32_TOLERANCE = 1e-5
+SMALL_ANGLE_RATIO = 0.05
+
+'''
+check_precision - raise ValueError for precision which is not in PRECISIONS
+'''
+def check_precision(_precision):
+    if _precision not in PRECISIONS:
+        raise ValueError('Unsupported precision: ' + repr(_precision) + ' (use: ' + ', '.join(PRECISIONS) + ')')
+
+def _half_angle_float32(_ratio, _flat):
+    # arcsin (SPHERICAL) or arctan (FLAT) of float32 ratio, small angle series and condition number of function
+    with np.errstate(invalid='ignore', over='ignore'):
+        r2 = _ratio*_ratio
+        angle = np.where(_flat, _ratio*(np.float32(1.0) - r2*(np.float32(1.0/3.0) - r2*np.float32(0.2))), _ratio*(np.float32(1.0) + r2*(np.float32(1.0/6.0) + r2*np.float32(3.0/40.0))))
+        if not np.all(_ratio < SMALL_ANGLE_RATIO):
+            angle = np.where(_ratio < SMALL_ANGLE_RATIO, angle, np.where(_flat, np.arctan(_ratio), np.arcsin(_ratio)))
+        condition = _ratio/(np.where(_flat, np.float32(1.0) + r2, np.sqrt(np.float32(1.0) - r2))*angle)
+    return angle, condition
+
+def _float32_values(_quantity):
+    values = HBTWN_STM.float_values(_quantity[0])
+    return values, HBTWN_UCM.DIST_UNITS.scales_of(_quantity[1], _strict=False)
+
+def _telescope_size_float32(_target_obj_physical_size, _target_obj_physical_dist, _object_shape, _number_of_pixels, _wavelength, _telescope_size_unit, _strict, _return_status, _tolerance, _return_bound):
+    size, size_scales = _float32_values(_target_obj_physical_size)
+    dist, dist_scales = _float32_values(_target_obj_physical_dist)
+    wavelength, wavelength_scales = _float32_values(_wavelength)
+    number_of_pixels = HBTWN_STM.float_values(_number_of_pixels)
+    unit_scale = HBTWN_UCM.DIST_UNITS.scales_of(_telescope_size_unit, _strict=False)
+
+    shape = _batch_shape((size, dist, number_of_pixels, wavelength, size_scales, dist_scales, wavelength_scales), _object_shape)
+    flat = object_shape_mask(_object_shape, shape)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        ratio = np.broadcast_to((size.astype(np.float32)*np.asarray(0.5*size_scales/dist_scales, dtype=np.float32))/dist.astype(np.float32), shape)
+        ratio_for_pixel = np.broadcast_to(ratio/number_of_pixels.astype(np.float32), shape)
+        half_angle, condition = _half_angle_float32(ratio, flat)
+        half_angle_for_pixel, condition_for_pixel = _half_angle_float32(ratio_for_pixel, flat)
+        telescope_size = np.array(np.broadcast_to((wavelength.astype(np.float32)*np.asarray(0.61*wavelength_scales/unit_scale, dtype=np.float32))/half_angle_for_pixel, shape), dtype=np.float32)
+        angular_size = half_angle*np.float32(2.0*HBTWN_UCM.ANGLE_UNITS.convert(1.0, 'rad', 'arcsec'))
+        bound = FLOAT32_EPSILON*np.maximum(12.0 + 7.0*condition_for_pixel, 10.0 + 5.0*condition)
+        # Overflow and underflow (subnormal ratios) of float32 are calculated in float64
+        bound[~(np.isfinite(telescope_size) & np.isfinite(angular_size) & (ratio_for_pixel >= np.finfo(np.float32).tiny))] = np.inf
+
+    # Status is the same as float64 status: geometry errors, then wavelength and unit errors
+    status = HBTWN_STM.new_status(shape)
+    if not (HBTWN_STM.positive_finite(size, dist, number_of_pixels, wavelength, size_scales, dist_scales, wavelength_scales) and np.isfinite(unit_scale) and not np.any(bound > _tolerance)):
+        HBTWN_STM.mark_input(status, size, size_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_SIZE)
+        HBTWN_STM.mark_input(status, dist, dist_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_DISTANCE)
+        HBTWN_STM.mark_values(status, number_of_pixels, HBTWN_STM.CalculationStatus.NON_POSITIVE_PIXELS)
+        HBTWN_STM.mark(status, (ratio > 1.0) & ~flat, HBTWN_STM.CalculationStatus.SIZE_EXCEEDS_DISTANCE)
+        HBTWN_STM.mark_input(status, wavelength, wavelength_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_WAVELENGTH)
+        HBTWN_STM.mark(status, np.isnan(unit_scale), HBTWN_STM.CalculationStatus.UNSUPPORTED_UNIT)
+
+        # float64 fallback of elements with too big error bound (SIZE_EXCEEDS_DISTANCE within float32 rounding of 1 is checked again in float64)
+        exceeds = (status == HBTWN_STM.CalculationStatus.SIZE_EXCEEDS_DISTANCE.value) & (ratio <= 1.0 + 8.0*FLOAT32_EPSILON)
+        fallback = np.nonzero(~(bound <= _tolerance) & ((status == HBTWN_STM.CalculationStatus.OK.value) | exceeds))
+        if fallback[0].size:
+            def elements(_values):
+                return np.broadcast_to(_values, shape)[fallback] if np.ndim(_values) else _values
+            def quantity(_quantity):
+                return [ elements(HBTWN_STM.float_values(_quantity[0])), _quantity[1] if isinstance(_quantity[1], str) else elements(np.asarray(_quantity[1])) ]
+            object_shape = _object_shape if isinstance(_object_shape, HBTWN_UCM.ObjectShape) else elements(np.asarray(_object_shape))
+            fallback_telescope_size, fallback_angular_size, fallback_status = calculate_telescope_size_batch(quantity(_target_obj_physical_size), quantity(_target_obj_physical_dist), object_shape,
+                                                                                                          elements(number_of_pixels), quantity(_wavelength), _telescope_size_unit, _return_status=True)
+            # float64 results out of float32 range are inf or 0.0 (bound inf)
+            with np.errstate(over='ignore'):
+                telescope_size[fallback] = fallback_telescope_size.values
+                angular_size[fallback] = fallback_angular_size.values
+            status[fallback] = fallback_status
+            bound[fallback] = np.where(np.isfinite(telescope_size[fallback]) & (angular_size[fallback] > 0.0), FLOAT32_EPSILON, np.inf)
+    bound[status != HBTWN_STM.CalculationStatus.OK.value] = np.nan
+
+    status = _finish(status, [ telescope_size, angular_size ], _strict, True)
+    result = HBTWN_UCM.QuantityArray(telescope_size, _telescope_size_unit, HBTWN_UCM.DIST_UNITS), HBTWN_UCM.QuantityArray(angular_size, 'arcsec', HBTWN_UCM.ANGLE_UNITS)
+    result += (bound,) if _return_bound else ()
+    return result + (status,) if _return_status else result
+
+
+'''
+calculate_object_size_batch - vectorized calculate_object_size, every value could be NumPy array (arrays are broadcast together)
+_target_obj_physical_dist - target object physical distances as array: [ distances, unit or array of units ]
+_target_obj_size_unit - expected unit for object size: unit
+_telescope_angular_resolution - telescope angular resolutions: [ angular resolutions, unit or array of units ]
+_object_shape - object shape or array of shapes (default: ObjectShape.SPHERICAL)
+_number_of_pixels - number of pixels on image, number or array (default: 1)
+_strict, _return_status - error model (see above)
+@return calculated objects sizes in given unit (and status array), correct results are equal to calculate_object_size
+'''
+def calculate_object_size_batch(_target_obj_physical_dist, _target_obj_size_unit, _telescope_angular_resolution, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 1, _strict = False, _return_status = False):
+
+    dist_m, dist, dist_scales = HBTWN_STM.to_base(_target_obj_physical_dist, HBTWN_UCM.DIST_UNITS, 'm')
+    angular_size_in_rads, resolution, resolution_scales = HBTWN_STM.to_base(_telescope_angular_resolution, HBTWN_UCM.ANGLE_UNITS, 'rad')
+    number_of_pixels = HBTWN_STM.float_values(_number_of_pixels)
+
+    shape = _batch_shape((dist_m, angular_size_in_rads, number_of_pixels, dist_scales, resolution_scales), _object_shape)
+    flat = object_shape_mask(_object_shape, shape)
+
+    status = HBTWN_STM.new_status(shape)
+    if not HBTWN_STM.positive_finite(dist, resolution, number_of_pixels, dist_scales, resolution_scales):
+        HBTWN_STM.mark_input(status, dist, dist_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_DISTANCE)
+        HBTWN_STM.mark_input(status, resolution, resolution_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_RESOLUTION)
+        HBTWN_STM.mark_values(status, number_of_pixels, HBTWN_STM.CalculationStatus.NON_POSITIVE_PIXELS)
+
+    # FLAT objects use tan, all other objects use sin (same as scalar branch)
+    half_angle = np.broadcast_to(angular_size_in_rads*0.5, shape)
+    object_size_in_m = np.empty(shape)
+    np.tan(half_angle, out=object_size_in_m, where=flat)
+    np.sin(half_angle, out=object_size_in_m, where=~flat)
+    object_size_in_m = object_size_in_m*(2.0*dist_m)
+
+    # Scale object
+    object_size_in_m = object_size_in_m * number_of_pixels
+
+    object_size = _from_base(np.broadcast_to(object_size_in_m, shape), HBTWN_UCM.DIST_UNITS, 'm', _target_obj_size_unit, status)
+
+    status = _finish(status, [ object_size ], _strict, _return_status)
+    result = HBTWN_UCM.QuantityArray(object_size, _target_obj_size_unit, HBTWN_UCM.DIST_UNITS)
+    return (result, status) if _return_status else result
+
+
+'''
+calculate_telescope_resolution_batch - vectorized calculate_telescope_resolution, every value could be NumPy array (arrays are broadcast together)
+_telescope_parameters - telescope sizes as array: [sizes, unit or array of units]
+_wavelength - wavelength values as array: [ wavelengths, unit or array of units ] (default: [522.0, nm])
+_resolution_unit - telescope resolution unit (default: arcsec)
+_strict, _return_status - error model (see above)
+@return telescopes resolutions as array resolutions and unit (and status array), correct results are equal to calculate_telescope_resolution
+'''
+def calculate_telescope_resolution_batch(_telescope_parameters, _wavelength = [522.0, 'nm'], _resolution_unit = 'arcsec', _strict = False, _return_status = False):
+
+    size_m, size, size_scales = HBTWN_STM.to_base(_telescope_parameters, HBTWN_UCM.DIST_UNITS, 'm')
+    wavelength_m, wavelength, wavelength_scales = HBTWN_STM.to_base(_wavelength, HBTWN_UCM.DIST_UNITS, 'm')
+
+    shape = _batch_shape((size_m, wavelength_m, size_scales, wavelength_scales), HBTWN_UCM.ObjectShape.SPHERICAL)
+
+    status = HBTWN_STM.new_status(shape)
+    if not HBTWN_STM.positive_finite(size, wavelength, size_scales, wavelength_scales):
+        HBTWN_STM.mark_input(status, size, size_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_TELESCOPE_SIZE)
+        HBTWN_STM.mark_input(status, wavelength, wavelength_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_WAVELENGTH)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        theta = 1.22*(wavelength_m/size_m)
+
+    resolution = _from_base(np.broadcast_to(theta, shape), HBTWN_UCM.ANGLE_UNITS, 'rad', _resolution_unit, status)
+
+    status = _finish(status, [ resolution ], _strict, _return_status)
+    result = HBTWN_UCM.QuantityArray(resolution, _resolution_unit, HBTWN_UCM.ANGLE_UNITS)
+    return (result, status) if _return_status else result
+
+
+'''
+Opt-in metrics (MetricsModule) are installed when HBTWN_METRICS environment variable is set, otherwise functions are not wrapped
+'''
+HBTWN_MM.enable_from_environment()
@@ -0,0 +1,171 @@
+#!/bin/python3
+
+'''
+HBTWN - GuiControllerModule
+Module storage GUI controller which connects Ui_MainWindow (Main_HBTWN.py) with CoreNumericalModule.
+Calculation is started after input changes are debounced and it runs on thread pool, so the event loop is never blocked.
+HBTWN GuiControllerModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import math
+from PyQt5 import QtCore
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+
+'''
+SHAPES - object shape for every item of shape combo box (comboBox_in_2b): flat, spherical
+'''
+SHAPES = ( HBTWN_UCM.ObjectShape.FLAT, HBTWN_UCM.ObjectShape.SPHERICAL )
+
+'''
+calculation_parameters - read and check calculation parameters from main window fields
+_ui - Ui_MainWindow object
+@return dictionary with calculate_telescope_size arguments and result units, raise ValueError for wrong inputs
+'''
+def calculation_parameters(_ui):
+    def number(_line_edit, _name):
+        try:
+            value = float(_line_edit.text().strip().replace(',', '.'))
+        except ValueError:
+            raise ValueError('Wrong value: ' + _name) from None
+        if not value > 0.0:
+            raise ValueError('Value has to be positive: ' + _name)
+        return value
+
+    return { 'name':_ui.lineEdit_in_0.text().strip(),
+             'size':[ number(_ui.lineEdit_in_2, 'size'), _ui.comboBox_in_2a.currentText() ],
+             'distance':[ number(_ui.lineEdit_in_1, 'distance'), _ui.comboBox_in_1.currentText() ],
+             'shape':SHAPES[_ui.comboBox_in_2b.currentIndex()] if 0 <= _ui.comboBox_in_2b.currentIndex() < len(SHAPES) else HBTWN_UCM.ObjectShape.SPHERICAL,
+             'pixels':number(_ui.lineEdit_in_4, 'pixels'),
+             'wavelength':[ number(_ui.lineEdit_in_3, 'wavelength'), _ui.comboBox_in_3.currentText() ],
+             'telescope_size_unit':_ui.comboBox_res_1.currentText(),
+             'angular_size_unit':_ui.comboBox.currentText() }
+
+'''
+calculate - calculation executed by worker thread
+_parameters - dictionary from calculation_parameters
+@return telescope size [ value, unit ] and object angular size [ value, unit ], raise ValueError with status name (ex. SIZE_EXCEEDS_DISTANCE) on calculation failure
+'''
+def calculate(_parameters):
+    telescope_size, angular_size, status = HBTWN_CNM.calculate_telescope_size_batch(_parameters['size'], _parameters['distance'], _parameters['shape'], _parameters['pixels'], _parameters['wavelength'], _parameters['telescope_size_unit'], _return_status=True)
+    if status != HBTWN_STM.CalculationStatus.OK.value:
+        raise ValueError('Calculation failure: ' + HBTWN_STM.STATUS_NAMES[status])
+    angular_size = HBTWN_UCM.angle_units_converter(float(angular_size[0]), angular_size[1], _parameters['angular_size_unit'])
+    if angular_size[0] is None or not math.isfinite(angular_size[0]):
+        raise ValueError('Calculation failure: ' + HBTWN_STM.CalculationStatus.UNSUPPORTED_UNIT.name)
+    return [ float(telescope_size[0]), telescope_size[1] ], angular_size
+
+class _WorkerSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(int, object, str)
+
+'''
+CalculationWorker - thread pool task, result is sent with generation number by queued signal to GUI thread
+'''
+class CalculationWorker(QtCore.QRunnable):
+    def __init__(self, _generation, _parameters):
+        super().__init__()
+        self.generation = _generation
+        self.parameters = _parameters
+        self.signals = _WorkerSignals()
+
+    def run(self):
+        try:
+            result, error = calculate(self.parameters), ''
+        except Exception as e:
+            result, error = None, str(e)
+        self.signals.finished.emit(self.generation, result, error)
+
+'''
+MainWindowController - live recalculation controller for Ui_MainWindow
+_ui - Ui_MainWindow object after setupUi
+_debounce_ms - time without input changes after which calculation starts (default: 300)
+_thread_pool - QThreadPool used for calculations (default: new pool with single thread, calculations are serialized)
+Every started calculation gets a generation number, results of older generations (stale results) are dropped.
+Signals:
+result_ready - emitted with (telescope size, angular size) when current result is displayed
+calculation_failed - emitted with error message when inputs or calculation are wrong
+Methods:
+schedule - restart debounce timer (connected to all inputs)
+recalculate - start calculation immediately (connected to calculate button)
+wait_for_done - wait for running calculations and deliver their results (for tests and application exit)
+Fields:
+started, displayed, dropped - counters of started calculations, displayed results and dropped stale results
+'''
+class MainWindowController(QtCore.QObject):
+    result_ready = QtCore.pyqtSignal(object, object)
+    calculation_failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, _ui, _debounce_ms = 300, _thread_pool = None, _parent = None):
+        super().__init__(_parent)
+        self.ui = _ui
+        self.started = 0
+        self.displayed = 0
+        self.dropped = 0
+        self._generation = 0
+        if _thread_pool is None:
+            _thread_pool = QtCore.QThreadPool(self)
+            _thread_pool.setMaxThreadCount(1)
+        self._thread_pool = _thread_pool
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(_debounce_ms)
+        self._timer.timeout.connect(self.recalculate)
+
+        for line_edit in (_ui.lineEdit_in_1, _ui.lineEdit_in_2, _ui.lineEdit_in_3, _ui.lineEdit_in_4):
+            line_edit.textChanged.connect(self.schedule)
+        for combo_box in (_ui.comboBox_in_1, _ui.comboBox_in_2a, _ui.comboBox_in_2b, _ui.comboBox_in_3, _ui.comboBox_res_1, _ui.comboBox):
+            combo_box.currentIndexChanged.connect(self.schedule)
+        _ui.pushButton.clicked.connect(self.recalculate)
+        for lcd_number in (_ui.lcdNumber_res_1, _ui.lcdNumber):
+            lcd_number.setDigitCount(12)
+
+    def schedule(self, *_arguments):
+        self._timer.start()
+
+    def recalculate(self, *_arguments):
+        self._timer.stop()
+        # Every new request makes older in-flight calculations stale
+        self._generation += 1
+        try:
+            parameters = calculation_parameters(self.ui)
+        except ValueError as e:
+            self._show_error(str(e))
+            return
+        worker = CalculationWorker(self._generation, parameters)
+        worker.signals.finished.connect(self._finished, QtCore.Qt.QueuedConnection)
+        self.started += 1
+        self._thread_pool.start(worker)
+
+    def wait_for_done(self, _timeout_ms = 5000):
+        if self._timer.isActive():
+            self.recalculate()
+        done = self._thread_pool.waitForDone(_timeout_ms)
+        QtCore.QCoreApplication.processEvents()
+        return done
+
+    def _finished(self, _generation, _result, _error):
+        if _generation != self._generation:
+            self.dropped += 1
+            return
+        if _result is None:
+            self._show_error(_error)
+            return
+        telescope_size, angular_size = _result
+        self.ui.lcdNumber_res_1.display(_lcd_text(telescope_size[0]))
+        self.ui.lcdNumber.display(_lcd_text(angular_size[0]))
+        self.ui.statusbar.clearMessage()
+        self.displayed += 1
+        self.result_ready.emit(telescope_size, angular_size)
+
+    def _show_error(self, _message):
+        self.ui.lcdNumber_res_1.display('Err')
+        self.ui.lcdNumber.display('Err')
+        self.ui.statusbar.showMessage(_message)
+        self.calculation_failed.emit(_message)
+
+def _lcd_text(_value):
+    # QLCDNumber can not show '+' sign of exponent
+    return ('%.6g' % _value).replace('e+', 'e')
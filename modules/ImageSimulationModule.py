@@ -0,0 +1,207 @@
+#!/bin/python3
+
+'''
+HBTWN - ImageSimulationModule
+Module storage telescope image simulator, source images are convolved with diffraction (Airy) PSF of telescope.
+PSF first dark ring is at 1.22 * lambda / D, the same model as in CoreNumericalModule.
+Convolution uses real FFT in float32, PSF kernels and their spectra are cached.
+HBTWN ImageSimulationModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import sys
+
+# Project modules
+import modules.UnitsTablesModule as HBTWN_UTM
+import modules.CacheModule as HBTWN_KM
+import modules.SpecialFunctionsModule as HBTWN_SFM
+
+'''
+PSF_CACHE - cache of PSF kernels: key -> kernel
+SPECTRUM_CACHE - cache of PSF kernels spectra: (key, FFT shape) -> spectrum
+'''
+PSF_CACHE = HBTWN_KM.LRUCache(64)
+SPECTRUM_CACHE = HBTWN_KM.LRUCache(16)
+
+'''
+psf_key - normalized PSF parameters (SI units) used as cache key
+_telescope_parameters - telescope size as array: [size, unit]
+_wavelength - wavelength as array: [wavelength, unit]
+_pixel_scale - angular size of single pixel as array: [angle, unit]
+_rings - PSF kernel radius as number of Airy rings (default: 8)
+_oversample - number of PSF samples per pixel in every direction (default: 3)
+@return tuple: (aperture [m], wavelength [m], pixel scale [rad], rings, oversample)
+'''
+def psf_key(_telescope_parameters, _wavelength, _pixel_scale, _rings = 8, _oversample = 3):
+    return (HBTWN_KM.dist_key(_telescope_parameters), HBTWN_KM.dist_key(_wavelength), HBTWN_KM.angle_key(_pixel_scale), int(_rings), int(_oversample))
+
+'''
+airy_psf - Airy PSF kernel of telescope, normalized to sum 1.0 (cached)
+Arguments are the same as psf_key and:
+_max_radius - maximal kernel radius in pixels (default: 512)
+@return read-only float32 kernel with odd size (2 * radius + 1), PSF center is in kernel center
+'''
+def airy_psf(_telescope_parameters, _wavelength, _pixel_scale, _rings = 8, _oversample = 3, _max_radius = 512):
+    key = psf_key(_telescope_parameters, _wavelength, _pixel_scale, _rings, _oversample)
+    found, kernel = PSF_CACHE.get(key + (int(_max_radius),))
+    if found:
+        return kernel
+
+    aperture_m, wavelength_m, pixel_scale_rad, rings, oversample = key
+    # Radius of the first dark ring in pixels: theta = 1.22 * lambda / D
+    first_ring = 1.22*wavelength_m/aperture_m/pixel_scale_rad
+    radius = int(min(max(1, np.ceil(first_ring*max(rings, 1))), _max_radius))
+
+    # Subpixel samples are averaged, so narrow PSFs (smaller than pixel) are integrated over pixel area
+    oversample = max(1, oversample)
+    offsets = (np.arange(oversample) + 0.5)/oversample - 0.5
+    coordinates = (np.arange(-radius, radius+1)[:, np.newaxis] + offsets[np.newaxis, :]).reshape(-1)
+    r = np.hypot(coordinates[:, np.newaxis], coordinates[np.newaxis, :])
+    x = np.pi*aperture_m*np.sin(r*pixel_scale_rad)/wavelength_m
+    size = 2*radius + 1
+    kernel = HBTWN_SFM.airy_pattern(x).reshape(size, oversample, size, oversample).mean(axis=(1, 3))
+    kernel = (kernel/kernel.sum()).astype(np.float32)
+    kernel.flags.writeable = False
+
+    PSF_CACHE.put(key + (int(_max_radius),), kernel)
+    return kernel
+
+'''
+check_psf_first_ring - compare radius of the first dark ring of airy_psf kernel (the first minimum of central row) with 1.22 * lambda / D
+Arguments are the same as psf_key (default: 1 m telescope, 500 nm, 0.01 arcsec pixels - ring radius 12.6 pixels).
+@return dictionary with expected and measured radius in pixels and correct flag (difference up to 1 pixel, kernel is sampled in pixels centers)
+'''
+def check_psf_first_ring(_telescope_parameters = [1.0, 'm'], _wavelength = [500.0, 'nm'], _pixel_scale = [0.01, 'arcsec']):
+    # Expected radius is calculated without PSF cache keys
+    aperture_m = HBTWN_UTM.convert(HBTWN_UTM.DIST_SCALES, 'distance', _telescope_parameters[0], _telescope_parameters[1], 'm')
+    wavelength_m = HBTWN_UTM.convert(HBTWN_UTM.DIST_SCALES, 'distance', _wavelength[0], _wavelength[1], 'm')
+    expected = 1.22*wavelength_m/aperture_m/HBTWN_UTM.convert(HBTWN_UTM.ANGLE_SCALES, 'angle', _pixel_scale[0], _pixel_scale[1], 'rad')
+    kernel = airy_psf(_telescope_parameters, _wavelength, _pixel_scale, 8, 1)
+    profile = kernel[kernel.shape[0]//2, kernel.shape[1]//2:]
+    rising = np.nonzero(profile[1:] > profile[:-1])[0]
+    measured = float(rising[0]) if rising.size else float(len(profile) - 1)
+    return { 'expected':expected, 'measured':measured, 'correct':bool(abs(measured - expected) <= 1.0) }
+
+'''
+next_fast_size - the smallest number >= _n which has only 2, 3 and 5 prime factors (fast FFT size)
+'''
+def next_fast_size(_n):
+    n = max(1, int(_n))
+    best = 2**int(np.ceil(np.log2(n)))
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            # Multiply by the smallest power of 2 which reaches n
+            candidate = power35
+            while candidate < n:
+                candidate *= 2
+            best = min(best, candidate)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+'''
+kernel_spectrum - real FFT of PSF kernel padded to FFT shape, kernel center is moved to (0, 0) (cached)
+_key - PSF cache key (from psf_key)
+_kernel - PSF kernel
+_shape - FFT shape
+@return complex64 spectrum
+'''
+def kernel_spectrum(_key, _kernel, _shape):
+    key = (_key, tuple(_shape))
+    found, spectrum = SPECTRUM_CACHE.get(key)
+    if found:
+        return spectrum
+    radius = _kernel.shape[0]//2
+    padded = np.zeros(_shape, dtype=np.float32)
+    padded[:_kernel.shape[0], :_kernel.shape[1]] = _kernel
+    padded = np.roll(padded, (-radius, -radius), axis=(0, 1))
+    spectrum = np.fft.rfft2(padded).astype(np.complex64)
+    spectrum.flags.writeable = False
+    SPECTRUM_CACHE.put(key, spectrum)
+    return spectrum
+
+def _convolve(_images, _spectrum, _shape, _output_shape):
+    # Zero padding to FFT shape, circular convolution with centered kernel is linear convolution cropped to image
+    spectrum = np.fft.rfft2(_images, s=_shape, axes=(-2, -1))
+    spectrum *= _spectrum
+    result = np.fft.irfft2(spectrum, s=_shape, axes=(-2, -1))
+    # Cropped copy, view would keep whole padded FFT buffer alive
+    return np.ascontiguousarray(result[..., :_output_shape[0], :_output_shape[1]])
+
+def _prepare(_telescope_parameters, _wavelength, _pixel_scale, _rings, _oversample):
+    key = psf_key(_telescope_parameters, _wavelength, _pixel_scale, _rings, _oversample)
+    kernel = airy_psf(_telescope_parameters, _wavelength, _pixel_scale, _rings, _oversample)
+    return key, kernel, kernel.shape[0]//2
+
+'''
+simulate_image - image observed by telescope: source image convolved with Airy PSF (zero padding outside image)
+_image - source image (2D array, converted to float32)
+_telescope_parameters - telescope size as array: [size, unit]
+_wavelength - wavelength as array: [wavelength, unit]
+_pixel_scale - angular size of single pixel as array: [angle, unit]
+_rings - PSF kernel radius as number of Airy rings (default: 8)
+_oversample - number of PSF samples per pixel in every direction (default: 3)
+@return float32 image with source image shape
+'''
+def simulate_image(_image, _telescope_parameters, _wavelength, _pixel_scale, _rings = 8, _oversample = 3):
+    image = np.asarray(_image, dtype=np.float32)
+    key, kernel, radius = _prepare(_telescope_parameters, _wavelength, _pixel_scale, _rings, _oversample)
+    shape = (next_fast_size(image.shape[0] + radius), next_fast_size(image.shape[1] + radius))
+    return _convolve(image, kernel_spectrum(key, kernel, shape), shape, image.shape)
+
+'''
+simulate_image_tiled - simulate_image calculated tile by tile (overlap-save), for images larger than RAM
+Input and output could be numpy.memmap, only single tile with PSF halo is kept in memory.
+Arguments are the same as simulate_image and:
+_tile_size - tile size in pixels (default: 1024)
+_out - output array with image shape (default: new float32 array)
+@return output array
+'''
+def simulate_image_tiled(_image, _telescope_parameters, _wavelength, _pixel_scale, _rings = 8, _oversample = 3, _tile_size = 1024, _out = None):
+    height, width = _image.shape
+    key, kernel, radius = _prepare(_telescope_parameters, _wavelength, _pixel_scale, _rings, _oversample)
+    out = np.empty((height, width), dtype=np.float32) if _out is None else _out
+    tile = max(1, int(_tile_size))
+    # All tiles have the same padded shape, so PSF spectrum is calculated once
+    shape = (next_fast_size(min(tile, height) + 2*radius), next_fast_size(min(tile, width) + 2*radius))
+    spectrum = kernel_spectrum(key, kernel, shape)
+    halo = np.zeros((min(tile, height) + 2*radius, min(tile, width) + 2*radius), dtype=np.float32)
+
+    for y0 in range(0, height, tile):
+        y1 = min(y0 + tile, height)
+        for x0 in range(0, width, tile):
+            x1 = min(x0 + tile, width)
+            # Tile with PSF halo, pixels outside image are zero
+            halo[...] = 0.0
+            sy0, sy1, sx0, sx1 = max(y0 - radius, 0), min(y1 + radius, height), max(x0 - radius, 0), min(x1 + radius, width)
+            halo[sy0-(y0-radius):sy1-(y0-radius), sx0-(x0-radius):sx1-(x0-radius)] = _image[sy0:sy1, sx0:sx1]
+            result = _convolve(halo, spectrum, shape, halo.shape)
+            out[y0:y1, x0:x1] = result[radius:radius+(y1-y0), radius:radius+(x1-x0)]
+    return out
+
+'''
+simulate_stack - simulate_image for stack of frames with the same PSF, kernel spectrum is calculated once
+_frames - frames array with shape (frames, height, width)
+Arguments are the same as simulate_image and:
+_chunk_frames - number of frames transformed at once (default: 8)
+@return float32 frames array
+'''
+def simulate_stack(_frames, _telescope_parameters, _wavelength, _pixel_scale, _rings = 8, _oversample = 3, _chunk_frames = 8):
+    frames = np.asarray(_frames)
+    key, kernel, radius = _prepare(_telescope_parameters, _wavelength, _pixel_scale, _rings, _oversample)
+    shape = (next_fast_size(frames.shape[1] + radius), next_fast_size(frames.shape[2] + radius))
+    spectrum = kernel_spectrum(key, kernel, shape)
+    out = np.empty(frames.shape, dtype=np.float32)
+    chunk = max(1, int(_chunk_frames))
+    for start in range(0, frames.shape[0], chunk):
+        out[start:start+chunk] = _convolve(frames[start:start+chunk].astype(np.float32, copy=False), spectrum, shape, frames.shape[1:])
+    return out
+
+
+if __name__ == '__main__':
+    import modules.ImageSimulationModule as HBTWN_ISM
+    result = HBTWN_ISM.check_psf_first_ring()
+    print('PSF first dark ring: expected ' + '%.2f' % result['expected'] + ' px, measured ' + '%.2f' % result['measured'] + ' px: ' + ('OK' if result['correct'] else 'WRONG'))
+    sys.exit(0 if result['correct'] else 1)
@@ -0,0 +1,225 @@
+#!/bin/python3
+
+'''
+HBTWN - InterferometryModule
+Module storage interferometric array (synthetic aperture) model, ex. Event Horizon Telescope - EHT.
+uv-coverage of all baselines and time steps is calculated as vectorized computation in memory bounded chunks,
+the longest projected baseline replaces single dish diameter D in theta = 1.22 * lambda / D.
+HBTWN InterferometryModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+
+'''
+WGS84_A, WGS84_F - Earth ellipsoid semi-major axis [m] and flattening used for station coordinates
+'''
+WGS84_A = 6378137.0
+WGS84_F = 1.0/298.257223563
+
+'''
+EHT_2017_STATIONS - approximate stations of EHT 2017 campaign: (name, latitude [deg], longitude [deg], height [m])
+'''
+EHT_2017_STATIONS = ( ('ALMA', -23.0293, -67.7548, 5074.0),
+                      ('APEX', -23.0058, -67.7592, 5104.0),
+                      ('JCMT', 19.8228, -155.4770, 4120.0),
+                      ('SMA', 19.8242, -155.4781, 4115.0),
+                      ('LMT', 18.9858, -97.3147, 4593.0),
+                      ('PV', 37.0661, -3.3926, 2850.0),
+                      ('SMT', 32.7016, -109.8912, 3185.0),
+                      ('SPT', -89.9900, -45.0000, 2816.0) )
+
+'''
+StationArray - interferometric array stations
+_names - stations names
+_positions - stations positions in Earth centered, Earth fixed frame (X to Greenwich meridian, Z to north pole) as array: [ positions (N x 3), unit ]
+Fields:
+names - stations names
+positions_m - positions array (N x 3) [m]
+latitudes_rad, longitudes_rad - geocentric latitudes and longitudes (used for source elevation)
+baselines - stations indices of all baselines (2 x number of baselines), i < j
+'''
+class StationArray:
+    def __init__(self, _names, _positions):
+        positions = np.asarray(_positions[0], dtype=np.float64).reshape(-1, 3)
+        self.names = list(_names)
+        if len(self.names) != len(positions):
+            raise ValueError('Number of stations names and positions differ')
+        self.positions_m = positions*HBTWN_UCM.DIST_UNITS.factor(_positions[1], 'm')
+        x, y, z = self.positions_m.T
+        self.latitudes_rad = np.arctan2(z, np.hypot(x, y))
+        self.longitudes_rad = np.arctan2(y, x)
+        self.baselines = np.array(np.triu_indices(len(self.names), 1))
+    def __len__(self):
+        return len(self.names)
+    def __repr__(self):
+        return 'StationArray(' + str(len(self)) + ' stations, ' + str(self.baselines.shape[1]) + ' baselines)'
+
+'''
+station_array_from_geodetic - create StationArray from geodetic coordinates (WGS84)
+_names - stations names
+_latitudes, _longitudes - stations coordinates as arrays: [ values, unit ]
+_heights - stations heights above ellipsoid as array: [ values, unit ] (default: [ 0.0, m ])
+@return StationArray
+'''
+def station_array_from_geodetic(_names, _latitudes, _longitudes, _heights = [0.0, 'm']):
+    latitudes = np.radians(HBTWN_UCM.ANGLE_UNITS.convert_array(_latitudes[0], _latitudes[1], 'deg'))
+    longitudes = np.radians(HBTWN_UCM.ANGLE_UNITS.convert_array(_longitudes[0], _longitudes[1], 'deg'))
+    heights = np.broadcast_to(HBTWN_UCM.DIST_UNITS.convert_array(_heights[0], _heights[1], 'm'), latitudes.shape)
+    e2 = WGS84_F*(2.0 - WGS84_F)
+    n = WGS84_A/np.sqrt(1.0 - e2*np.sin(latitudes)**2)
+    positions = np.column_stack(((n + heights)*np.cos(latitudes)*np.cos(longitudes),
+                                 (n + heights)*np.cos(latitudes)*np.sin(longitudes),
+                                 (n*(1.0 - e2) + heights)*np.sin(latitudes)))
+    return StationArray(_names, [ positions, 'm' ])
+
+'''
+eht_2017_array - StationArray with EHT_2017_STATIONS
+'''
+def eht_2017_array():
+    names, latitudes, longitudes, heights = zip(*EHT_2017_STATIONS)
+    return station_array_from_geodetic(names, [ latitudes, 'deg' ], [ longitudes, 'deg' ], [ heights, 'm' ])
+
+'''
+ObservationSchedule - observation of single source
+_declination - source declination as array: [ declination, unit ]
+_hour_angles - Greenwich hour angles of source for all time steps as array: [ hour angles, unit ]
+_min_elevation - minimal source elevation above horizon, stations below are not used (default: [ 10.0, deg ])
+Fields:
+declination_rad, hour_angles_rad, min_elevation_rad
+'''
+class ObservationSchedule:
+    def __init__(self, _declination, _hour_angles, _min_elevation = [10.0, 'deg']):
+        self.declination_rad = float(HBTWN_UCM.ANGLE_UNITS.convert(float(_declination[0]), _declination[1], 'rad'))
+        self.hour_angles_rad = np.atleast_1d(HBTWN_UCM.ANGLE_UNITS.convert_array(_hour_angles[0], _hour_angles[1], 'rad'))
+        self.min_elevation_rad = float(HBTWN_UCM.ANGLE_UNITS.convert(float(_min_elevation[0]), _min_elevation[1], 'rad'))
+    def __len__(self):
+        return len(self.hour_angles_rad)
+
+'''
+hour_angle_schedule - ObservationSchedule with evenly spaced time steps
+_declination - source declination as array: [ declination, unit ]
+_start_hours, _stop_hours - Greenwich hour angle of the first and the last time step in hours
+_steps - number of time steps
+_min_elevation - minimal source elevation (default: [ 10.0, deg ])
+'''
+def hour_angle_schedule(_declination, _start_hours, _stop_hours, _steps, _min_elevation = [10.0, 'deg']):
+    # Earth rotates by 15 degrees per hour
+    return ObservationSchedule(_declination, [ 15.0*np.linspace(_start_hours, _stop_hours, int(_steps)), 'deg' ], _min_elevation)
+
+'''
+uv_coverage_chunks - projected baselines of all baselines and time steps, calculated in chunks of time steps
+u = sin(H) Bx + cos(H) By
+v = -sin(dec) cos(H) Bx + sin(dec) sin(H) By + cos(dec) Bz
+where H - Greenwich hour angle, B - baseline vector in Earth fixed frame
+_array - StationArray
+_schedule - ObservationSchedule
+_max_chunk_elements - maximal number of (time step, baseline) elements in single chunk (default: 2**20)
+@return generator of (time steps slice, u [m], v [m], visible) arrays with shape (time steps in chunk, baselines),
+visible is True when source is above minimal elevation for both stations of baseline
+'''
+def uv_coverage_chunks(_array, _schedule, _max_chunk_elements = 2**20):
+    first, second = _array.baselines
+    baselines = _array.positions_m[second] - _array.positions_m[first]
+    bx, by, bz = baselines[:, 0], baselines[:, 1], baselines[:, 2]
+    sin_dec, cos_dec = np.sin(_schedule.declination_rad), np.cos(_schedule.declination_rad)
+    sin_lat, cos_lat = np.sin(_array.latitudes_rad), np.cos(_array.latitudes_rad)
+    sin_min_elevation = np.sin(_schedule.min_elevation_rad)
+    steps = max(1, int(_max_chunk_elements) // max(1, len(bx)))
+
+    for start in range(0, len(_schedule), steps):
+        time_steps = slice(start, min(start + steps, len(_schedule)))
+        hour_angles = _schedule.hour_angles_rad[time_steps][:, np.newaxis]
+        sin_h, cos_h = np.sin(hour_angles), np.cos(hour_angles)
+        u = sin_h*bx + cos_h*by
+        v = sin_dec*(sin_h*by - cos_h*bx) + cos_dec*bz
+        # Source elevation for every station: sin(el) = sin(lat) sin(dec) + cos(lat) cos(dec) cos(local hour angle)
+        sin_elevation = sin_lat*sin_dec + cos_lat*cos_dec*np.cos(hour_angles + _array.longitudes_rad)
+        station_visible = sin_elevation >= sin_min_elevation
+        yield time_steps, u, v, station_visible[:, first] & station_visible[:, second]
+
+'''
+UVCoverage - uv-coverage summary of observation
+Fields:
+wavelength_m - observation wavelength [m]
+samples - number of (time step, baseline) samples
+visible_samples - number of samples with source visible from both stations
+max_baseline_m, min_baseline_m - the longest and the shortest projected baseline of visible samples [m] (NaN if none)
+u, v - visible samples in wavelengths (only with _keep_points, including symmetric points -u, -v), otherwise None
+Methods:
+effective_aperture - the longest projected baseline as array: [ size, unit ], it replaces single dish diameter
+resolution - array angular resolution as array: [ resolution, unit ], theta = 1.22 * lambda / longest baseline
+'''
+class UVCoverage:
+    def __init__(self, _wavelength_m, _samples, _visible_samples, _max_baseline_m, _min_baseline_m, _u = None, _v = None):
+        self.wavelength_m = _wavelength_m
+        self.samples = _samples
+        self.visible_samples = _visible_samples
+        self.max_baseline_m = _max_baseline_m
+        self.min_baseline_m = _min_baseline_m
+        self.u = _u
+        self.v = _v
+    def effective_aperture(self, _unit = 'm'):
+        return [ float(HBTWN_UCM.DIST_UNITS.convert(self.max_baseline_m, 'm', _unit)), _unit ]
+    def resolution(self, _resolution_unit = 'uas'):
+        return HBTWN_CNM.calculate_telescope_resolution(self.effective_aperture(), [ self.wavelength_m, 'm' ], _resolution_unit)
+    def __repr__(self):
+        return 'UVCoverage(' + str(self.visible_samples) + '/' + str(self.samples) + ' samples, longest baseline ' + '%g' % self.max_baseline_m + ' m)'
+
+'''
+uv_coverage - calculate uv-coverage summary of observation
+_array - StationArray
+_schedule - ObservationSchedule
+_wavelength - observation wavelength as array: [ wavelength, unit ] (default: [ 1.3, mm ], EHT)
+_keep_points - keep visible uv points in wavelengths (default: False, only summary is kept and memory is bounded by chunk size)
+_max_chunk_elements - maximal number of elements in single chunk (default: 2**20)
+@return UVCoverage
+'''
+def uv_coverage(_array, _schedule, _wavelength = [1.3, 'mm'], _keep_points = False, _max_chunk_elements = 2**20):
+    wavelength_m = HBTWN_UCM.DIST_UNITS.convert(float(_wavelength[0]), _wavelength[1], 'm')
+    samples, visible_samples = 0, 0
+    max_squared, min_squared = -np.inf, np.inf
+    points_u, points_v = [], []
+    for time_steps, u, v, visible in uv_coverage_chunks(_array, _schedule, _max_chunk_elements):
+        samples += visible.size
+        squared = (u*u + v*v)[visible]
+        if len(squared) == 0:
+            continue
+        visible_samples += len(squared)
+        max_squared = max(max_squared, squared.max())
+        min_squared = min(min_squared, squared.min())
+        if _keep_points:
+            points_u.append(u[visible]/wavelength_m)
+            points_v.append(v[visible]/wavelength_m)
+
+    max_baseline_m = float(np.sqrt(max_squared)) if visible_samples else float('nan')
+    min_baseline_m = float(np.sqrt(min_squared)) if visible_samples else float('nan')
+    u = v = None
+    if _keep_points:
+        u = np.concatenate(points_u) if points_u else np.empty(0)
+        v = np.concatenate(points_v) if points_v else np.empty(0)
+        # Visibility of baseline (i, j) is complex conjugate of (j, i), both points belong to coverage
+        u, v = np.concatenate((u, -u)), np.concatenate((v, -v))
+    return UVCoverage(wavelength_m, samples, visible_samples, max_baseline_m, min_baseline_m, u, v)
+
+'''
+calculate_array_telescope_size - calculate_telescope_size for interferometric array
+Required telescope size is compared with effective aperture of array (the longest projected baseline).
+_coverage - UVCoverage of observation (its wavelength is used)
+_target_obj_physical_size - target object physical size as array: [ size, unit ]
+_target_obj_physical_dist - target object physical distance as array: [ distance, unit ]
+_object_shape - object shape (default: ObjectShape.SPHERICAL)
+_number_of_pixels - number of pixels on image (default: 100)
+_telescope_size_unit - telescope size unit (default: km)
+@return required telescope size, effective aperture of array (both as arrays: [ size, unit ]), object size in arcsec
+and True if array resolves object with given number of pixels
+'''
+def calculate_array_telescope_size(_coverage, _target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 100, _telescope_size_unit = 'km'):
+    telescope_size, angular_size = HBTWN_CNM.calculate_telescope_size(_target_obj_physical_size, _target_obj_physical_dist, _object_shape, _number_of_pixels, [ _coverage.wavelength_m, 'm' ], _telescope_size_unit)
+    if telescope_size is None or telescope_size[0] is None:
+        return None, None, None, False
+    aperture = _coverage.effective_aperture(_telescope_size_unit)
+    return telescope_size, aperture, angular_size, bool(aperture[0] >= telescope_size[0])
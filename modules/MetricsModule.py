@@ -0,0 +1,257 @@
+#!/bin/python3
+
+'''
+HBTWN - MetricsModule
+Module storage opt-in instrumentation of CoreNumericalModule and UnitsConstantsModule: per function call counts, latency histograms,
+batch sizes and error counts, exported as JSON or Prometheus text format.
+Metrics are enabled with environment variable HBTWN_METRICS=1 (checked when CoreNumericalModule is imported) or with enable().
+Enabled metrics replace module functions (and UnitRegistry conversion methods) by measuring wrappers, disable() restores original
+functions, so disabled metrics have no overhead at all. Callers have to use module attributes (HBTWN_CNM.function), as whole project does.
+Metrics are collected per process (ParallelModule workers have own metrics).
+HBTWN MetricsModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import bisect
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+
+'''
+ENVIRONMENT_VARIABLE - environment variable which enables metrics (values 1/true/yes/on)
+INSTRUMENTED_MODULES - modules which public functions are instrumented
+INSTRUMENTED_METHODS - UnitRegistry methods which are instrumented (labeled with registry name ex. DIST_UNITS.convert)
+NONE_FAILURE_FUNCTIONS - legacy functions which return None (or [ None, None ]) on failure, None results of other functions are not errors
+LATENCY_BUCKETS - upper bounds of latency histogram buckets [s]
+BATCH_SIZE_BUCKETS - upper bounds of batch size histogram buckets [elements]
+'''
+ENVIRONMENT_VARIABLE = 'HBTWN_METRICS'
+INSTRUMENTED_MODULES = ( 'modules.UnitsConstantsModule', 'modules.CoreNumericalModule' )
+INSTRUMENTED_METHODS = ( 'convert', 'convert_array', 'codes', 'scales_of' )
+NONE_FAILURE_FUNCTIONS = ( 'CoreNumericalModule.calculate_telescope_size', 'CoreNumericalModule.calculate_object_size', 'CoreNumericalModule.calculate_telescope_resolution',
+                           'UnitsConstantsModule.dist_units_converter', 'UnitsConstantsModule.angle_units_converter' )
+LATENCY_BUCKETS = ( 1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0 )
+BATCH_SIZE_BUCKETS = ( 1, 10, 100, 1000, 10000, 100000, 1000000, 10000000, 100000000 )
+
+'''
+FunctionMetrics - metrics of single function
+Fields:
+calls - number of calls
+errors - number of failed calls (exception, None result of NONE_FAILURE_FUNCTIONS or result with wrong elements)
+error_elements - number of wrong elements in batch results (NaN results or status codes)
+latency_sum - total time [s], latency_counts - calls in every LATENCY_BUCKETS bucket (the last one is +Inf)
+elements_sum - total number of result elements, batch_counts - calls in every BATCH_SIZE_BUCKETS bucket (the last one is +Inf)
+'''
+class FunctionMetrics:
+    __slots__ = ('calls', 'errors', 'error_elements', 'latency_sum', 'latency_counts', 'elements_sum', 'batch_counts')
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.error_elements = 0
+        self.latency_sum = 0.0
+        self.latency_counts = [ 0 ]*(len(LATENCY_BUCKETS) + 1)
+        self.elements_sum = 0
+        self.batch_counts = [ 0 ]*(len(BATCH_SIZE_BUCKETS) + 1)
+
+    def observe(self, _seconds, _elements, _error, _error_elements):
+        self.calls += 1
+        self.errors += _error
+        self.error_elements += _error_elements
+        self.latency_sum += _seconds
+        self.latency_counts[bisect.bisect_left(LATENCY_BUCKETS, _seconds)] += 1
+        self.elements_sum += _elements
+        self.batch_counts[bisect.bisect_left(BATCH_SIZE_BUCKETS, _elements)] += 1
+
+    def as_dict(self):
+        return { 'calls':self.calls, 'errors':self.errors, 'error_elements':self.error_elements,
+                 'latency_seconds':{ 'sum':self.latency_sum, 'buckets':_bucket_dict(LATENCY_BUCKETS, self.latency_counts) },
+                 'batch_elements':{ 'sum':self.elements_sum, 'buckets':_bucket_dict(BATCH_SIZE_BUCKETS, self.batch_counts) } }
+
+def _bucket_dict(_bounds, _counts):
+    # Cumulative counts, same as Prometheus histogram
+    cumulative = np.cumsum(_counts).tolist()
+    return dict(zip([ repr(bound) for bound in _bounds ] + [ '+Inf' ], cumulative))
+
+'''
+METRICS - metrics of all instrumented functions: function label:FunctionMetrics
+'''
+METRICS = {}
+_LOCK = threading.Lock()
+_ORIGINALS = []
+_SCALAR_TYPES = ( float, int, np.float64 )
+_QUANTITY_ARRAY = ()
+
+def _record(_label, _seconds, _result, _exception, _none_failure = False):
+    if _exception:
+        elements, error, error_elements = 0, 1, 0
+    else:
+        elements, error, error_elements = _result_info(_result, _none_failure)
+    with _LOCK:
+        metrics = METRICS.get(_label)
+        if metrics is None:
+            metrics = METRICS[_label] = FunctionMetrics()
+        metrics.observe(_seconds, elements, error, error_elements)
+
+def _result_info(_result, _none_failure):
+    # Legacy scalar functions return None (or [ None, None ]) on failure, batch functions return QuantityArray with NaN for wrong elements
+    # and optional status array, NaN of internal helpers results (plain arrays) are not counted as errors
+    if type(_result) in _SCALAR_TYPES:
+        return 1, 0, 0
+    if _result is None:
+        return 0, int(_none_failure), 0
+    if isinstance(_result, tuple):
+        if not _result or (_none_failure and any(item is None or _is_failed_quantity(item) for item in _result)):
+            return 0, int(_none_failure), 0
+        first, last = _result[0], _result[-1]
+    else:
+        if _none_failure and _is_failed_quantity(_result):
+            return 0, 1, 0
+        first = last = _result
+    if not hasattr(first, 'shape'):
+        return 1, 0, 0
+    elements = int(np.size(first))
+    if isinstance(last, np.ndarray) and last.dtype == np.uint8 and last is not first:
+        error_elements = int(np.count_nonzero(last))
+    elif isinstance(first, _QUANTITY_ARRAY) and first.values.ndim:
+        error_elements = int(np.count_nonzero(np.isnan(first.values)))
+    else:
+        error_elements = 0
+    return elements, int(error_elements > 0), error_elements
+
+def _is_failed_quantity(_item):
+    return isinstance(_item, list) and len(_item) == 2 and _item[0] is None
+
+def _instrumented(_function, _label):
+    none_failure = _label in NONE_FAILURE_FUNCTIONS
+    @functools.wraps(_function)
+    def wrapper(*_arguments, **_keywords):
+        start = time.perf_counter()
+        try:
+            result = _function(*_arguments, **_keywords)
+        except BaseException:
+            _record(_label, time.perf_counter() - start, None, True)
+            raise
+        _record(_label, time.perf_counter() - start, result, False, none_failure)
+        return result
+    wrapper.__hbtwn_metrics__ = True
+    return wrapper
+
+def _instrumented_method(_method, _labels):
+    @functools.wraps(_method)
+    def wrapper(self, *_arguments, **_keywords):
+        label = _labels.get(id(self)) or ('UnitRegistry(' + self.name + ').' + _method.__name__)
+        start = time.perf_counter()
+        try:
+            result = _method(self, *_arguments, **_keywords)
+        except BaseException:
+            _record(label, time.perf_counter() - start, None, True)
+            raise
+        _record(label, time.perf_counter() - start, result, False)
+        return result
+    wrapper.__hbtwn_metrics__ = True
+    return wrapper
+
+'''
+is_enabled - True if instrumentation is installed
+'''
+def is_enabled():
+    return bool(_ORIGINALS)
+
+'''
+enable - install instrumentation of INSTRUMENTED_MODULES public functions and UnitRegistry methods (nothing happens if already enabled)
+'''
+def enable():
+    global _QUANTITY_ARRAY
+    if is_enabled():
+        return
+    for module_name in INSTRUMENTED_MODULES:
+        module = importlib.import_module(module_name)
+        short_name = module_name.rsplit('.', 1)[-1]
+        for name, value in list(vars(module).items()):
+            if name.startswith('_') or not callable(value) or isinstance(value, type) or getattr(value, '__module__', None) != module_name:
+                continue
+            _ORIGINALS.append((module, name, value))
+            setattr(module, name, _instrumented(value, short_name + '.' + name))
+    units_module = importlib.import_module('modules.UnitsConstantsModule')
+    _QUANTITY_ARRAY = units_module.QuantityArray
+    registry_class = units_module.UnitRegistry
+    labels = {}
+    for name, value in vars(units_module).items():
+        if isinstance(value, registry_class):
+            for method in INSTRUMENTED_METHODS:
+                labels.setdefault(id(value), {})[method] = name + '.' + method
+    for method in INSTRUMENTED_METHODS:
+        original = vars(registry_class)[method]
+        _ORIGINALS.append((registry_class, method, original))
+        setattr(registry_class, method, _instrumented_method(original, { key:value[method] for key, value in labels.items() }))
+
+'''
+disable - restore original functions (collected metrics are kept)
+'''
+def disable():
+    while _ORIGINALS:
+        owner, name, original = _ORIGINALS.pop()
+        setattr(owner, name, original)
+
+'''
+enable_from_environment - enable metrics if ENVIRONMENT_VARIABLE is set (called by CoreNumericalModule on import)
+@return True if metrics are enabled
+'''
+def enable_from_environment():
+    if os.environ.get(ENVIRONMENT_VARIABLE, '').strip().lower() in ('1', 'true', 'yes', 'on'):
+        enable()
+    return is_enabled()
+
+'''
+reset - remove collected metrics
+'''
+def reset():
+    with _LOCK:
+        METRICS.clear()
+
+'''
+snapshot - copy of collected metrics
+@return dictionary function label:metrics dictionary (calls, errors, error_elements, latency_seconds, batch_elements)
+'''
+def snapshot():
+    with _LOCK:
+        return { label:metrics.as_dict() for label, metrics in sorted(METRICS.items()) }
+
+'''
+to_json - metrics as JSON text
+'''
+def to_json(_indent = 1):
+    return json.dumps({ 'enabled':is_enabled(), 'pid':os.getpid(), 'functions':snapshot() }, indent=_indent)
+
+'''
+to_prometheus - metrics in Prometheus text exposition format
+Metrics: hbtwn_calls_total, hbtwn_errors_total, hbtwn_error_elements_total (counters),
+hbtwn_call_duration_seconds, hbtwn_batch_elements (histograms), label function
+'''
+def to_prometheus():
+    functions = snapshot()
+    lines = []
+    for metric, key, help_text in (('hbtwn_calls_total', 'calls', 'Number of calls'), ('hbtwn_errors_total', 'errors', 'Number of failed calls'), ('hbtwn_error_elements_total', 'error_elements', 'Number of wrong result elements')):
+        lines += [ '# HELP ' + metric + ' ' + help_text, '# TYPE ' + metric + ' counter' ]
+        lines += [ metric + '{function="' + label + '"} ' + str(metrics[key]) for label, metrics in functions.items() ]
+    for metric, key, help_text in (('hbtwn_call_duration_seconds', 'latency_seconds', 'Call latency'), ('hbtwn_batch_elements', 'batch_elements', 'Number of result elements of call')):
+        lines += [ '# HELP ' + metric + ' ' + help_text, '# TYPE ' + metric + ' histogram' ]
+        for label, metrics in functions.items():
+            histogram = metrics[key]
+            lines += [ metric + '_bucket{function="' + label + '",le="' + bound + '"} ' + str(count) for bound, count in histogram['buckets'].items() ]
+            lines += [ metric + '_sum{function="' + label + '"} ' + repr(histogram['sum']), metric + '_count{function="' + label + '"} ' + str(metrics['calls']) ]
+    return '\n'.join(lines) + '\n'
+
+'''
+write - write metrics to file
+_path - output file path
+_format - json or prometheus (default: json)
+'''
+def write(_path, _format = 'json'):
+    if _format not in ('json', 'prometheus'):
+        raise ValueError('Unsupported metrics format: ' + repr(_format))
+    with open(_path, 'w', encoding='utf-8') as file:
+        file.write(to_json() if _format == 'json' else to_prometheus())
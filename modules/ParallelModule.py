@@ -0,0 +1,225 @@
+#!/bin/python3
+
+'''
+HBTWN - ParallelModule
+Module storage multi-core execution of batch calculations, input and output arrays are shared with worker processes via shared memory.
+HBTWN ParallelModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+import modules.SweepModule as HBTWN_SM
+
+'''
+default_workers - number of worker processes, equal to number of CPU cores available for application
+'''
+def default_workers():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+'''
+SharedArrays - set of NumPy arrays stored in single shared memory block
+_arrays - dictionary name:array, arrays are copied into shared memory (or only allocated if _copy is False)
+Fields:
+layout - picklable description of arrays: (shared memory name, [ (array name, dtype, shape, offset) ]), used by attach_shared_arrays
+arrays - dictionary with arrays views on shared memory
+Methods:
+close - release and remove shared memory block (views in arrays can not be used after close)
+'''
+class SharedArrays:
+    def __init__(self, _arrays, _copy = True):
+        descriptors = []
+        offset = 0
+        for name, array in _arrays.items():
+            array = np.asarray(array)
+            # Keep 64 bytes alignment of every array
+            offset = (offset + 63) & ~63
+            descriptors.append((name, array.dtype.str, array.shape, offset))
+            offset += array.nbytes
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.layout = (self._shm.name, descriptors)
+        self.arrays = _views(self._shm, descriptors)
+        if _copy:
+            for name, array in _arrays.items():
+                self.arrays[name][...] = array
+    def __enter__(self):
+        return self
+    def __exit__(self, _type, _value, _traceback):
+        self.close()
+    def close(self):
+        self.arrays = {}
+        self._shm.close()
+        self._shm.unlink()
+
+def _views(_shm, _descriptors):
+    return { name:np.ndarray(shape, dtype=np.dtype(dtype), buffer=_shm.buf, offset=offset) for name, dtype, shape, offset in _descriptors }
+
+'''
+attach_shared_arrays - attach to arrays created by SharedArrays in worker process
+_layout - SharedArrays.layout
+@return shared memory handle (has to be closed by caller) and dictionary with arrays views
+'''
+def attach_shared_arrays(_layout):
+    name, descriptors = _layout
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, _views(shm, descriptors)
+
+'''
+chunk_ranges - split range [0, _size) into chunks
+@return list of (start, stop) pairs in input order
+'''
+def chunk_ranges(_size, _chunk_size):
+    _chunk_size = max(1, int(_chunk_size))
+    return [ (start, min(start+_chunk_size, _size)) for start in range(0, _size, _chunk_size) ]
+
+def _telescope_size_chunk(_input_layout, _output_layout, _units, _precision, _tolerance, _start, _stop):
+    input_shm, inputs = attach_shared_arrays(_input_layout)
+    output_shm, outputs = attach_shared_arrays(_output_layout)
+    try:
+        size_unit, dist_unit, wavelength_unit, telescope_size_unit = _units
+        telescope_size, angular_size, status = HBTWN_CNM.calculate_telescope_size_batch([ inputs['size'][_start:_stop], size_unit ], [ inputs['distance'][_start:_stop], dist_unit ], inputs['shape'][_start:_stop], inputs['pixels'][_start:_stop], [ inputs['wavelength'][_start:_stop], wavelength_unit ], telescope_size_unit, _return_status=True, _precision=_precision, _tolerance=_tolerance)
+        outputs['telescope_size'][_start:_stop] = telescope_size[0]
+        outputs['angular_size'][_start:_stop] = angular_size[0]
+        outputs['status'][_start:_stop] = status
+    finally:
+        del inputs, outputs
+        input_shm.close()
+        output_shm.close()
+
+'''
+calculate_telescope_size_batch_parallel - calculate_telescope_size_batch executed on process pool
+Input arrays are broadcast together and split into chunks, chunks are read and results are written by workers via shared memory.
+Arguments are the same as calculate_telescope_size_batch, units could be symbols only (not arrays of units).
+_workers - number of worker processes (default: number of CPU cores)
+_chunk_size - number of elements calculated by single task (default: input size divided into 4 tasks per worker)
+_executor - optional existing ProcessPoolExecutor (avoid pool start cost for many calls)
+_strict, _return_status - error model of batch functions, status arrays of chunks are joined before strict check
+_precision, _tolerance - precision mode of calculate_telescope_size_batch, float32 results use half of shared memory (default: float64)
+@return calculated telescope sizes and objects sizes in arcsec as QuantityArray (and status array), results are in input order and shape
+'''
+def calculate_telescope_size_batch_parallel(_target_obj_physical_size, _target_obj_physical_dist , _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 100, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm', _workers = None, _chunk_size = None, _executor = None, _strict = False, _return_status = False, _precision = 'float64', _tolerance = None):
+    HBTWN_CNM.check_precision(_precision)
+    workers = _workers or default_workers()
+    shapes = HBTWN_UCM.object_shape_codes(int(_object_shape) if isinstance(_object_shape, HBTWN_UCM.ObjectShape) else _object_shape)
+    columns = np.broadcast_arrays(np.asarray(_target_obj_physical_size[0], dtype=np.float64), np.asarray(_target_obj_physical_dist[0], dtype=np.float64), shapes, np.asarray(_number_of_pixels, dtype=np.float64), np.asarray(_wavelength[0], dtype=np.float64))
+    shape = columns[0].shape
+    size = int(np.prod(shape, dtype=np.int64))
+    units = (_target_obj_physical_size[1], _target_obj_physical_dist[1], _wavelength[1], _telescope_size_unit)
+    chunk_size = _chunk_size or max(1, -(-size // (4*workers)))
+
+    with SharedArrays(dict(zip(('size', 'distance', 'shape', 'pixels', 'wavelength'), (column.reshape(-1) for column in columns)))) as inputs, \
+         SharedArrays({ 'telescope_size':np.empty(size, dtype=_precision), 'angular_size':np.empty(size, dtype=_precision), 'status':HBTWN_STM.new_status(size) }, _copy=False) as outputs:
+        executor = _executor or ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [ executor.submit(_telescope_size_chunk, inputs.layout, outputs.layout, units, _precision, _tolerance, start, stop) for start, stop in chunk_ranges(size, chunk_size) ]
+            for future in futures:
+                future.result()
+        finally:
+            if _executor is None:
+                executor.shutdown()
+        telescope_size = outputs.arrays['telescope_size'].reshape(shape).copy()
+        angular_size = outputs.arrays['angular_size'].reshape(shape).copy()
+        status = outputs.arrays['status'].reshape(shape).copy()
+
+    HBTWN_STM.finish(status, [ telescope_size, angular_size ], _strict)
+    result = HBTWN_UCM.QuantityArray(telescope_size, _telescope_size_unit, HBTWN_UCM.DIST_UNITS), HBTWN_UCM.QuantityArray(angular_size, 'arcsec', HBTWN_UCM.ANGLE_UNITS)
+    return result + (status,) if _return_status else result
+
+def _sweep_blocks(_axes, _fixed, _telescope_size_unit, _precision, _output_layout, _blocks):
+    output_shm, outputs = attach_shared_arrays(_output_layout)
+    try:
+        for block in _blocks:
+            index = HBTWN_SM.block_index(block)
+            outputs['telescope_size'][index], outputs['angular_size'][index] = HBTWN_SM.evaluate_block(_axes, _fixed, _telescope_size_unit, block, _precision)
+        return len(_blocks)
+    finally:
+        del outputs
+        output_shm.close()
+
+'''
+run_telescope_size_sweep_parallel - SweepModule.run_telescope_size_sweep executed on process pool
+Axes values are sent to workers (they are small), result cubes are written by workers directly into shared memory.
+Arguments are the same as SweepModule.run_telescope_size_sweep (with _precision, cubes are float32 for float32 precision) and:
+_workers - number of worker processes (default: number of CPU cores)
+_executor - optional existing ProcessPoolExecutor
+@return SweepModule.SweepResult
+'''
+def run_telescope_size_sweep_parallel(_axes, _fixed = None, _telescope_size_unit = 'mm', _max_chunk_elements = 2**20, _out = None, _workers = None, _executor = None, _precision = 'float64'):
+    axes = list(_axes)
+    fixed = HBTWN_SM.sweep_parameters(axes, _fixed)
+    HBTWN_CNM.check_precision(_precision)
+    workers = _workers or default_workers()
+    shape = tuple(len(axis) for axis in axes)
+    blocks = HBTWN_SM.plan_blocks(shape, _max_chunk_elements)
+    # Several blocks per task, 4 tasks per worker keep workers busy without large scheduling cost
+    tasks_size = max(1, -(-len(blocks) // (4*workers)))
+
+    start_time = time.perf_counter()
+    with SharedArrays({ 'telescope_size':np.empty(shape, dtype=_precision), 'angular_size':np.empty(shape, dtype=_precision) }, _copy=False) as outputs:
+        executor = _executor or ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [ executor.submit(_sweep_blocks, axes, fixed, _telescope_size_unit, _precision, outputs.layout, blocks[start:stop]) for start, stop in chunk_ranges(len(blocks), tasks_size) ]
+            for future in futures:
+                future.result()
+        finally:
+            if _executor is None:
+                executor.shutdown()
+        if _out is None:
+            telescope_size = outputs.arrays['telescope_size'].copy()
+            angular_size = outputs.arrays['angular_size'].copy()
+        else:
+            telescope_size, angular_size = _out
+            telescope_size[...] = outputs.arrays['telescope_size']
+            angular_size[...] = outputs.arrays['angular_size']
+    elapsed = time.perf_counter() - start_time
+
+    return HBTWN_SM.SweepResult(axes, telescope_size, angular_size, _telescope_size_unit, int(np.prod(shape, dtype=np.int64)), elapsed)
+
+'''
+benchmark_parallel - compare single process calculate_telescope_size_batch with calculate_telescope_size_batch_parallel
+_rows - number of calculated objects (default: 10**7)
+_workers - number of worker processes (default: number of CPU cores)
+_repeat - number of measurements, the best time is used (default: 3)
+@return dictionary with times in seconds and speed-up
+'''
+def benchmark_parallel(_rows = 10**7, _workers = None, _repeat = 3):
+    workers = _workers or default_workers()
+    rng = np.random.default_rng(0)
+    sizes = rng.uniform(1.0, 1.0e5, _rows)
+    distances = rng.uniform(1.0e3, 1.0e9, _rows)
+    shapes = rng.choice([ HBTWN_UCM.ObjectShape.FLAT.value, HBTWN_UCM.ObjectShape.SPHERICAL.value ], _rows)
+    pixels = rng.integers(1, 1000, _rows)
+
+    def best_time(_function):
+        times = []
+        for i in range(_repeat):
+            start_time = time.perf_counter()
+            result = _function()
+            times.append(time.perf_counter() - start_time)
+        return min(times), result
+
+    single_time, single = best_time(lambda: HBTWN_CNM.calculate_telescope_size_batch([ sizes, 'km' ], [ distances, 'km' ], shapes, pixels))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parallel_time, parallel = best_time(lambda: calculate_telescope_size_batch_parallel([ sizes, 'km' ], [ distances, 'km' ], shapes, pixels, _workers=workers, _executor=executor))
+
+    return { 'rows':_rows, 'workers':workers, 'single_time':single_time, 'parallel_time':parallel_time, 'speed_up':single_time/parallel_time,
+             'equal':bool(np.array_equal(single[0][0], parallel[0][0], equal_nan=True) and np.array_equal(single[1][0], parallel[1][0], equal_nan=True)) }
+
+
+if __name__ == '__main__':
+    import modules.ParallelModule as HBTWN_PM
+    result = HBTWN_PM.benchmark_parallel()
+    print('Rows: ' + str(result['rows']) + ', workers: ' + str(result['workers']))
+    print('Single process: ' + '%.3f' % result['single_time'] + ' s, ' + '%.3g' % (result['rows']/result['single_time']) + ' rows/s')
+    print('Process pool: ' + '%.3f' % result['parallel_time'] + ' s, ' + '%.3g' % (result['rows']/result['parallel_time']) + ' rows/s')
+    print('Speed-up: ' + '%.2f' % result['speed_up'] + 'x, results equal: ' + str(result['equal']))
@@ -0,0 +1,230 @@
+#!/bin/python3
+
+'''
+HBTWN - PlotModule
+Module storage angular resolution vs wavelength plots: vectorized curves with adaptive sampling and decimation,
+headless rendering with matplotlib Agg canvas (optional dependency) and gnuplot data/script writer.
+HBTWN PlotModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import os
+import time
+
+# Project modules
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+
+'''
+ResolutionCurve - angular resolution vs wavelength curve of single telescope
+Fields:
+label - curve label
+wavelengths - wavelengths array: [ wavelengths, unit ]
+resolutions - angular resolutions array: [ resolutions, unit ]
+'''
+class ResolutionCurve:
+    def __init__(self, _label, _wavelengths, _resolutions):
+        self.label = _label
+        self.wavelengths = _wavelengths
+        self.resolutions = _resolutions
+    def __len__(self):
+        return len(self.wavelengths[0])
+    def __repr__(self):
+        return 'ResolutionCurve(' + repr(self.label) + ', ' + str(len(self)) + ' points)'
+
+'''
+resolution_function - return vectorized function wavelength -> angular resolution of telescope
+_telescope_parameters - telescope size as array: [size, unit]
+_wavelength_unit - unit of function argument
+_resolution_unit - unit of function result
+'''
+def resolution_function(_telescope_parameters, _wavelength_unit = 'nm', _resolution_unit = 'arcsec'):
+    def function(_wavelengths):
+        return HBTWN_CNM.calculate_telescope_resolution_batch(_telescope_parameters, [ _wavelengths, _wavelength_unit ], _resolution_unit, _strict=HBTWN_STM.UNIT_ERRORS)[0]
+    return function
+
+def _to_plot(_values, _log):
+    return np.log10(_values) if _log else _values
+
+def _from_plot(_values, _log):
+    return 10.0**_values if _log else _values
+
+'''
+adaptive_sample - sample function densely only where its plot bends
+Every level evaluates midpoints of all intervals at once (vectorized), midpoint is kept only if its distance from
+the straight segment (in plot coordinates, relative to plot height) is larger than tolerance.
+_function - vectorized function
+_x_range - [ minimal x, maximal x ]
+_initial_samples - number of initial samples (default: 9)
+_tolerance - relative plot error (default: 0.001)
+_max_depth - maximal number of refinement levels (default: 12)
+_log_x, _log_y - logarithmic axes (default: True)
+@return x and y arrays
+'''
+def adaptive_sample(_function, _x_range, _initial_samples = 9, _tolerance = 0.001, _max_depth = 12, _log_x = True, _log_y = True):
+    px = np.linspace(_to_plot(_x_range[0], _log_x), _to_plot(_x_range[1], _log_x), max(2, _initial_samples))
+    x = _from_plot(px, _log_x)
+    y = np.asarray(_function(x), dtype=np.float64)
+    py = _to_plot(y, _log_y)
+    refine = np.ones(len(px)-1, dtype=bool)
+
+    for level in range(_max_depth):
+        intervals = np.nonzero(refine)[0]
+        if len(intervals) == 0:
+            break
+        pmid = 0.5*(px[intervals] + px[intervals+1])
+        xmid = _from_plot(pmid, _log_x)
+        ymid = np.asarray(_function(xmid), dtype=np.float64)
+        pymid = _to_plot(ymid, _log_y)
+        span = np.nanmax(py) - np.nanmin(py)
+        error = np.abs(pymid - 0.5*(py[intervals] + py[intervals+1]))/(span if span > 0.0 else 1.0)
+        keep = error > _tolerance
+        if not np.any(keep):
+            break
+        # Insert kept midpoints, both new sub-intervals are refined in the next level
+        intervals, pmid, xmid, ymid, pymid = intervals[keep], pmid[keep], xmid[keep], ymid[keep], pymid[keep]
+        px = np.insert(px, intervals+1, pmid)
+        x = np.insert(x, intervals+1, xmid)
+        y = np.insert(y, intervals+1, ymid)
+        py = np.insert(py, intervals+1, pymid)
+        refine = np.zeros(len(px)-1, dtype=bool)
+        new_points = intervals + 1 + np.arange(len(intervals))
+        refine[new_points-1] = True
+        refine[new_points] = True
+
+    return x, y
+
+'''
+decimate - remove points which do not change plot more than tolerance (Ramer-Douglas-Peucker in plot coordinates)
+_x, _y - curve points
+_tolerance - relative plot error (default: 0.001)
+_log_x, _log_y - logarithmic axes (default: True)
+@return decimated x and y arrays
+'''
+def decimate(_x, _y, _tolerance = 0.001, _log_x = True, _log_y = True):
+    x = np.asarray(_x, dtype=np.float64)
+    y = np.asarray(_y, dtype=np.float64)
+    if len(x) < 3:
+        return x, y
+    px = _to_plot(x, _log_x)
+    py = _to_plot(y, _log_y)
+    # Relative tolerance: plot coordinates are scaled to unit square
+    px = (px - px.min())/((px.max() - px.min()) or 1.0)
+    py = (py - np.nanmin(py))/((np.nanmax(py) - np.nanmin(py)) or 1.0)
+    keep = np.zeros(len(x), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [ (0, len(x)-1) ]
+    while stack:
+        start, stop = stack.pop()
+        if stop - start < 2:
+            continue
+        dx, dy = px[stop] - px[start], py[stop] - py[start]
+        distance = np.abs(dy*(px[start+1:stop] - px[start]) - dx*(py[start+1:stop] - py[start]))/(np.hypot(dx, dy) or 1.0)
+        index = int(np.nanargmax(distance)) if not np.all(np.isnan(distance)) else 0
+        if distance[index] > _tolerance:
+            index += start + 1
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, stop))
+    return x[keep], y[keep]
+
+'''
+resolution_curve - angular resolution vs wavelength curve for telescope
+_telescope_parameters - telescope size as array: [size, unit]
+_wavelength_range - wavelength range as array: [ [ minimal, maximal ], unit ]
+_resolution_unit - resolution unit (default: arcsec)
+_tolerance - relative plot error used by adaptive sampling and decimation (default: 0.001)
+_label - curve label (default: telescope size)
+@return ResolutionCurve
+'''
+def resolution_curve(_telescope_parameters, _wavelength_range, _resolution_unit = 'arcsec', _tolerance = 0.001, _label = None):
+    function = resolution_function(_telescope_parameters, _wavelength_range[1], _resolution_unit)
+    x, y = adaptive_sample(function, _wavelength_range[0], _tolerance=_tolerance)
+    x, y = decimate(x, y, _tolerance)
+    label = _label if _label is not None else 'D = ' + '%g' % _telescope_parameters[0] + ' ' + str(_telescope_parameters[1])
+    return ResolutionCurve(label, [ x, _wavelength_range[1] ], [ y, _resolution_unit ])
+
+'''
+render_png - render curves to image file with matplotlib Agg canvas (no GUI, no pyplot global state)
+_curves - list of ResolutionCurve (the same units)
+_path - image file path (format from extension, ex. png/svg/pdf)
+_title - plot title
+_size - figure size in inches (default: (6.4, 4.8))
+_dpi - image resolution (default: 100)
+'''
+def render_png(_curves, _path, _title = '', _size = (6.4, 4.8), _dpi = 100):
+    # Optional dependency is imported only when figure is rendered
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=_size, dpi=_dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(1, 1, 1)
+    for curve in _curves:
+        axes.plot(curve.wavelengths[0], curve.resolutions[0], label=curve.label)
+    axes.set_xscale('log')
+    axes.set_yscale('log')
+    if _curves:
+        axes.set_xlabel('Wavelength [' + _curves[0].wavelengths[1] + ']')
+        axes.set_ylabel('Angular resolution [' + _curves[0].resolutions[1] + ']')
+        axes.legend()
+    axes.grid(True, which='both', alpha=0.3)
+    axes.set_title(_title)
+    figure.savefig(_path)
+
+'''
+write_gnuplot - write gnuplot data file and script which renders curves to image
+_curves - list of ResolutionCurve (the same units)
+_data_path - data file path (every curve is separate data block)
+_script_path - gnuplot script path
+_image_path - image path used in script (default: script path with .png extension)
+_title - plot title
+'''
+def write_gnuplot(_curves, _data_path, _script_path, _image_path = None, _title = ''):
+    image_path = _image_path or os.path.splitext(_script_path)[0] + '.png'
+    with open(_data_path, 'w') as data_file:
+        for index, curve in enumerate(_curves):
+            if index:
+                data_file.write('\n\n')
+            data_file.write('# ' + curve.label + '\n')
+            np.savetxt(data_file, np.column_stack((curve.wavelengths[0], curve.resolutions[0])), fmt='%.10g')
+
+    lines = [ 'set terminal pngcairo size 640,480',
+              'set output ' + _gnuplot_string(image_path),
+              'set title ' + _gnuplot_string(_title),
+              'set logscale xy',
+              'set grid' ]
+    if _curves:
+        lines.append('set xlabel ' + _gnuplot_string('Wavelength [' + _curves[0].wavelengths[1] + ']'))
+        lines.append('set ylabel ' + _gnuplot_string('Angular resolution [' + _curves[0].resolutions[1] + ']'))
+        lines.append('plot ' + ', '.join(_gnuplot_string(_data_path) + ' index ' + str(index) + ' with lines title ' + _gnuplot_string(curve.label) for index, curve in enumerate(_curves)))
+    with open(_script_path, 'w') as script_file:
+        script_file.write('\n'.join(lines) + '\n')
+
+def _gnuplot_string(_text):
+    # Gnuplot single quoted string, quote is escaped by doubling it
+    return "'" + _text.replace("'", "''") + "'"
+
+'''
+render_batch - render many plots in headless batch job
+_jobs - list of dictionaries: { 'name':file name, 'telescopes':[ [ size, unit ], ... ], 'wavelength_range':[ [ min, max ], unit ], 'title':title (optional) }
+_output_directory - directory for plots
+_format - png (matplotlib) or gnuplot (data and script files)
+_resolution_unit - resolution unit (default: arcsec)
+_tolerance - relative plot error (default: 0.001)
+@return dictionary with number of figures, elapsed time and figures per minute
+'''
+def render_batch(_jobs, _output_directory, _format = 'png', _resolution_unit = 'arcsec', _tolerance = 0.001):
+    if _format not in ('png', 'gnuplot'):
+        raise ValueError('Unsupported plot format: ' + repr(_format))
+    os.makedirs(_output_directory, exist_ok=True)
+    start_time = time.perf_counter()
+    for job in _jobs:
+        curves = [ resolution_curve(telescope, job['wavelength_range'], _resolution_unit, _tolerance) for telescope in job['telescopes'] ]
+        path = os.path.join(_output_directory, job['name'])
+        if _format == 'png':
+            render_png(curves, path + '.png', job.get('title', ''))
+        else:
+            write_gnuplot(curves, path + '.dat', path + '.gp', path + '.png', job.get('title', ''))
+    elapsed = time.perf_counter() - start_time
+    return { 'figures':len(_jobs), 'elapsed':elapsed, 'figures_per_minute':60.0*len(_jobs)/elapsed if elapsed > 0.0 else float('inf') }
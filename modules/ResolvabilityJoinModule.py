@@ -0,0 +1,91 @@
+#!/bin/python3
+
+'''
+HBTWN - ResolvabilityJoinModule
+Module storage many-to-many join of objects and telescopes, finds every (object, telescope) pair where telescope resolves object.
+Both sides are sorted by angular quantity and merged, cost is O((N+M) log) plus number of returned pairs, no N x M matrix is created.
+HBTWN ResolvabilityJoinModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+
+'''
+objects_angular_resolution - angular size of single pixel of objects images, it is resolution required to see objects
+_target_obj_physical_size - objects physical sizes as array: [ sizes, unit or array of units ]
+_target_obj_physical_dist - objects physical distances as array: [ distances, unit or array of units ]
+_object_shape - object shape or array of shapes (default: ObjectShape.SPHERICAL)
+_number_of_pixels - number of pixels on image, number or array (default: 1)
+@return required angular resolutions in arcsec as array: [ resolutions, arcsec ]
+'''
+def objects_angular_resolution(_target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 1):
+    size_m = HBTWN_UCM.DIST_UNITS.convert_array(_target_obj_physical_size[0], _target_obj_physical_size[1], 'm')
+    size_scaled_m = size_m*(1.0/np.asarray(_number_of_pixels, dtype=np.float64))
+    return HBTWN_CNM.calculate_angular_size_batch([ size_scaled_m, 'm' ], _target_obj_physical_dist, _object_shape, 'arcsec', _strict=HBTWN_STM.UNIT_ERRORS)
+
+'''
+telescopes_angular_resolution - angular resolution of telescopes
+_telescope_parameters - telescopes apertures as array: [ apertures, unit or array of units ]
+_wavelength - wavelength values (default: [522.0, nm])
+@return telescopes resolutions in arcsec as array: [ resolutions, arcsec ]
+'''
+def telescopes_angular_resolution(_telescope_parameters, _wavelength = [522.0, 'nm']):
+    return HBTWN_CNM.calculate_telescope_resolution_batch(_telescope_parameters, _wavelength, 'arcsec', _strict=HBTWN_STM.UNIT_ERRORS)
+
+'''
+resolvable_counts - number of telescopes which resolve every object (merge of sorted sides without pairs)
+_objects_resolution - objects required angular resolutions: [ resolutions, unit ]
+_telescopes_resolution - telescopes angular resolutions: [ resolutions, unit ]
+@return array with number of resolving telescopes for every object
+'''
+def resolvable_counts(_objects_resolution, _telescopes_resolution):
+    objects = HBTWN_UCM.ANGLE_UNITS.convert_array(_objects_resolution[0], _objects_resolution[1], 'arcsec').reshape(-1)
+    telescopes = np.sort(HBTWN_UCM.ANGLE_UNITS.convert_array(_telescopes_resolution[0], _telescopes_resolution[1], 'arcsec').reshape(-1))
+    # NaN required resolution is never resolved
+    return np.where(np.isnan(objects), 0, np.searchsorted(telescopes, objects, side='right'))
+
+'''
+resolvable_pairs - stream every (object, telescope) pair where telescope resolution <= object required resolution
+Telescopes are sorted by resolution and objects by required resolution, for every object the resolving telescopes are
+prefix of sorted telescopes (prefix length is found by merge of sorted sides), pairs are generated in blocks.
+_objects_resolution - objects required angular resolutions: [ resolutions, unit ] (ex. from objects_angular_resolution)
+_telescopes_resolution - telescopes angular resolutions: [ resolutions, unit ] (ex. from telescopes_angular_resolution)
+_max_pairs - maximal number of pairs in single block (default: 2**20)
+@return generator of blocks: (objects indices, telescopes indices, margins), indices are positions in input arrays,
+margin is object required resolution divided by telescope resolution (>= 1.0, larger is better),
+blocks are ordered by object required resolution, pairs of object are ordered from the best telescope resolution
+'''
+def resolvable_pairs(_objects_resolution, _telescopes_resolution, _max_pairs = 2**20):
+    objects = HBTWN_UCM.ANGLE_UNITS.convert_array(_objects_resolution[0], _objects_resolution[1], 'arcsec').reshape(-1)
+    telescopes = HBTWN_UCM.ANGLE_UNITS.convert_array(_telescopes_resolution[0], _telescopes_resolution[1], 'arcsec').reshape(-1)
+    max_pairs = max(1, int(_max_pairs))
+
+    telescopes_order = np.argsort(telescopes, kind='stable')
+    telescopes_sorted = telescopes[telescopes_order]
+    # NaN objects are sorted at the end and removed, they are never resolved
+    objects_order = np.argsort(objects, kind='stable')
+    objects_order = objects_order[~np.isnan(objects[objects_order])]
+    objects_sorted = objects[objects_order]
+
+    # Merge of sorted sides: counts are non-decreasing, object k is resolved by telescopes_order[:counts[k]]
+    counts = np.searchsorted(telescopes_sorted, objects_sorted, side='right')
+    first = int(np.searchsorted(counts, 0, side='right'))
+    ends = np.cumsum(counts)
+
+    start = first
+    while start < len(counts):
+        # The largest objects range with at most max_pairs pairs (at least one object)
+        offset = ends[start-1] if start > 0 else 0
+        stop = max(start+1, int(np.searchsorted(ends, offset+max_pairs, side='right')))
+        block_counts = counts[start:stop]
+        total = int(ends[stop-1] - offset)
+        block_starts = np.repeat(ends[start:stop] - block_counts - offset, block_counts)
+        positions = np.arange(total) - block_starts
+        objects_index = np.repeat(objects_order[start:stop], block_counts)
+        telescopes_index = telescopes_order[positions]
+        yield objects_index, telescopes_index, objects[objects_index]/telescopes[telescopes_index]
+        start = stop
@@ -0,0 +1,306 @@
+#!/bin/python3
+
+'''
+HBTWN - ResultStoreModule
+Module storage persistent result store: directory with .npy column files (memory mapped, readable by numpy.load) and JSON header
+with axes, units, inputs hash and completed chunks. Results are written incrementally, interrupted runs are resumed by skipping
+completed chunks, readers get random access and slicing without loading whole columns.
+Fixed shape store (sweep cube): columns are preallocated, completed chunks are marked in completed.npy.
+Appendable store (catalog): rows are appended to columns, header keeps number of committed rows and hash of every chunk.
+HBTWN ResultStoreModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import hashlib
+import json
+import io
+import os
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+
+'''
+STORE_FORMAT - header format name and version
+HEADER_FILE - header file name in store directory
+COMPLETED_FILE - completed chunks flags file name (fixed shape store)
+'''
+STORE_FORMAT = 'HBTWN-result-store'
+STORE_VERSION = 1
+HEADER_FILE = 'header.json'
+COMPLETED_FILE = 'completed.npy'
+
+'''
+inputs_hash - hash of calculation inputs, stored in header and compared when run is resumed
+_items - NumPy arrays (dtype, shape and data are hashed) or JSON serializable values
+@return hex digest (sha256)
+'''
+def inputs_hash(*_items):
+    digest = hashlib.sha256()
+    for item in _items:
+        if isinstance(item, np.ndarray):
+            item = np.ascontiguousarray(item)
+            digest.update(json.dumps([ item.dtype.str, item.shape ]).encode())
+            digest.update(item.view(np.uint8).reshape(-1) if item.dtype.kind != 'U' else item.tobytes())
+        else:
+            digest.update(json.dumps(item, sort_keys=True, default=str).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+'''
+ResultStore - opened result store, use create_store / open_store
+Fields:
+path - store directory
+header - header dictionary (format, shape, columns, axes, inputs_hash, chunks, attributes)
+mode - r (read only) or r+ (write)
+Methods:
+column - memory mapped column array (slicing reads only selected part of file)
+unit - column unit
+quantity - column as QuantityArray (values without copy and column unit)
+axis - axis values and unit as array: [ values, unit ]
+write - write chunk of fixed shape store (data of chunk is flushed before chunk is marked completed)
+is_completed / completed_chunks - completed chunks of fixed shape store
+append - append rows to appendable store, header is committed after data
+chunk_hashes - hashes of appended chunks
+set_complete / complete - appendable store is marked complete when whole input is processed
+'''
+class ResultStore:
+    def __init__(self, _path, _header, _mode):
+        self.path = _path
+        self.header = _header
+        self.mode = _mode
+        self._columns = {}
+        self._completed = None
+
+    @property
+    def appendable(self):
+        return self.header['shape'] is None
+
+    @property
+    def shape(self):
+        return (self.header['rows'],) if self.appendable else tuple(self.header['shape'])
+
+    @property
+    def rows(self):
+        return self.shape[0]
+
+    @property
+    def column_names(self):
+        return tuple(self.header['columns'])
+
+    @property
+    def attributes(self):
+        return self.header['attributes']
+
+    def __getitem__(self, _name):
+        return self.column(_name)
+
+    def _column_path(self, _name):
+        try:
+            return os.path.join(self.path, self.header['columns'][_name]['file'])
+        except KeyError:
+            raise KeyError('Unknown result store column: ' + repr(_name)) from None
+
+    def column(self, _name):
+        if self.appendable:
+            # Appendable columns are mapped again after every append (file size changes)
+            if self.rows == 0:
+                return np.empty(0, dtype=self.header['columns'][_name]['dtype'])
+            return np.load(self._column_path(_name), mmap_mode='r')
+        if _name not in self._columns:
+            self._columns[_name] = np.load(self._column_path(_name), mmap_mode=self.mode)
+        return self._columns[_name]
+
+    def unit(self, _name):
+        return self.header['columns'][_name]['unit']
+
+    def quantity(self, _name):
+        unit = self.unit(_name)
+        if unit is None:
+            raise ValueError('Result store column ' + repr(_name) + ' has no unit')
+        return HBTWN_UCM.QuantityArray(self.column(_name), unit)
+
+    def axis(self, _name):
+        for axis in self.header['axes']:
+            if axis['name'] == _name:
+                return [ np.load(os.path.join(self.path, axis['file']), mmap_mode='r'), axis['unit'] ]
+        raise KeyError('Unknown result store axis: ' + repr(_name))
+
+    def _check_writable(self):
+        if self.mode != 'r+':
+            raise ValueError('Result store ' + repr(self.path) + ' is opened read only')
+
+    def _completed_flags(self):
+        if self._completed is None:
+            self._completed = np.load(os.path.join(self.path, COMPLETED_FILE), mmap_mode=self.mode)
+        return self._completed
+
+    def is_completed(self, _chunk):
+        return bool(self._completed_flags()[_chunk])
+
+    def completed_chunks(self):
+        return int(np.count_nonzero(self._completed_flags()))
+
+    @property
+    def complete(self):
+        if self.appendable:
+            return bool(self.header['chunks'].get('complete', False))
+        return self.completed_chunks() == len(self._completed_flags())
+
+    def write(self, _chunk, _index, _columns):
+        self._check_writable()
+        for name, values in _columns.items():
+            column = self.column(name)
+            column[_index] = values
+            column.flush()
+        flags = self._completed_flags()
+        flags[_chunk] = 1
+        flags.flush()
+
+    def append(self, _columns, _chunk_hash = None):
+        self._check_writable()
+        if set(_columns) != set(self.header['columns']):
+            raise ValueError('Appended chunk has to contain all columns: ' + ', '.join(self.header['columns']))
+        rows = self.rows
+        lengths = { len(values) for values in _columns.values() }
+        if len(lengths) != 1:
+            raise ValueError('Appended columns have different lengths')
+        added = lengths.pop()
+        for name, values in _columns.items():
+            _append_npy(self._column_path(name), rows, np.asarray(values, dtype=self.header['columns'][name]['dtype']))
+        # Header is committed after data, rows written after last commit are overwritten on resume
+        self.header['rows'] = rows + added
+        self.header['chunks']['hashes'].append(_chunk_hash)
+        _write_header(self.path, self.header)
+
+    def chunk_hashes(self):
+        return list(self.header['chunks']['hashes'])
+
+    def set_complete(self, _complete = True):
+        self._check_writable()
+        self.header['chunks']['complete'] = bool(_complete)
+        _write_header(self.path, self.header)
+
+    def flush(self):
+        for column in self._columns.values():
+            if self.mode == 'r+':
+                column.flush()
+
+    def __repr__(self):
+        return 'ResultStore(' + repr(self.path) + ', shape ' + str(self.shape) + ', columns: ' + ', '.join(self.column_names) + ')'
+
+'''
+create_store - create new result store directory
+_path - store directory
+_columns - dictionary column name:(dtype, unit or None)
+_shape - columns shape, None creates appendable store (rows are appended) (default: None)
+_axes - list of axes as arrays: [ name, values, unit ], axis i describes dimension i of fixed shape store (default: [])
+_inputs_hash - hash of calculation inputs (default: None)
+_chunks - number of chunks of fixed shape store (default: 1)
+_attributes - additional JSON serializable attributes stored in header ex. plan of chunks (default: {})
+_overwrite - remove existing store files (default: False, existing store raises FileExistsError)
+@return ResultStore opened for writing
+'''
+def create_store(_path, _columns, _shape = None, _axes = None, _inputs_hash = None, _chunks = 1, _attributes = None, _overwrite = False):
+    header_path = os.path.join(_path, HEADER_FILE)
+    if os.path.exists(header_path) and not _overwrite:
+        raise FileExistsError('Result store already exists: ' + repr(_path))
+    os.makedirs(_path, exist_ok=True)
+
+    shape = None if _shape is None else [ int(size) for size in _shape ]
+    columns = {}
+    for name, (dtype, unit) in _columns.items():
+        dtype = np.dtype(dtype)
+        columns[name] = { 'file':name + '.npy', 'dtype':dtype.str, 'unit':unit }
+        column_path = os.path.join(_path, name + '.npy')
+        with open(column_path, 'wb') as file:
+            file.write(_npy_header(dtype, (0,) if shape is None else tuple(shape)))
+            # File is extended without writing data (sparse file), data is written by chunks
+            if shape is not None:
+                file.truncate(file.tell() + int(np.prod(shape, dtype=np.int64))*dtype.itemsize)
+    axes = []
+    for name, values, unit in (_axes or []):
+        np.save(os.path.join(_path, 'axis_' + name + '.npy'), np.asarray(values))
+        axes.append({ 'name':name, 'file':'axis_' + name + '.npy', 'unit':unit })
+    if shape is None:
+        chunks = { 'hashes':[], 'complete':False }
+    else:
+        np.save(os.path.join(_path, COMPLETED_FILE), np.zeros(int(_chunks), dtype=np.uint8))
+        chunks = { 'count':int(_chunks) }
+
+    header = { 'format':STORE_FORMAT, 'version':STORE_VERSION, 'shape':shape, 'rows':0 if shape is None else None, 'columns':columns, 'axes':axes, 'inputs_hash':_inputs_hash, 'chunks':chunks, 'attributes':dict(_attributes or {}) }
+    _write_header(_path, header)
+    return ResultStore(_path, header, 'r+')
+
+'''
+open_store - open existing result store
+_path - store directory
+_mode - r (read only) or r+ (write, resume) (default: r)
+_inputs_hash - expected inputs hash, store created for other inputs raises ValueError (default: None - not checked)
+@return ResultStore
+'''
+def open_store(_path, _mode = 'r', _inputs_hash = None):
+    if _mode not in ('r', 'r+'):
+        raise ValueError('Unsupported result store mode: ' + repr(_mode))
+    with open(os.path.join(_path, HEADER_FILE), 'r', encoding='utf-8') as file:
+        header = json.load(file)
+    if header.get('format') != STORE_FORMAT or header.get('version') != STORE_VERSION:
+        raise ValueError('Unsupported result store format: ' + repr(_path))
+    if _inputs_hash is not None and header['inputs_hash'] != _inputs_hash:
+        raise ValueError('Result store ' + repr(_path) + ' was created for different inputs')
+    store = ResultStore(_path, header, _mode)
+    if store.appendable and _mode == 'r+':
+        # Data appended after the last header commit (interrupted run) is dropped
+        for name in header['columns']:
+            _truncate_npy(store._column_path(name), header['rows'])
+    return store
+
+'''
+exists - True if directory contains result store
+'''
+def exists(_path):
+    return os.path.exists(os.path.join(_path, HEADER_FILE))
+
+def _write_header(_path, _header):
+    # Atomic replace, header is never partially written
+    temporary_path = os.path.join(_path, HEADER_FILE + '.tmp')
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(_header, file, indent=1, default=str)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, os.path.join(_path, HEADER_FILE))
+
+def _npy_header(_dtype, _shape):
+    header = { 'descr':np.lib.format.dtype_to_descr(np.dtype(_dtype)), 'fortran_order':False, 'shape':tuple(_shape) }
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, header)
+    return buffer.getvalue()
+
+def _npy_layout(_file):
+    np.lib.format.read_magic(_file)
+    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(_file)
+    return _file.tell(), shape, dtype
+
+def _set_npy_rows(_file, _offset, _dtype, _rows):
+    # NumPy pads header for shape growth, so header is rewritten in place
+    header = _npy_header(_dtype, (_rows,))
+    if len(header) != _offset:
+        raise ValueError('Result store column header can not be resized in place')
+    _file.seek(0)
+    _file.write(header)
+
+def _append_npy(_path, _rows, _values):
+    with open(_path, 'r+b') as file:
+        offset, shape, dtype = _npy_layout(file)
+        file.seek(offset + _rows*dtype.itemsize)
+        file.write(np.ascontiguousarray(_values, dtype=dtype).tobytes())
+        file.truncate()
+        file.flush()
+        os.fsync(file.fileno())
+        _set_npy_rows(file, offset, dtype, _rows + len(_values))
+
+def _truncate_npy(_path, _rows):
+    with open(_path, 'r+b') as file:
+        offset, shape, dtype = _npy_layout(file)
+        if shape != (_rows,):
+            file.truncate(offset + _rows*dtype.itemsize)
+            _set_npy_rows(file, offset, dtype, _rows)
@@ -0,0 +1,176 @@
+#!/bin/python3
+
+'''
+HBTWN - SNRModule
+Module storage vectorized signal to noise ratio (SNR) and exposure time calculations (CCD equation).
+SNR = S t / sqrt( S t + n ( B t + D t + R^2 ) )
+where S - source rate [e-/s], n - number of pixels in aperture, B - sky rate per pixel [e-/s], D - dark current [e-/s], R - read noise [e-]
+HBTWN SNRModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.StatusModule as HBTWN_STM
+
+'''
+H_PLANCK - Planck constant [J s]
+AB_ZERO_POINT - flux density of AB magnitude 0 [W / (m^2 Hz)] (3631 Jy)
+'''
+H_PLANCK = 6.62607015e-34
+AB_ZERO_POINT = 3631.0e-26
+
+'''
+SNRParameters - observation parameters which are common for all targets
+_bandwidth - filter bandwidth as array: [ bandwidth, unit ] (default: [100.0, nm])
+_throughput - total efficiency of atmosphere, optics and detector quantum efficiency (default: 0.5)
+_obstruction - central obstruction diameter as fraction of telescope diameter (default: 0.0)
+_sky_brightness - sky surface brightness [AB mag / arcsec^2] (default: 21.0)
+_pixel_scale - angular size of single pixel as array: [ angle, unit ] (default: [0.5, arcsec])
+_pixels_in_aperture - number of pixels in photometric aperture (default: 9.0)
+_dark_current - detector dark current [e- / s / pixel] (default: 0.01)
+_read_noise - detector read noise [e- / pixel] (default: 5.0)
+Values could be NumPy arrays, they are broadcast together with targets and telescopes.
+'''
+class SNRParameters:
+    def __init__(self, _bandwidth = [100.0, 'nm'], _throughput = 0.5, _obstruction = 0.0, _sky_brightness = 21.0, _pixel_scale = [0.5, 'arcsec'], _pixels_in_aperture = 9.0, _dark_current = 0.01, _read_noise = 5.0):
+        self.bandwidth = _bandwidth
+        self.throughput = _throughput
+        self.obstruction = _obstruction
+        self.sky_brightness = _sky_brightness
+        self.pixel_scale = _pixel_scale
+        self.pixels_in_aperture = _pixels_in_aperture
+        self.dark_current = _dark_current
+        self.read_noise = _read_noise
+
+'''
+photon_flux_density - photon flux density of AB magnitudes
+n = f_nu / (h lambda), where f_nu = AB_ZERO_POINT * 10^(-0.4 m)
+_magnitudes - AB magnitudes (number or array)
+_wavelength_m - wavelengths [m] (number or array)
+@return photon flux density array [photons / (s m^2 m)]
+'''
+def photon_flux_density(_magnitudes, _wavelength_m):
+    return AB_ZERO_POINT*10.0**(-0.4*np.asarray(_magnitudes, dtype=np.float64))/(H_PLANCK*_wavelength_m)
+
+'''
+calculate_signal_rates - detected source rate and noise rate per pixel, every value could be NumPy array (arrays are broadcast together)
+_magnitudes - targets AB magnitudes
+_telescope_parameters - telescope sizes as array: [ sizes, unit or array of units ]
+_wavelength - wavelength values as array: [ wavelengths, unit or array of units ] (default: [522.0, nm])
+_parameters - SNRParameters (default: SNRParameters())
+@return source rate [e-/s] and noise rate per pixel (sky and dark current) [e-/s] arrays, raise UnsupportedUnitError for unknown units
+'''
+def calculate_signal_rates(_magnitudes, _telescope_parameters, _wavelength = [522.0, 'nm'], _parameters = None):
+    parameters = _parameters if _parameters is not None else SNRParameters()
+    size_m = HBTWN_UCM.DIST_UNITS.convert_array(_telescope_parameters[0], _telescope_parameters[1], 'm')
+    wavelength_m = HBTWN_UCM.DIST_UNITS.convert_array(_wavelength[0], _wavelength[1], 'm')
+    bandwidth_m = HBTWN_UCM.DIST_UNITS.convert_array(parameters.bandwidth[0], parameters.bandwidth[1], 'm')
+    pixel_scale_arcsec = HBTWN_UCM.ANGLE_UNITS.convert_array(parameters.pixel_scale[0], parameters.pixel_scale[1], 'arcsec')
+    return _signal_rates(_magnitudes, size_m, wavelength_m, bandwidth_m, pixel_scale_arcsec, parameters)
+
+def _signal_rates(_magnitudes, _size_m, _wavelength_m, _bandwidth_m, _pixel_scale_arcsec, _parameters):
+    obstruction = np.asarray(_parameters.obstruction, dtype=np.float64)
+    # Collected photons per (photon flux density) unit: area * bandwidth * throughput
+    collecting = (0.25*np.pi)*_size_m*_size_m*(1.0 - obstruction*obstruction)*_bandwidth_m*_parameters.throughput
+    source_rate = photon_flux_density(_magnitudes, _wavelength_m)*collecting
+    sky_rate = photon_flux_density(_parameters.sky_brightness, _wavelength_m)*(_pixel_scale_arcsec*_pixel_scale_arcsec)*collecting
+    return source_rate, sky_rate + _parameters.dark_current
+
+'''
+Batch functions use error model of StatusModule (see CoreNumericalModule): wrong elements give NaN results, status codes are returned with _return_status.
+_strict - False (default, never raise), True (raise CalculationError for any wrong element) or collection of CalculationStatus which raise
+_return_status - return status array (CalculationStatus values) as the last result (default: False)
+Wrong units of SNRParameters (bandwidth, pixel scale) are UNSUPPORTED_UNIT, their non-positive values are INVALID_VALUE.
+'''
+def _batch_rates(_magnitudes, _telescope_parameters, _wavelength, _parameters):
+    # Signal rates of batch and function which marks status of wrong inputs (called only if fast check fails)
+    magnitudes = HBTWN_STM.float_values(_magnitudes)
+    size_m, size, size_scales = HBTWN_STM.to_base(_telescope_parameters, HBTWN_UCM.DIST_UNITS, 'm')
+    wavelength_m, wavelength, wavelength_scales = HBTWN_STM.to_base(_wavelength, HBTWN_UCM.DIST_UNITS, 'm')
+    bandwidth_m, bandwidth, bandwidth_scales = HBTWN_STM.to_base(_parameters.bandwidth, HBTWN_UCM.DIST_UNITS, 'm')
+    pixel_scale_arcsec, pixel_scale, pixel_scale_scales = HBTWN_STM.to_base(_parameters.pixel_scale, HBTWN_UCM.ANGLE_UNITS, 'arcsec')
+    with np.errstate(invalid='ignore', over='ignore'):
+        source_rate, noise_rate = _signal_rates(magnitudes, size_m, wavelength_m, bandwidth_m, pixel_scale_arcsec, _parameters)
+
+    def mark(_status):
+        if HBTWN_STM.positive_finite(size, wavelength, bandwidth, pixel_scale, size_scales, wavelength_scales, bandwidth_scales, pixel_scale_scales) and np.all(np.isfinite(magnitudes)):
+            return
+        HBTWN_STM.mark(_status, ~np.isfinite(magnitudes), HBTWN_STM.CalculationStatus.INVALID_VALUE)
+        HBTWN_STM.mark_input(_status, size, size_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_TELESCOPE_SIZE)
+        HBTWN_STM.mark_input(_status, wavelength, wavelength_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_WAVELENGTH)
+        for values, scales in ((bandwidth, bandwidth_scales), (pixel_scale, pixel_scale_scales)):
+            HBTWN_STM.mark_input(_status, values, scales, HBTWN_STM.CalculationStatus.INVALID_VALUE)
+    return source_rate, noise_rate, mark
+
+'''
+calculate_snr_batch - signal to noise ratio of targets, every value could be NumPy array (arrays are broadcast together)
+_magnitudes - targets AB magnitudes
+_exposure_time - exposure times as array: [ times, unit or array of units ]
+_telescope_parameters - telescope sizes as array: [ sizes, unit or array of units ]
+_wavelength - wavelength values as array: [ wavelengths, unit or array of units ] (default: [522.0, nm])
+_parameters - SNRParameters (default: SNRParameters())
+_strict, _return_status - error model (see above)
+@return SNR array (and status array)
+'''
+def calculate_snr_batch(_magnitudes, _exposure_time, _telescope_parameters, _wavelength = [522.0, 'nm'], _parameters = None, _strict = False, _return_status = False):
+    parameters = _parameters if _parameters is not None else SNRParameters()
+    time_s, time, time_scales = HBTWN_STM.to_base(_exposure_time, HBTWN_UCM.TIME_UNITS, 's')
+    source_rate, noise_rate, mark = _batch_rates(_magnitudes, _telescope_parameters, _wavelength, parameters)
+
+    signal = source_rate*time_s
+    pixels = np.asarray(parameters.pixels_in_aperture, dtype=np.float64)
+    read_noise = np.asarray(parameters.read_noise, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        snr = np.array(signal/np.sqrt(signal + pixels*(noise_rate*time_s + read_noise*read_noise)), dtype=np.float64)
+
+    status = HBTWN_STM.new_status(snr.shape)
+    mark(status)
+    if not HBTWN_STM.positive_finite(time, time_scales):
+        HBTWN_STM.mark_input(status, time, time_scales, HBTWN_STM.CalculationStatus.NON_POSITIVE_EXPOSURE_TIME)
+
+    HBTWN_STM.finish(status, [ snr ], _strict)
+    return (snr, status) if _return_status else snr
+
+'''
+calculate_exposure_time_batch - exposure time which is needed to reach SNR, closed form solution of CCD equation
+S^2 t^2 - SNR^2 (S + n (B + D)) t - SNR^2 n R^2 = 0
+t = [ SNR^2 (S + n (B + D)) + sqrt( SNR^4 (S + n (B + D))^2 + 4 S^2 SNR^2 n R^2 ) ] / (2 S^2)
+Every value could be NumPy array (arrays are broadcast together), ex. targets as column and telescopes as row give table of times.
+_magnitudes - targets AB magnitudes
+_snr - required signal to noise ratio (number or array)
+_telescope_parameters - telescope sizes as array: [ sizes, unit or array of units ]
+_wavelength - wavelength values as array: [ wavelengths, unit or array of units ] (default: [522.0, nm])
+_parameters - SNRParameters (default: SNRParameters())
+_time_unit - exposure time unit (default: s)
+_strict, _return_status - error model (see above)
+@return exposure times and unit as QuantityArray (and status array), inf for targets without detected signal
+'''
+def calculate_exposure_time_batch(_magnitudes, _snr, _telescope_parameters, _wavelength = [522.0, 'nm'], _parameters = None, _time_unit = 's', _strict = False, _return_status = False):
+    parameters = _parameters if _parameters is not None else SNRParameters()
+    source_rate, noise_rate, mark = _batch_rates(_magnitudes, _telescope_parameters, _wavelength, parameters)
+
+    snr = HBTWN_STM.float_values(_snr)
+    snr2 = np.square(snr)
+    pixels = np.asarray(parameters.pixels_in_aperture, dtype=np.float64)
+    read_noise = np.asarray(parameters.read_noise, dtype=np.float64)
+    linear = snr2*(source_rate + pixels*noise_rate)
+    source2 = source_rate*source_rate
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        time_s = (linear + np.sqrt(linear*linear + 4.0*source2*snr2*pixels*read_noise*read_noise))/(2.0*source2)
+        time_s = np.where(source_rate > 0.0, time_s, np.inf)
+
+    status = HBTWN_STM.new_status(time_s.shape)
+    mark(status)
+    if not HBTWN_STM.positive_finite(snr):
+        HBTWN_STM.mark_values(status, snr, HBTWN_STM.CalculationStatus.NON_POSITIVE_SNR)
+    if _time_unit in HBTWN_UCM.TIME_UNITS:
+        time = np.array(HBTWN_UCM.TIME_UNITS.convert(time_s, 's', _time_unit), dtype=np.float64)
+    else:
+        HBTWN_STM.mark(status, True, HBTWN_STM.CalculationStatus.UNSUPPORTED_UNIT)
+        time = np.full(time_s.shape, np.nan)
+
+    HBTWN_STM.finish(status, [ time ], _strict)
+    result = HBTWN_UCM.QuantityArray(time, _time_unit, HBTWN_UCM.TIME_UNITS)
+    return (result, status) if _return_status else result
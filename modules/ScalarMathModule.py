@@ -0,0 +1,106 @@
+#!/bin/python3
+
+'''
+HBTWN - ScalarMathModule
+Module storage pure Python (math module) scalar versions of core functions, used by command line fast path without NumPy import.
+Formulas and order of operations are the same as in CoreNumericalModule scalar functions, results could differ only in the last bit
+(math and NumPy trigonometric functions implementations).
+Functions raise ValueError (UnsupportedUnitError for unknown units) instead of returning None.
+HBTWN ScalarMathModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import math
+
+# Project modules
+import modules.UnitsTablesModule as HBTWN_UTM
+
+'''
+is_flat - True for FLAT object shape (ObjectShape.FLAT, its numerical value or name), all other shapes are SPHERICAL
+'''
+def is_flat(_object_shape):
+    shape = getattr(_object_shape, 'name', _object_shape)
+    return shape == 1 or str(shape).strip().upper() == 'FLAT'
+
+def _dist_m(_quantity, _name):
+    value = float(_quantity[0])
+    if not value > 0.0 or math.isinf(value):
+        raise ValueError(_name + ' has to be positive number')
+    return HBTWN_UTM.convert(HBTWN_UTM.DIST_SCALES, 'distance', value, _quantity[1], 'm')
+
+def _positive(_value, _name):
+    value = float(_value)
+    if not value > 0.0 or math.isinf(value):
+        raise ValueError(_name + ' has to be positive number')
+    return value
+
+'''
+calculate_telescope_size - telescope size which is needed to see object in input resolution (see CoreNumericalModule.calculate_telescope_size)
+_target_obj_physical_size - target object physical size as array: [ size, unit ]
+_target_obj_physical_dist - target object physical distance as array: [ distance, unit ]
+_object_shape - object shape (default: SPHERICAL)
+_number_of_pixels - number of pixels on image (default: 100)
+_wavelength - wavelength value (default: [522.0, nm])
+_telescope_size_unit - telescope size unit (default: mm)
+@return telescope size [ value, unit ] and object size on sky [ value, arcsec ]
+'''
+def calculate_telescope_size(_target_obj_physical_size, _target_obj_physical_dist, _object_shape = 'SPHERICAL', _number_of_pixels = 100, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm'):
+    size_m = _dist_m(_target_obj_physical_size, 'Object size')
+    size_scaled_m = size_m*(1.0/_positive(_number_of_pixels, 'Number of pixels'))
+    dist_m = _dist_m(_target_obj_physical_dist, 'Object distance')
+    wavelength_m = _dist_m(_wavelength, 'Wavelength')
+    HBTWN_UTM.scale_of(HBTWN_UTM.DIST_SCALES, 'distance', _telescope_size_unit)
+
+    if is_flat(_object_shape):
+        angular_size_in_rads = 2.0 * math.atan(size_m/(dist_m+dist_m))
+        angular_size_in_rads_for_pixel = 2.0 * math.atan(size_scaled_m/(dist_m+dist_m))
+    else:
+        if size_m > dist_m+dist_m:
+            raise ValueError('Spherical object size exceeds doubled distance')
+        angular_size_in_rads = 2.0 * math.asin(size_m/(dist_m+dist_m))
+        angular_size_in_rads_for_pixel = 2.0 * math.asin(size_scaled_m/(dist_m+dist_m))
+
+    angular_size_in_arcsec = HBTWN_UTM.convert(HBTWN_UTM.ANGLE_SCALES, 'angle', angular_size_in_rads, 'rad', 'arcsec')
+    D = 1.22*(wavelength_m/angular_size_in_rads_for_pixel)
+    return [ HBTWN_UTM.convert(HBTWN_UTM.DIST_SCALES, 'distance', D, 'm', _telescope_size_unit), _telescope_size_unit ], [ angular_size_in_arcsec, 'arcsec' ]
+
+'''
+calculate_object_size - size of object which could be seen with given telescope and distance (see CoreNumericalModule.calculate_object_size)
+_target_obj_physical_dist - target object physical distance as array: [ distance, unit ]
+_target_obj_size_unit - expected unit for object size
+_telescope_angular_resolution - telescope angular resolution: [ angular resolution, unit ]
+_object_shape - object shape (default: SPHERICAL)
+_number_of_pixels - number of pixels on image (default: 1)
+@return object size [ value, unit ]
+'''
+def calculate_object_size(_target_obj_physical_dist, _target_obj_size_unit, _telescope_angular_resolution, _object_shape = 'SPHERICAL', _number_of_pixels = 1):
+    dist_m = _dist_m(_target_obj_physical_dist, 'Object distance')
+    angular_size_in_rads = HBTWN_UTM.convert(HBTWN_UTM.ANGLE_SCALES, 'angle', _positive(_telescope_angular_resolution[0], 'Angular resolution'), _telescope_angular_resolution[1], 'rad')
+    HBTWN_UTM.scale_of(HBTWN_UTM.DIST_SCALES, 'distance', _target_obj_size_unit)
+
+    if is_flat(_object_shape):
+        object_size_in_m = math.tan(angular_size_in_rads*0.5)*(2.0*dist_m)
+    else:
+        object_size_in_m = math.sin(angular_size_in_rads*0.5)*(2.0*dist_m)
+    object_size_in_m = object_size_in_m * _positive(_number_of_pixels, 'Number of pixels')
+
+    return [ HBTWN_UTM.convert(HBTWN_UTM.DIST_SCALES, 'distance', object_size_in_m, 'm', _target_obj_size_unit), _target_obj_size_unit ]
+
+'''
+calculate_telescope_resolution - telescope angular resolution (see CoreNumericalModule.calculate_telescope_resolution)
+_telescope_parameters - telescope size as array: [ size, unit ]
+_wavelength - wavelength value (default: [522.0, nm])
+_resolution_unit - telescope resolution unit (default: arcsec)
+@return telescope resolution [ value, unit ]
+'''
+def calculate_telescope_resolution(_telescope_parameters, _wavelength = [522.0, 'nm'], _resolution_unit = 'arcsec'):
+    size_m = _dist_m(_telescope_parameters, 'Telescope size')
+    wavelength_m = _dist_m(_wavelength, 'Wavelength')
+    theta = 1.22*(wavelength_m/size_m)
+    return [ HBTWN_UTM.convert(HBTWN_UTM.ANGLE_SCALES, 'angle', theta, 'rad', _resolution_unit), _resolution_unit ]
+
+'''
+dist_units_converter - convert distance value to other unit
+@return [ value, unit ]
+'''
+def dist_units_converter(_input_value, _input_unit, _output_unit):
+    return [ HBTWN_UTM.convert(HBTWN_UTM.DIST_SCALES, 'distance', _input_value, _input_unit, _output_unit), _output_unit ]
@@ -0,0 +1,155 @@
+#!/bin/python3
+
+'''
+HBTWN - ScenarioModule
+Module storage staged evaluation of telescope size for set of objects with reuse of wavelength independent intermediates.
+Stages of calculate_telescope_size_batch:
+geometry - units conversions, arctan/arcsin of objects and single pixels (inputs: size, distance, shape, pixels)
+telescope_size - D = 1.22 * wavelength / angular size of single pixel and conversion to output unit (inputs: wavelength, telescope_size_unit, strict)
+Changed input marks its stage and all following stages dirty, evaluation recalculates only dirty stages
+(changed objects only, if objects were updated by index).
+HBTWN ScenarioModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+
+'''
+STAGES - evaluation stages in order with their input parameters
+'''
+STAGES = ( ('geometry', ('size', 'distance', 'shape', 'pixels')),
+           ('telescope_size', ('wavelength', 'telescope_size_unit', 'strict')) )
+
+'''
+Scenario - set of N objects with cached geometry stage
+_size - objects physical sizes as array: [ sizes, unit or array of units ]
+_distance - objects physical distances as array: [ distances, unit or array of units ]
+_shape - object shape or array of shapes (default: ObjectShape.SPHERICAL)
+_pixels - number of pixels on image, number or array (default: 100)
+_wavelength - wavelength values as array: [ wavelength(s), unit ] (default: [522.0, nm])
+_telescope_size_unit - telescope size unit (default: mm)
+_strict - error model of evaluation (see CoreNumericalModule, default: False)
+Objects inputs are broadcast to 1-D arrays with N elements, so single objects could be updated by index.
+Fields:
+size, distance, shape, pixels, wavelength, telescope_size_unit, strict - current inputs (object inputs as [ values, unit codes ] arrays)
+geometry - cached TelescopeSizeGeometry (None before the first evaluation)
+dirty - set of dirty stages names
+count - number of objects
+evaluations - dictionary stage name:number of stage evaluations, evaluated_objects - stage name:number of evaluated objects
+Methods:
+update - change inputs, ex. update(wavelength=[1.0, 'um']) makes only telescope_size stage dirty
+update_objects - change object inputs of selected objects (index, slice, mask or array of indexes), geometry is recalculated only for these objects
+evaluate - recalculate dirty stages, return telescope sizes and angular sizes (arcsec) as QuantityArray (and status array)
+'''
+class Scenario:
+    def __init__(self, _size, _distance, _shape = HBTWN_UCM.ObjectShape.SPHERICAL, _pixels = 100, _wavelength = [522.0, 'nm'], _telescope_size_unit = 'mm', _strict = False):
+        self.strict = _strict
+        self.geometry = None
+        self.dirty = { name for name, parameters in STAGES }
+        self.evaluations = { name:0 for name, parameters in STAGES }
+        self.evaluated_objects = { name:0 for name, parameters in STAGES }
+        self._dirty_objects = None
+        self._result = None
+
+        size, distance = _object_quantity(_size), _object_quantity(_distance)
+        shape, pixels = _object_shape_codes(_shape), HBTWN_STM.float_values(_pixels).reshape(-1)
+        self.count = max(len(size[0]), len(size[1]), len(distance[0]), len(distance[1]), len(shape), len(pixels))
+        n = self.count
+        self.size = [ _broadcast(size[0], n), _broadcast(size[1], n) ]
+        self.distance = [ _broadcast(distance[0], n), _broadcast(distance[1], n) ]
+        self.shape = _broadcast(shape, n)
+        self.pixels = _broadcast(pixels, n)
+        self.wavelength = _wavelength
+        self.telescope_size_unit = _telescope_size_unit
+
+    def __len__(self):
+        return self.count
+
+    def _mark_dirty(self, _parameter):
+        for i, (name, parameters) in enumerate(STAGES):
+            if _parameter in parameters:
+                self.dirty.update(stage for stage, stage_parameters in STAGES[i:])
+                return
+        raise ValueError('Unknown scenario parameter: ' + repr(_parameter))
+
+    def update(self, **_parameters):
+        for name, value in _parameters.items():
+            self._mark_dirty(name)
+            if name in ('size', 'distance'):
+                value = _object_quantity(value)
+                setattr(self, name, [ _broadcast(value[0], len(self)), _broadcast(value[1], len(self)) ])
+            elif name == 'shape':
+                self.shape = _broadcast(_object_shape_codes(value), len(self))
+            elif name == 'pixels':
+                self.pixels = _broadcast(HBTWN_STM.float_values(value).reshape(-1), len(self))
+            else:
+                setattr(self, name, value)
+            if name in STAGES[0][1]:
+                self._dirty_objects = None
+
+    def update_objects(self, _index, **_parameters):
+        # Single index is converted to 1-D array, so values and tracked objects are always arrays
+        index = np.atleast_1d(np.arange(len(self))[_index])
+        for name, value in _parameters.items():
+            if name not in STAGES[0][1]:
+                raise ValueError('Only objects parameters could be updated by index: ' + ', '.join(STAGES[0][1]))
+            if name in ('size', 'distance'):
+                value = _object_quantity(value)
+                values, codes = getattr(self, name)
+                values[index] = value[0]
+                codes[index] = value[1]
+            elif name == 'shape':
+                self.shape[index] = _object_shape_codes(value)
+            else:
+                self.pixels[index] = HBTWN_STM.float_values(value)
+        if _parameters:
+            # Subset is tracked only for clean geometry, dirty geometry is recalculated for all objects anyway
+            if 'geometry' not in self.dirty:
+                self._dirty_objects = index if self._dirty_objects is None else np.union1d(self._dirty_objects, index)
+            self.dirty.update(name for name, parameters in STAGES)
+
+    def _evaluate_geometry(self, _index):
+        return HBTWN_CNM.calculate_telescope_size_geometry([ self.size[0][_index], self.size[1][_index] ], [ self.distance[0][_index], self.distance[1][_index] ], self.shape[_index], self.pixels[_index])
+
+    def evaluate(self, _return_status = False):
+        if 'geometry' in self.dirty:
+            if self._dirty_objects is None or self.geometry is None:
+                self.geometry = self._evaluate_geometry(slice(None))
+                self.evaluated_objects['geometry'] += len(self)
+            else:
+                # Only updated objects are recalculated and stored in cached geometry
+                update = self._evaluate_geometry(self._dirty_objects)
+                self.geometry.angular_size_in_rads_for_pixel[self._dirty_objects] = update.angular_size_in_rads_for_pixel
+                self.geometry.angular_size_in_arcsec[self._dirty_objects] = update.angular_size_in_arcsec
+                self.geometry.status[self._dirty_objects] = update.status
+                self.evaluated_objects['geometry'] += len(self._dirty_objects)
+            self.evaluations['geometry'] += 1
+            self._dirty_objects = None
+            self.dirty.discard('geometry')
+        if 'telescope_size' in self.dirty:
+            self._result = HBTWN_CNM.calculate_telescope_size_from_geometry(self.geometry, self.wavelength, self.telescope_size_unit, self.strict, True)
+            self.evaluations['telescope_size'] += 1
+            self.evaluated_objects['telescope_size'] += len(self)
+            self.dirty.discard('telescope_size')
+        return self._result if _return_status else self._result[:2]
+
+    def __repr__(self):
+        return 'Scenario(' + str(len(self)) + ' objects, dirty: ' + (', '.join(name for name, parameters in STAGES if name in self.dirty) or '-') + ')'
+
+def _object_quantity(_quantity):
+    values = HBTWN_STM.float_values(_quantity[0]).reshape(-1)
+    codes = HBTWN_UCM.DIST_UNITS.codes(_quantity[1], _strict=False).reshape(-1)
+    return values, codes
+
+def _object_shape_codes(_shape):
+    if isinstance(_shape, HBTWN_UCM.ObjectShape):
+        return np.array([ _shape.value ], dtype=np.int64)
+    return HBTWN_UCM.object_shape_codes(_shape).reshape(-1)
+
+def _broadcast(_values, _n):
+    # Own writable copy, single objects are updated in place
+    return np.array(np.broadcast_to(_values, (_n,)))
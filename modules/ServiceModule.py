@@ -0,0 +1,420 @@
+#!/bin/python3
+
+'''
+HBTWN - ServiceModule
+Module storage local calculation service: asyncio HTTP/JSON server on localhost TCP port or Unix socket.
+Concurrent requests which arrive within batch window are coalesced into one vectorized batch (CoreNumericalModule batch functions),
+results are distributed back to callers. Request queues are bounded, full queue gives HTTP 503 (backpressure),
+query array larger than queue gives HTTP 413.
+Endpoints:
+POST /telescope-size - { "size":[v,u], "distance":[v,u], "shape":"spherical", "pixels":100, "wavelength":[522,"nm"], "unit":"mm" }
+POST /resolution - { "telescope":[v,u], "wavelength":[522,"nm"], "unit":"arcsec" }
+(body could be JSON array of queries, result is array), GET /metrics - batch fill rate, p50/p99 latency, GET /health
+HBTWN ServiceModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import time
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+
+'''
+LOCAL_HOSTS - allowed TCP hosts (service is never exposed outside localhost)
+DEFAULT_PORT - default TCP port
+DEFAULT_BATCH_WINDOW - time [s] of waiting for next requests after the first request of batch
+DEFAULT_MAX_BATCH_SIZE - maximal number of queries in single batch
+DEFAULT_MAX_QUEUE - maximal number of waiting queries of every endpoint
+LATENCY_SAMPLES - number of the latest latencies used by percentiles
+MAX_BODY_SIZE - maximal request body size [B]
+'''
+LOCAL_HOSTS = ( '127.0.0.1', 'localhost', '::1' )
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_WINDOW = 0.002
+DEFAULT_MAX_BATCH_SIZE = 4096
+DEFAULT_MAX_QUEUE = 65536
+LATENCY_SAMPLES = 100000
+MAX_BODY_SIZE = 16*1024*1024
+HTTP_REASONS = { 200:'OK', 400:'Bad Request', 404:'Not Found', 405:'Method Not Allowed', 413:'Payload Too Large', 500:'Internal Server Error', 503:'Service Unavailable' }
+
+'''
+RequestError - wrong query (HTTP 400)
+'''
+class RequestError(ValueError):
+    pass
+
+
+def _quantity(_query, _key, _default = None):
+    value = _query.get(_key, _default)
+    if value is None:
+        raise RequestError('Missing ' + _key + ' [ value, unit ]')
+    if not isinstance(value, (list, tuple)) or len(value) != 2 or not isinstance(value[1], str) or isinstance(value[0], bool) or not isinstance(value[0], (int, float)):
+        raise RequestError(_key + ' has to be [ value, unit ]')
+    return float(value[0]), value[1]
+
+def _text(_query, _key, _default):
+    value = _query.get(_key, _default)
+    if not isinstance(value, str):
+        raise RequestError(_key + ' has to be string')
+    return value
+
+def _number(_query, _key, _default):
+    value = _query.get(_key, _default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RequestError(_key + ' has to be number')
+    return float(value)
+
+def _in_units(_values, _registry, _units, _status):
+    # Batch results are calculated in base unit, every query has own unit: (value * 1.0) / scale, the same as UnitRegistry.convert
+    scales = _registry.scales_of(np.asarray(_units), _strict=False)
+    HBTWN_STM.mark(_status, np.isnan(scales), HBTWN_STM.CalculationStatus.UNSUPPORTED_UNIT)
+    return (_values/scales).tolist()
+
+def _error(_code):
+    return { 'error':HBTWN_STM.CalculationStatus(_code).name }
+
+'''
+parse_telescope_size / parse_resolution - validate JSON query, raise RequestError
+@return query tuple used by evaluate functions
+'''
+def parse_telescope_size(_query):
+    if not isinstance(_query, dict):
+        raise RequestError('Query has to be JSON object')
+    return _quantity(_query, 'size') + _quantity(_query, 'distance') + ( _text(_query, 'shape', 'SPHERICAL').upper(), _number(_query, 'pixels', 100) ) + _quantity(_query, 'wavelength', [522.0, 'nm']) + ( _text(_query, 'unit', 'mm'), )
+
+def parse_resolution(_query):
+    if not isinstance(_query, dict):
+        raise RequestError('Query has to be JSON object')
+    return _quantity(_query, 'telescope') + _quantity(_query, 'wavelength', [522.0, 'nm']) + ( _text(_query, 'unit', 'arcsec'), )
+
+'''
+evaluate_telescope_size / evaluate_resolution - calculate batch of parsed queries with one vectorized call
+@return list of results: dictionary name:[ value, unit ] or { error:status name }
+'''
+def evaluate_telescope_size(_queries):
+    size, size_unit, dist, dist_unit, shape, pixels, wavelength, wavelength_unit, unit = zip(*_queries)
+    telescope_size, angular_size, status = HBTWN_CNM.calculate_telescope_size_batch([ size, size_unit ], [ dist, dist_unit ], shape, pixels, [ wavelength, wavelength_unit ], 'm', _return_status=True)
+    telescope_size = _in_units(telescope_size.values, HBTWN_UCM.DIST_UNITS, unit, status)
+    return [ _error(code) if code else { 'telescope_size':[ value, unit[index] ], 'angular_size':[ angle, 'arcsec' ] }
+             for index, (code, value, angle) in enumerate(zip(status.tolist(), telescope_size, angular_size.values.tolist())) ]
+
+def evaluate_resolution(_queries):
+    telescope, telescope_unit, wavelength, wavelength_unit, unit = zip(*_queries)
+    resolution, status = HBTWN_CNM.calculate_telescope_resolution_batch([ telescope, telescope_unit ], [ wavelength, wavelength_unit ], 'deg', _return_status=True)
+    resolution = _in_units(resolution.values, HBTWN_UCM.ANGLE_UNITS, unit, status)
+    return [ _error(code) if code else { 'resolution':[ value, unit[index] ] } for index, (code, value) in enumerate(zip(status.tolist(), resolution)) ]
+
+'''
+ENDPOINTS - path:(parse function, evaluate function)
+'''
+ENDPOINTS = { '/telescope-size':(parse_telescope_size, evaluate_telescope_size), '/resolution':(parse_resolution, evaluate_resolution) }
+
+
+'''
+BatchCoalescer - bounded queue of single endpoint, queries are collected into batches and evaluated with one call
+_evaluate - function which calculates list of queries
+_batch_window - time [s] of waiting for next queries after the first query of batch
+_max_batch_size - maximal number of queries in batch
+_max_queue - maximal number of waiting queries
+_executor - executor of evaluate calls (event loop accepts requests during calculation)
+Methods:
+submit - put query into queue, return future of result, raise asyncio.QueueFull when queue is full
+run - batching loop (task of CalculationService)
+observe - store latency of answered query
+metrics - dictionary with requests, rejected, batches, mean_batch_size, batch_fill_rate, queue_size and latency percentiles [s]
+'''
+class BatchCoalescer:
+    def __init__(self, _evaluate, _batch_window, _max_batch_size, _max_queue, _executor):
+        if _batch_window < 0.0 or _max_batch_size < 1 or _max_queue < 1:
+            raise ValueError('Batch window has to be non-negative, batch and queue sizes have to be positive')
+        self.evaluate = _evaluate
+        self.batch_window = float(_batch_window)
+        self.max_batch_size = int(_max_batch_size)
+        self.executor = _executor
+        self.queue = asyncio.Queue(int(_max_queue))
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def submit(self, _query):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((_query, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self.requests += 1
+        return future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [ await self.queue.get() ]
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            while not self.queue.empty() and len(batch) < self.max_batch_size:
+                batch.append(self.queue.get_nowait())
+            timeout = deadline - loop.time()
+            if len(batch) >= self.max_batch_size or timeout <= 0.0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Futures cancelled by rejected requests (queue full) or disconnected clients are not calculated
+            batch = [ (query, future) for query, future in await self._collect() if not future.cancelled() ]
+            if not batch:
+                continue
+            self.batches += 1
+            self.batched_queries += len(batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self.evaluate, [ query for query, future in batch ])
+            except Exception as e:
+                for query, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (query, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def observe(self, _seconds):
+        self.latencies.append(_seconds)
+
+    def metrics(self):
+        latencies = np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies))
+        p50, p99 = np.percentile(latencies, [ 50.0, 99.0 ]).tolist() if latencies.size else (None, None)
+        mean_batch_size = self.batched_queries/self.batches if self.batches else 0.0
+        return { 'requests':self.requests, 'rejected':self.rejected, 'batches':self.batches, 'mean_batch_size':mean_batch_size,
+                 'batch_fill_rate':mean_batch_size/self.max_batch_size, 'queue_size':self.queue.qsize(),
+                 'latency_seconds':{ 'p50':p50, 'p99':p99, 'max':float(latencies.max()) if latencies.size else None, 'samples':int(latencies.size) } }
+
+
+'''
+CalculationService - HTTP/JSON calculation service with batch coalescer for every endpoint (ENDPOINTS)
+_batch_window, _max_batch_size, _max_queue - coalescers parameters (see BatchCoalescer)
+Methods:
+start - start server on localhost TCP port or Unix socket (coroutine, returns asyncio server)
+handle_request - answer single HTTP request (coroutine, returns HTTP status and JSON payload)
+metrics - metrics of all endpoints
+close - stop server and batching tasks (coroutine)
+'''
+class CalculationService:
+    def __init__(self, _batch_window = DEFAULT_BATCH_WINDOW, _max_batch_size = DEFAULT_MAX_BATCH_SIZE, _max_queue = DEFAULT_MAX_QUEUE):
+        self.batch_window = _batch_window
+        self.max_batch_size = _max_batch_size
+        self.max_queue = _max_queue
+        self.coalescers = {}
+        self.server = None
+        self._tasks = []
+        self._executor = None
+        self._started = None
+        self._unix_path = None
+
+    async def start(self, _host = '127.0.0.1', _port = DEFAULT_PORT, _unix_path = None):
+        if _unix_path is None and _host not in LOCAL_HOSTS:
+            raise ValueError('Service is available only on localhost: ' + ', '.join(LOCAL_HOSTS))
+        # Single calculation thread, batches are evaluated in order
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='HBTWN-service')
+        for path, (parse, evaluate) in ENDPOINTS.items():
+            self.coalescers[path] = BatchCoalescer(evaluate, self.batch_window, self.max_batch_size, self.max_queue, self._executor)
+            self._tasks.append(asyncio.get_running_loop().create_task(self.coalescers[path].run()))
+        self._started = time.time()
+        if _unix_path is not None:
+            self.server = await asyncio.start_unix_server(self._handle_connection, _unix_path)
+            self._unix_path = _unix_path
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, _host, _port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._unix_path is not None and os.path.exists(self._unix_path):
+            os.remove(self._unix_path)
+            self._unix_path = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def metrics(self):
+        return { 'uptime_seconds':time.time() - self._started if self._started else 0.0, 'batch_window':self.batch_window, 'max_batch_size':self.max_batch_size,
+                 'max_queue':self.max_queue, 'endpoints':{ path:coalescer.metrics() for path, coalescer in self.coalescers.items() } }
+
+    async def handle_request(self, _method, _path, _body):
+        path = _path.split('?', 1)[0]
+        if path in ('/metrics', '/health'):
+            if _method != 'GET':
+                return 405, { 'error':'Use GET' }
+            return 200, self.metrics() if path == '/metrics' else { 'status':'ok' }
+        coalescer = self.coalescers.get(path)
+        if coalescer is None:
+            return 404, { 'error':'Unknown endpoint, use: ' + ', '.join(list(ENDPOINTS) + [ '/metrics', '/health' ]) }
+        if _method != 'POST':
+            return 405, { 'error':'Use POST' }
+
+        start = time.perf_counter()
+        try:
+            body = json.loads(_body)
+            if isinstance(body, list) and len(body) > self.max_queue:
+                return 413, { 'error':'Maximal number of queries in request: ' + str(self.max_queue) }
+            queries = [ ENDPOINTS[path][0](query) for query in (body if isinstance(body, list) else [ body ]) ]
+        except (ValueError, UnicodeDecodeError) as e:
+            return 400, { 'error':str(e) }
+        futures = []
+        try:
+            for query in queries:
+                futures.append(coalescer.submit(query))
+        except asyncio.QueueFull:
+            for future in futures:
+                future.cancel()
+            return 503, { 'error':'Service is busy, queue is full' }
+        try:
+            results = await asyncio.gather(*futures)
+        except Exception as e:
+            return 500, { 'error':'Calculation failure: ' + str(e) }
+        seconds = time.perf_counter() - start
+        for _ in results:
+            coalescer.observe(seconds)
+        return 200, results if isinstance(body, list) else results[0]
+
+    async def _handle_connection(self, _reader, _writer):
+        try:
+            while True:
+                request_line = await _reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await _reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    _writer.write(http_response(400, { 'error':'Wrong HTTP request' }, False))
+                    break
+                if length > MAX_BODY_SIZE:
+                    _writer.write(http_response(413, { 'error':'Maximal body size: ' + str(MAX_BODY_SIZE) }, False))
+                    break
+                body = await _reader.readexactly(length) if length > 0 else b''
+                status, payload = await self.handle_request(method, path, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                _writer.write(http_response(status, payload, keep_alive))
+                await _writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            _writer.close()
+
+'''
+http_response - HTTP/1.1 response with JSON payload
+'''
+def http_response(_status, _payload, _keep_alive = True):
+    body = json.dumps(_payload).encode('utf-8')
+    return ('HTTP/1.1 ' + str(_status) + ' ' + HTTP_REASONS.get(_status, '') + '\r\nContent-Type: application/json\r\nContent-Length: ' + str(len(body)) +
+            '\r\nConnection: ' + ('keep-alive' if _keep_alive else 'close') + '\r\n\r\n').encode('latin-1') + body
+
+'''
+run_service - run service until interruption (Ctrl+C)
+_host, _port - localhost TCP address (default: 127.0.0.1:DEFAULT_PORT)
+_unix_path - Unix socket path used instead of TCP port (default: None)
+_batch_window, _max_batch_size, _max_queue - coalescers parameters
+_ready - function called with CalculationService when server is started (default: None)
+'''
+def run_service(_host = '127.0.0.1', _port = DEFAULT_PORT, _unix_path = None, _batch_window = DEFAULT_BATCH_WINDOW, _max_batch_size = DEFAULT_MAX_BATCH_SIZE, _max_queue = DEFAULT_MAX_QUEUE, _ready = None):
+    async def serve():
+        service = CalculationService(_batch_window, _max_batch_size, _max_queue)
+        server = await service.start(_host, _port, _unix_path)
+        if _ready is not None:
+            _ready(service)
+        try:
+            await server.serve_forever()
+        finally:
+            await service.close()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+'''
+request - send single HTTP request with keep-alive connection (coroutine)
+_reader, _writer - asyncio stream of opened connection
+_method, _path - HTTP method and path
+_payload - JSON payload (default: None)
+@return HTTP status and JSON payload
+'''
+async def request(_reader, _writer, _method, _path, _payload = None):
+    body = b'' if _payload is None else json.dumps(_payload).encode('utf-8')
+    _writer.write((_method + ' ' + _path + ' HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: ' + str(len(body)) + '\r\n\r\n').encode('latin-1') + body)
+    await _writer.drain()
+    status = int((await _reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await _reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await _reader.readexactly(length))
+
+'''
+load_test - send requests from many concurrent connections and measure client latency (coroutine)
+_host, _port or _unix_path - service address
+_path - endpoint path
+_queries - list of JSON queries sent in loop
+_requests - number of requests
+_concurrency - number of concurrent connections
+@return dictionary with requests, errors, rejected, seconds, requests_per_second, latency percentiles [s] and service metrics
+'''
+async def load_test(_path, _queries, _requests = 10000, _concurrency = 64, _host = '127.0.0.1', _port = DEFAULT_PORT, _unix_path = None):
+    latencies = []
+    counts = collections.Counter()
+    next_request = iter(range(_requests))
+
+    async def client():
+        if _unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(_unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(_host, _port)
+        try:
+            for index in next_request:
+                start = time.perf_counter()
+                status, payload = await request(reader, writer, 'POST', _path, _queries[index % len(_queries)])
+                latencies.append(time.perf_counter() - start)
+                counts['rejected' if status == 503 else 'errors' if status != 200 or 'error' in payload else 'ok'] += 1
+            return await request(reader, writer, 'GET', '/metrics')
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(client() for _ in range(max(1, _concurrency))))
+    seconds = time.perf_counter() - start
+    metrics = max((payload for status, payload in responses), key=lambda _metrics: _metrics['uptime_seconds'])
+    p50, p99 = np.percentile(latencies, [ 50.0, 99.0 ]).tolist() if latencies else (None, None)
+    return { 'requests':len(latencies), 'errors':counts['errors'], 'rejected':counts['rejected'], 'seconds':seconds, 'requests_per_second':len(latencies)/seconds,
+             'latency_seconds':{ 'p50':p50, 'p99':p99 }, 'service':metrics['endpoints'].get(_path) }
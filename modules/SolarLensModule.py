@@ -0,0 +1,189 @@
+#!/bin/python3
+
+'''
+HBTWN - SolarLensModule
+Module storage solar gravitational lens (SGL) imaging simulator.
+Model: Slava G. Turyshev, Viktor T. Toth, "Direct multipixel imaging and spectroscopy of an exoplanet with a solar gravity lens mission".
+Point source amplification in image plane at distance rho from optical axis:
+mu(rho) = mu0 * J0^2( k * sqrt(2 r_g / z) * rho ), mu0 = 4 pi^2 r_g / lambda
+where k = 2 pi / lambda, r_g = 2 G M_sun / c^2 - Schwarzschild radius of the Sun, z - heliocentric distance of image plane.
+Source plane image is projected to image plane with scale z / z0 (inverted), every detector pixel collects light of all source pixels.
+HBTWN SolarLensModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.SpecialFunctionsModule as HBTWN_SFM
+import modules.ParallelModule as HBTWN_PM
+
+'''
+GM_SUN - heliocentric gravitational constant [m^3 / s^2]
+SPEED_OF_LIGHT - speed of light [m / s]
+SUN_SCHWARZSCHILD_RADIUS - r_g = 2 G M_sun / c^2 [m]
+'''
+GM_SUN = 1.32712440018e20
+SPEED_OF_LIGHT = 299792458.0
+SUN_SCHWARZSCHILD_RADIUS = 2.0*GM_SUN/(SPEED_OF_LIGHT*SPEED_OF_LIGHT)
+
+'''
+sgl_amplification - SGL amplification of point source in image plane
+_rho_m - distance from optical axis [m] (number or array)
+_wavelength_m - wavelength [m]
+_heliocentric_distance_m - heliocentric distance of image plane [m]
+@return amplification array
+'''
+def sgl_amplification(_rho_m, _wavelength_m, _heliocentric_distance_m):
+    mu0 = 4.0*np.pi*np.pi*SUN_SCHWARZSCHILD_RADIUS/_wavelength_m
+    j0 = HBTWN_SFM.bessel_j0((2.0*np.pi/_wavelength_m)*np.sqrt(2.0*SUN_SCHWARZSCHILD_RADIUS/_heliocentric_distance_m)*np.asarray(_rho_m, dtype=np.float64))
+    return mu0*j0*j0
+
+'''
+SGLGeometry - projection of source plane on image plane and detector grid
+_source_shape - source image shape (rows, columns)
+_source_size - physical size of source image (larger side) as array: [ size, unit ]
+_source_distance - distance of source from the Sun as array: [ distance, unit ]
+_heliocentric_distance - heliocentric distance of image plane as array: [ distance, unit ] (default: [650.0, au])
+_wavelength - wavelength as array: [ wavelength, unit ] (default: [1.0, um])
+_detector_shape - detector grid shape (default: source shape)
+_detector_pixel_size - distance between detector grid points in image plane as array: [ size, unit ] (default: projected source pixel size)
+Fields:
+scale - projection scale z / z0
+source_pixel_m - source pixel size [m], projected_pixel_m - source pixel size in image plane [m]
+detector_shape, detector_pixel_m - detector grid
+projected_x, projected_y - image plane coordinates of source pixels [m] (inverted image)
+detector_x, detector_y - detector grid coordinates [m]
+wavelength_m, heliocentric_distance_m
+'''
+class SGLGeometry:
+    def __init__(self, _source_shape, _source_size, _source_distance, _heliocentric_distance = [650.0, 'au'], _wavelength = [1.0, 'um'], _detector_shape = None, _detector_pixel_size = None):
+        rows, columns = _source_shape
+        source_size_m = HBTWN_UCM.DIST_UNITS.convert(float(_source_size[0]), _source_size[1], 'm')
+        source_distance_m = HBTWN_UCM.DIST_UNITS.convert(float(_source_distance[0]), _source_distance[1], 'm')
+        self.heliocentric_distance_m = HBTWN_UCM.DIST_UNITS.convert(float(_heliocentric_distance[0]), _heliocentric_distance[1], 'm')
+        self.wavelength_m = HBTWN_UCM.DIST_UNITS.convert(float(_wavelength[0]), _wavelength[1], 'm')
+
+        self.scale = self.heliocentric_distance_m/source_distance_m
+        self.source_pixel_m = source_size_m/max(rows, columns)
+        self.projected_pixel_m = self.source_pixel_m*self.scale
+        self.detector_shape = tuple(_detector_shape) if _detector_shape is not None else (rows, columns)
+        self.detector_pixel_m = self.projected_pixel_m if _detector_pixel_size is None else HBTWN_UCM.DIST_UNITS.convert(float(_detector_pixel_size[0]), _detector_pixel_size[1], 'm')
+
+        # Pixel centers, image of source is inverted
+        self.projected_y = -_centered(rows)*self.projected_pixel_m
+        self.projected_x = -_centered(columns)*self.projected_pixel_m
+        self.detector_y = _centered(self.detector_shape[0])*self.detector_pixel_m
+        self.detector_x = _centered(self.detector_shape[1])*self.detector_pixel_m
+
+def _centered(_n):
+    return np.arange(_n) - 0.5*(_n - 1)
+
+'''
+SGLImage - result of SGL simulation
+Fields:
+image - detector image (sum of source pixels values multiplied by amplification)
+geometry - SGLGeometry
+tile_times - list of (rows slice, columns slice, seconds) for every detector tile
+elapsed - total time in seconds
+'''
+class SGLImage:
+    def __init__(self, _image, _geometry, _tile_times, _elapsed):
+        self.image = _image
+        self.geometry = _geometry
+        self.tile_times = _tile_times
+        self.elapsed = _elapsed
+    def __repr__(self):
+        return 'SGLImage(' + str(self.image.shape) + ', ' + str(len(self.tile_times)) + ' tiles, ' + '%.3f' % self.elapsed + ' s)'
+
+'''
+simulate_tile - detector tile, all pairs (detector point, source pixel) are calculated as arrays in chunks of source pixels
+_source - source image (flux of every pixel)
+_geometry - SGLGeometry
+_rows, _columns - detector tile slices
+_max_chunk_elements - maximal number of (detector point, source pixel) pairs in single chunk (default: 2**21)
+@return tile image and calculation time in seconds
+'''
+def simulate_tile(_source, _geometry, _rows, _columns, _max_chunk_elements = 2**21):
+    start_time = time.perf_counter()
+    tile_shape = (len(_geometry.detector_y[_rows]), len(_geometry.detector_x[_columns]))
+    detector_y, detector_x = np.meshgrid(_geometry.detector_y[_rows], _geometry.detector_x[_columns], indexing='ij')
+    detector_y, detector_x = detector_y.reshape(-1, 1), detector_x.reshape(-1, 1)
+    source = np.asarray(_source, dtype=np.float64)
+    # Only non-zero source pixels contribute
+    source_rows, source_columns = np.nonzero(source)
+    values = source[source_rows, source_columns]
+    projected_y, projected_x = _geometry.projected_y[source_rows], _geometry.projected_x[source_columns]
+
+    tile = np.zeros(len(detector_y))
+    step = max(1, int(_max_chunk_elements) // max(1, len(detector_y)))
+    for start in range(0, len(values), step):
+        stop = start + step
+        rho = np.hypot(detector_y - projected_y[start:stop], detector_x - projected_x[start:stop])
+        tile += sgl_amplification(rho, _geometry.wavelength_m, _geometry.heliocentric_distance_m) @ values[start:stop]
+    return tile.reshape(tile_shape), time.perf_counter() - start_time
+
+def _tile_task(_source, _geometry, _tiles, _max_chunk_elements):
+    return [ (rows, columns) + simulate_tile(_source, _geometry, rows, columns, _max_chunk_elements) for rows, columns in _tiles ]
+
+def _shared_tiles_task(_input_layout, _output_layout, _geometry, _tiles, _max_chunk_elements):
+    # Source image is read and tiles are written via shared memory, only tile slices and times are sent back
+    input_shm, inputs = HBTWN_PM.attach_shared_arrays(_input_layout)
+    output_shm, outputs = HBTWN_PM.attach_shared_arrays(_output_layout)
+    try:
+        times = []
+        for rows, columns in _tiles:
+            outputs['image'][rows, columns], elapsed = simulate_tile(inputs['source'], _geometry, rows, columns, _max_chunk_elements)
+            times.append((rows, columns, elapsed))
+        return times
+    finally:
+        del inputs, outputs
+        input_shm.close()
+        output_shm.close()
+
+'''
+detector_tiles - split detector grid into tiles
+@return list of (rows slice, columns slice)
+'''
+def detector_tiles(_shape, _tile_size):
+    return [ (slice(y0, y1), slice(x0, x1)) for y0, y1 in HBTWN_PM.chunk_ranges(_shape[0], _tile_size) for x0, x1 in HBTWN_PM.chunk_ranges(_shape[1], _tile_size) ]
+
+'''
+simulate_sgl_image - map source plane image through SGL onto detector grid
+_source - source image (2D array, flux of every pixel)
+_geometry - SGLGeometry
+_tile_size - detector tile size in pixels (default: 64)
+_max_chunk_elements - maximal number of pairs calculated at once, bounds memory usage (default: 2**21)
+_workers - number of worker processes, None or 1 calculates tiles in current process (default: None)
+_executor - optional existing ProcessPoolExecutor
+Workers read source image and write detector image via shared memory (ParallelModule.SharedArrays), every task gets group of tiles.
+@return SGLImage with per tile timing
+'''
+def simulate_sgl_image(_source, _geometry, _tile_size = 64, _max_chunk_elements = 2**21, _workers = None, _executor = None):
+    source = np.asarray(_source, dtype=np.float64)
+    tiles = detector_tiles(_geometry.detector_shape, _tile_size)
+    image = np.empty(_geometry.detector_shape)
+    tile_times = []
+
+    start_time = time.perf_counter()
+    if _executor is None and (_workers is None or _workers <= 1):
+        for rows, columns, tile, elapsed in _tile_task(source, _geometry, tiles, _max_chunk_elements):
+            image[rows, columns] = tile
+            tile_times.append((rows, columns, elapsed))
+    else:
+        workers = _workers or HBTWN_PM.default_workers()
+        # 4 tasks per worker keep workers busy, geometry is sent once per task
+        tasks_size = max(1, -(-len(tiles) // (4*workers)))
+        with HBTWN_PM.SharedArrays({ 'source':source }) as inputs, HBTWN_PM.SharedArrays({ 'image':image }, _copy=False) as outputs:
+            executor = _executor or ProcessPoolExecutor(max_workers=workers)
+            try:
+                futures = [ executor.submit(_shared_tiles_task, inputs.layout, outputs.layout, _geometry, tiles[start:stop], _max_chunk_elements) for start, stop in HBTWN_PM.chunk_ranges(len(tiles), tasks_size) ]
+                tile_times = [ tile_time for future in futures for tile_time in future.result() ]
+            finally:
+                if _executor is None:
+                    executor.shutdown()
+            image[...] = outputs.arrays['image']
+
+    return SGLImage(image, _geometry, tile_times, time.perf_counter() - start_time)
@@ -0,0 +1,76 @@
+#!/bin/python3
+
+'''
+HBTWN - SpecialFunctionsModule
+Module storage vectorized special functions which are not available in NumPy (without SciPy dependency).
+HBTWN SpecialFunctionsModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+
+'''
+bessel_j0 - Bessel function of the first kind of order 0, J0(x)
+Rational approximation for |x| < 8 and asymptotic expansion for |x| >= 8 (absolute error about 1e-8).
+_x - number or array
+@return array with J0(x) values (float64)
+'''
+def bessel_j0(_x):
+    x = np.asarray(_x, dtype=np.float64)
+    ax = np.abs(x)
+    result = np.empty_like(ax)
+
+    small = ax < 8.0
+    y = x[small]*x[small]
+    result[small] = (57568490574.0 + y*(-13362590354.0 + y*(651619640.7 + y*(-11214424.18 + y*(77392.33017 + y*(-184.9052456)))))) \
+                    / (57568490411.0 + y*(1029532985.0 + y*(9494680.718 + y*(59272.64853 + y*(267.8532712 + y)))))
+
+    large = ~small
+    axl = ax[large]
+    z = 8.0/axl
+    y = z*z
+    xx = axl - 0.785398164
+    p = 1.0 + y*(-0.1098628627e-2 + y*(0.2734510407e-4 + y*(-0.2073370639e-5 + y*0.2093887211e-6)))
+    q = -0.1562499995e-1 + y*(0.1430488765e-3 + y*(-0.6911147651e-5 + y*(0.7621095161e-6 - y*0.934935152e-7)))
+    result[large] = np.sqrt(0.636619772/axl)*(np.cos(xx)*p - z*np.sin(xx)*q)
+
+    return result
+
+'''
+bessel_j1 - Bessel function of the first kind of order 1, J1(x)
+Rational approximation for |x| < 8 and asymptotic expansion for |x| >= 8 (absolute error about 1e-8).
+_x - number or array
+@return array with J1(x) values (float64)
+'''
+def bessel_j1(_x):
+    x = np.asarray(_x, dtype=np.float64)
+    ax = np.abs(x)
+    result = np.empty_like(ax)
+
+    small = ax < 8.0
+    xs = x[small]
+    y = xs*xs
+    result[small] = xs*(72362614232.0 + y*(-7895059235.0 + y*(242396853.1 + y*(-2972611.439 + y*(15704.48260 + y*(-30.16036606)))))) \
+                    / (144725228442.0 + y*(2300535178.0 + y*(18583304.74 + y*(99447.43394 + y*(376.9991397 + y)))))
+
+    large = ~small
+    axl = ax[large]
+    z = 8.0/axl
+    y = z*z
+    xx = axl - 2.356194491
+    p = 1.0 + y*(0.183105e-2 + y*(-0.3516396496e-4 + y*(0.2457520174e-5 + y*(-0.240337019e-6))))
+    q = 0.04687499995 + y*(-0.2002690873e-3 + y*(0.8449199096e-5 + y*(-0.88228987e-6 + y*0.105787412e-6)))
+    result[large] = np.sqrt(0.636619772/axl)*(np.cos(xx)*p - z*np.sin(xx)*q)*np.sign(x[large])
+
+    return result
+
+'''
+airy_pattern - normalized Airy diffraction pattern intensity [2 J1(x) / x]^2, equal 1.0 for x = 0
+_x - number or array, x = pi * D * sin(theta) / lambda
+@return array with intensity values (float64)
+'''
+def airy_pattern(_x):
+    x = np.asarray(_x, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = 2.0*bessel_j1(x)/x
+    result = np.where(x == 0.0, 1.0, result)
+    return result*result
@@ -0,0 +1,164 @@
+#!/bin/python3
+
+'''
+HBTWN - StatusModule
+Module storage error model of batch calculations: wrong rows give NaN results and status code in compact status array,
+in strict mode structured exception is raised. Nothing is written to stdout in calculation path.
+HBTWN StatusModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import math
+from enum import Enum
+
+'''
+CalculationStatus - status code of single batch element, the first detected error of element is stored:
+OK - correct result
+UNSUPPORTED_UNIT - unknown unit symbol or unit code (input or output unit)
+INVALID_VALUE - not numerical or not finite input value
+NON_POSITIVE_SIZE - object size <= 0
+NON_POSITIVE_DISTANCE - object distance <= 0
+SIZE_EXCEEDS_DISTANCE - SPHERICAL object larger than doubled distance (arcsin out of domain)
+NON_POSITIVE_PIXELS - number of pixels <= 0
+NON_POSITIVE_WAVELENGTH - wavelength <= 0
+NON_POSITIVE_RESOLUTION - angular resolution <= 0
+NON_POSITIVE_TELESCOPE_SIZE - telescope size <= 0
+NON_POSITIVE_EXPOSURE_TIME - exposure time <= 0
+NON_POSITIVE_SNR - required signal to noise ratio <= 0
+'''
+class CalculationStatus(Enum):
+    OK = 0
+    UNSUPPORTED_UNIT = 1
+    INVALID_VALUE = 2
+    NON_POSITIVE_SIZE = 3
+    NON_POSITIVE_DISTANCE = 4
+    SIZE_EXCEEDS_DISTANCE = 5
+    NON_POSITIVE_PIXELS = 6
+    NON_POSITIVE_WAVELENGTH = 7
+    NON_POSITIVE_RESOLUTION = 8
+    NON_POSITIVE_TELESCOPE_SIZE = 9
+    NON_POSITIVE_EXPOSURE_TIME = 10
+    NON_POSITIVE_SNR = 11
+    def __int__(self):
+        return self.value
+
+'''
+STATUS_DTYPE - status array type (1 byte per element)
+STATUS_NAMES - status names array indexed by status code (ex. STATUS_NAMES[status] gives names of all elements)
+UNIT_ERRORS - statuses used as strict set by functions which fail only for wrong units (wrong values give NaN)
+'''
+STATUS_DTYPE = np.uint8
+STATUS_NAMES = np.array([ status.name for status in CalculationStatus ])
+UNIT_ERRORS = ( CalculationStatus.UNSUPPORTED_UNIT, )
+
+'''
+CalculationError - exception raised in strict mode
+Fields:
+status - status array of whole batch
+counts - dictionary status name:number of elements
+first_index - index of the first wrong element
+'''
+class CalculationError(ValueError):
+    def __init__(self, _status, _strict_codes = None):
+        self.status = _status
+        self.counts = status_counts(_status)
+        wrong = np.isin(_status, _strict_codes) if _strict_codes is not None else _status != CalculationStatus.OK.value
+        self.first_index = tuple(int(index) for index in np.unravel_index(int(np.argmax(wrong)), np.shape(_status))) if np.any(wrong) else None
+        super().__init__('Calculation failure: ' + ', '.join(name + ': ' + str(count) for name, count in self.counts.items()) + ' (first at index ' + str(self.first_index) + ')')
+
+'''
+new_status - status array with OK values
+_shape - batch shape
+'''
+def new_status(_shape):
+    return np.zeros(_shape, dtype=STATUS_DTYPE)
+
+'''
+mark - store status code for elements selected by mask which do not have error yet (the first error is kept)
+_status - status array (modified in place)
+_mask - boolean mask broadcastable to status shape
+_code - CalculationStatus
+'''
+def mark(_status, _mask, _code):
+    np.copyto(_status, STATUS_DTYPE(_code.value), where=np.logical_and(_mask, _status == CalculationStatus.OK.value))
+
+'''
+mark_values - mark not finite values as INVALID_VALUE and values <= 0 with given code
+'''
+def mark_values(_status, _values, _code):
+    with np.errstate(invalid='ignore'):
+        mark(_status, ~np.isfinite(_values), CalculationStatus.INVALID_VALUE)
+        mark(_status, _values <= 0.0, _code)
+
+'''
+to_base - convert batch quantity to base unit of registry, unknown units give NaN scales (marked by mark_input)
+_quantity - [ values, unit or array of units ] or QuantityArray
+_registry - UnitRegistry (ex. UnitsConstantsModule.DIST_UNITS)
+_base_unit - base unit symbol
+@return values in base unit, input values (float64 array from float_values) and scales
+'''
+def to_base(_quantity, _registry, _base_unit):
+    values = float_values(_quantity[0])
+    scales = _registry.scales_of(_quantity[1], _strict=False)
+    return (values*scales)/_registry.scales_of(_base_unit), values, scales
+
+'''
+mark_input - mark unknown units (NaN scales) as UNSUPPORTED_UNIT, then values with mark_values
+'''
+def mark_input(_status, _values, _scales, _code):
+    mark(_status, np.isnan(_scales), CalculationStatus.UNSUPPORTED_UNIT)
+    mark_values(_status, _values, _code)
+
+'''
+positive_finite - fast check of whole batch with reductions only (no masks), True if all values are finite and > 0
+Detailed status masks are built only for batches which fail this check.
+'''
+def positive_finite(*_arrays):
+    for array in _arrays:
+        array = np.asarray(array)
+        if array.size and not (array.min() > 0.0 and array.max() < np.inf):
+            return False
+    return True
+
+'''
+status_counts - number of elements with every error status
+@return dictionary status name:count (only errors which occurred)
+'''
+def status_counts(_status):
+    counts = np.bincount(np.asarray(_status, dtype=np.intp).reshape(-1), minlength=len(CalculationStatus))
+    return { status.name:int(counts[status.value]) for status in CalculationStatus if status is not CalculationStatus.OK and counts[status.value] }
+
+'''
+float_values - convert input values to float64 array, not numerical elements are NaN (they are marked as INVALID_VALUE)
+'''
+def float_values(_values):
+    try:
+        return np.asarray(_values, dtype=np.float64)
+    except (TypeError, ValueError):
+        values = np.asarray(_values, dtype=object)
+        return np.fromiter((_float(value) for value in values.flat), dtype=np.float64, count=values.size).reshape(values.shape)
+
+def _float(_value):
+    try:
+        return float(_value)
+    except (TypeError, ValueError):
+        return math.nan
+
+'''
+finish - set NaN results for wrong elements and raise CalculationError in strict mode
+_status - status array
+_results - list of result arrays with status shape (modified in place)
+_strict - False (never raise), True (raise for any error) or collection of CalculationStatus which raise (ex. UNIT_ERRORS)
+'''
+def finish(_status, _results, _strict):
+    if not np.any(_status):
+        return
+    wrong = _status != CalculationStatus.OK.value
+    if _strict is True:
+        raise CalculationError(_status)
+    if _strict:
+        codes = [ int(code) for code in _strict ]
+        if np.any(np.isin(_status, codes)):
+            raise CalculationError(_status, codes)
+    for result in _results:
+        np.copyto(result, np.nan, where=wrong)
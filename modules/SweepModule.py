@@ -0,0 +1,252 @@
+#!/bin/python3
+
+'''
+HBTWN - SweepModule
+Module storage parameter sweep engine, calculate telescope size for every combination of parameters as N-D result cube.
+HBTWN SweepModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+import time
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+import modules.ResultStoreModule as HBTWN_RSM
+
+'''
+SWEEP_PARAMETERS - parameters of calculate_telescope_size which could be used as sweep axis, with default values
+size - target object physical size: [ size, unit ]
+distance - target object physical distance: [ distance, unit ]
+shape - object shape (ObjectShape numerical value or name)
+pixels - number of pixels on image
+wavelength - wavelength value: [ wavelength, unit ]
+'''
+SWEEP_PARAMETERS = { 'size':None, 'distance':None, 'shape':HBTWN_UCM.ObjectShape.SPHERICAL, 'pixels':100, 'wavelength':[522.0, 'nm'] }
+
+'''
+SweepAxis - single sweep axis definition
+_name - parameter name, one of SWEEP_PARAMETERS keys
+_values - axis values
+_unit - values unit (required for size/distance/wavelength axes)
+'''
+class SweepAxis:
+    def __init__(self, _name, _values, _unit = None):
+        if _name not in SWEEP_PARAMETERS:
+            raise ValueError('Unknown sweep parameter: ' + repr(_name))
+        if _unit is None and _name in ('size', 'distance', 'wavelength'):
+            raise ValueError('Sweep axis ' + repr(_name) + ' requires unit')
+        self.name = _name
+        self.values = HBTWN_UCM.object_shape_codes(_values) if _name == 'shape' else np.asarray(_values, dtype=np.float64).reshape(-1)
+        self.unit = _unit
+    def __len__(self):
+        return len(self.values)
+    def __repr__(self):
+        return 'SweepAxis(' + repr(self.name) + ', ' + str(len(self.values)) + ' values, ' + repr(self.unit) + ')'
+
+'''
+linspace_axis - sweep axis with linearly spaced values (same as numpy.linspace)
+logspace_axis - sweep axis with logarithmically spaced values between _start and _stop (same as numpy.geomspace)
+array_axis - sweep axis with explicit values
+@return SweepAxis
+'''
+def linspace_axis(_name, _start, _stop, _num, _unit = None):
+    return SweepAxis(_name, np.linspace(_start, _stop, _num), _unit)
+
+def logspace_axis(_name, _start, _stop, _num, _unit = None):
+    return SweepAxis(_name, np.geomspace(_start, _stop, _num), _unit)
+
+def array_axis(_name, _values, _unit = None):
+    return SweepAxis(_name, _values, _unit)
+
+'''
+SweepResult - labeled N-D result cube, dimension i of cubes is described by axes[i]
+Fields:
+axes - list of SweepAxis
+telescope_size - cube with telescope sizes in telescope_size_unit
+angular_size - cube with objects angular sizes in arcsec
+evaluations - number of evaluated parameter combinations
+elapsed - calculation time in seconds
+evaluations_per_second - sweep throughput
+Methods:
+axis_names - return tuple with axes names
+coords - return axis values and unit as array: [ values, unit ]
+sel - return telescope sizes and angular sizes for selected indices ex. sel(wavelength=0, pixels=slice(0, 10))
+'''
+class SweepResult:
+    def __init__(self, _axes, _telescope_size, _angular_size, _telescope_size_unit, _evaluations, _elapsed):
+        self.axes = list(_axes)
+        self.telescope_size = _telescope_size
+        self.angular_size = _angular_size
+        self.telescope_size_unit = _telescope_size_unit
+        self.evaluations = _evaluations
+        self.elapsed = _elapsed
+        self.evaluations_per_second = _evaluations/_elapsed if _elapsed > 0.0 else float('inf')
+    def axis_names(self):
+        return tuple(axis.name for axis in self.axes)
+    def coords(self, _name):
+        axis = self.axes[self.axis_names().index(_name)]
+        return [ axis.values, axis.unit ]
+    def sel(self, **_indices):
+        names = self.axis_names()
+        index = tuple(_indices.pop(name, slice(None)) for name in names)
+        if _indices:
+            raise ValueError('Unknown sweep axes: ' + ', '.join(_indices))
+        return [ self.telescope_size[index], self.telescope_size_unit ], [ self.angular_size[index], 'arcsec' ]
+    def __repr__(self):
+        return 'SweepResult(' + ' x '.join(axis.name + '[' + str(len(axis)) + ']' for axis in self.axes) + ', ' + str(self.evaluations) + ' evaluations, ' + '%.3g' % self.evaluations_per_second + ' eval/s)'
+
+'''
+plan_blocks - split sweep cube into memory bounded blocks
+_shape - sweep cube shape
+_max_chunk_elements - maximal number of elements in single block
+@return list of blocks: (leading indices, split axis, start, stop), block covers cube[leading indices + (slice(start, stop),)]
+'''
+def plan_blocks(_shape, _max_chunk_elements):
+    _max_chunk_elements = max(1, int(_max_chunk_elements))
+    ndim = len(_shape)
+    if ndim == 0 or 0 in _shape:
+        return []
+    # Split axis k is the first axis for which trailing sub-cube fits in single block
+    k = ndim - 1
+    while k > 0 and int(np.prod(_shape[k:], dtype=np.int64)) <= _max_chunk_elements:
+        k -= 1
+    trailing = int(np.prod(_shape[k+1:], dtype=np.int64))
+    step = max(1, _max_chunk_elements // trailing)
+    return [ (lead, k, start, min(start+step, _shape[k])) for lead in np.ndindex(*_shape[:k]) for start in range(0, _shape[k], step) ]
+
+'''
+block_index - return cube index (tuple) for block created by plan_blocks
+'''
+def block_index(_block):
+    lead, k, start, stop = _block
+    return tuple(lead) + (slice(start, stop),)
+
+'''
+evaluate_block - calculate telescope sizes for single block, axes values are broadcast together (no full grid is created)
+_axes - list of SweepAxis
+_fixed - dictionary with values of parameters which are not sweep axes
+_telescope_size_unit - telescope size unit
+_block - block created by plan_blocks
+_precision - calculation precision float64 or float32 (see CoreNumericalModule.calculate_telescope_size_batch) (default: float64)
+@return telescope sizes and angular sizes arrays with block shape
+'''
+def evaluate_block(_axes, _fixed, _telescope_size_unit, _block, _precision = 'float64'):
+    lead, k, start, stop = _block
+    ndim = len(_axes)
+    parameters = dict(_fixed)
+    for i, axis in enumerate(_axes):
+        if i < k:
+            values = axis.values[lead[i]]
+        elif i == k:
+            values = axis.values[start:stop].reshape((-1,) + (1,)*(ndim-k-1))
+        else:
+            values = axis.values.reshape((-1,) + (1,)*(ndim-i-1))
+        parameters[axis.name] = [ values, axis.unit ] if axis.unit is not None else values
+
+    # Wrong units raise CalculationError (ValueError), wrong values give NaN
+    telescope_size, angular_size = HBTWN_CNM.calculate_telescope_size_batch(parameters['size'], parameters['distance'], parameters['shape'], parameters['pixels'], parameters['wavelength'], _telescope_size_unit, _strict=HBTWN_STM.UNIT_ERRORS, _precision=_precision)
+    return telescope_size[0], angular_size[0]
+
+'''
+sweep_parameters - merge default, fixed and axes parameters, check sweep definition
+@return dictionary with fixed parameters (without axes parameters)
+'''
+def sweep_parameters(_axes, _fixed):
+    names = [ axis.name for axis in _axes ]
+    if len(set(names)) != len(names):
+        raise ValueError('Sweep axes names have to be unique: ' + ', '.join(names))
+    parameters = dict(SWEEP_PARAMETERS)
+    for name, value in (_fixed or {}).items():
+        if name not in SWEEP_PARAMETERS:
+            raise ValueError('Unknown sweep parameter: ' + repr(name))
+        parameters[name] = value
+    for name in names:
+        parameters.pop(name)
+    for name, value in parameters.items():
+        if value is None:
+            raise ValueError('Sweep parameter ' + repr(name) + ' has to be sweep axis or fixed value')
+    return parameters
+
+'''
+run_telescope_size_sweep - calculate telescope size for every combination of sweep axes values
+_axes - list of SweepAxis, result cube dimension i is described by _axes[i]
+_fixed - dictionary with values of parameters which are not sweep axes ex. { 'shape':ObjectShape.FLAT, 'wavelength':[1.0, 'um'] }
+_telescope_size_unit - telescope size unit (default: mm)
+_max_chunk_elements - maximal number of elements evaluated at once, bound memory used by intermediate arrays (default: 2**20)
+_out - optional pair of output arrays with cube shape (ex. numpy.memmap) for telescope sizes and angular sizes
+_store - optional ResultStore (see run_telescope_size_sweep_to_store), blocks are written to store and completed blocks are skipped
+_precision - float64 (default) or float32 (cubes with half size, relative error bounded by CoreNumericalModule.FLOAT32_TOLERANCE)
+@return SweepResult (evaluations - number of parameter combinations evaluated in this run)
+'''
+def run_telescope_size_sweep(_axes, _fixed = None, _telescope_size_unit = 'mm', _max_chunk_elements = 2**20, _out = None, _store = None, _precision = 'float64'):
+    axes = list(_axes)
+    fixed = sweep_parameters(axes, _fixed)
+    HBTWN_CNM.check_precision(_precision)
+    shape = tuple(len(axis) for axis in axes)
+    if _store is not None:
+        telescope_size, angular_size = _store.column('telescope_size'), _store.column('angular_size')
+    elif _out is None:
+        telescope_size = np.empty(shape, dtype=_precision)
+        angular_size = np.empty(shape, dtype=_precision)
+    else:
+        telescope_size, angular_size = _out
+    if telescope_size.shape != shape or angular_size.shape != shape:
+        raise ValueError('Output arrays shape has to be ' + str(shape))
+
+    evaluations = 0
+    start_time = time.perf_counter()
+    for chunk, block in enumerate(plan_blocks(shape, _max_chunk_elements)):
+        if _store is not None and _store.is_completed(chunk):
+            continue
+        index = block_index(block)
+        block_telescope_size, block_angular_size = evaluate_block(axes, fixed, _telescope_size_unit, block, _precision)
+        if _store is None:
+            telescope_size[index], angular_size[index] = block_telescope_size, block_angular_size
+        else:
+            _store.write(chunk, index, { 'telescope_size':block_telescope_size, 'angular_size':block_angular_size })
+        evaluations += block_telescope_size.size
+    elapsed = time.perf_counter() - start_time
+
+    return SweepResult(axes, telescope_size, angular_size, _telescope_size_unit, evaluations, elapsed)
+
+'''
+sweep_inputs_hash - hash of sweep definition (axes, fixed parameters, telescope size unit, blocks plan and precision other than float64)
+'''
+def sweep_inputs_hash(_axes, _fixed, _telescope_size_unit, _max_chunk_elements, _precision = 'float64'):
+    precision = () if _precision == 'float64' else (_precision,)
+    return HBTWN_RSM.inputs_hash(*[ item for axis in _axes for item in (axis.name, axis.unit, axis.values) ], { name:str(value) for name, value in _fixed.items() }, _telescope_size_unit, int(_max_chunk_elements), *precision)
+
+'''
+run_telescope_size_sweep_to_store - calculate sweep into persistent result store (memory mapped columns telescope_size and angular_size)
+Every completed block is marked in store, interrupted sweep started again with the same definition skips completed blocks.
+_path - result store directory
+_axes, _fixed, _telescope_size_unit, _max_chunk_elements, _precision - sweep definition (see run_telescope_size_sweep), columns dtype is _precision
+_resume - continue existing store (default: True), store created for other sweep definition raises ValueError
+@return SweepResult with memory mapped cubes
+'''
+def run_telescope_size_sweep_to_store(_path, _axes, _fixed = None, _telescope_size_unit = 'mm', _max_chunk_elements = 2**20, _resume = True, _precision = 'float64'):
+    axes = list(_axes)
+    fixed = sweep_parameters(axes, _fixed)
+    HBTWN_UCM.DIST_UNITS.code(_telescope_size_unit)
+    HBTWN_CNM.check_precision(_precision)
+    sweep_hash = sweep_inputs_hash(axes, fixed, _telescope_size_unit, _max_chunk_elements, _precision)
+    if _resume and HBTWN_RSM.exists(_path):
+        store = HBTWN_RSM.open_store(_path, 'r+', sweep_hash)
+    else:
+        shape = tuple(len(axis) for axis in axes)
+        store = HBTWN_RSM.create_store(_path, { 'telescope_size':(_precision, _telescope_size_unit), 'angular_size':(_precision, 'arcsec') }, shape,
+                                       [ [ axis.name, axis.values, axis.unit ] for axis in axes ], sweep_hash, len(plan_blocks(shape, _max_chunk_elements)),
+                                       { 'kind':'telescope_size_sweep', 'fixed':fixed, 'max_chunk_elements':int(_max_chunk_elements) }, _overwrite=True)
+    return run_telescope_size_sweep(axes, _fixed, _telescope_size_unit, _max_chunk_elements, _store=store, _precision=_precision)
+
+'''
+load_sweep_result - open sweep stored by run_telescope_size_sweep_to_store without loading cubes (slices are read from disk)
+_path - result store directory
+@return SweepResult with read only memory mapped cubes (cube values of not completed blocks are undefined)
+'''
+def load_sweep_result(_path):
+    store = HBTWN_RSM.open_store(_path)
+    axes = [ SweepAxis(axis['name'], store.axis(axis['name'])[0], axis['unit']) for axis in store.header['axes'] ]
+    return SweepResult(axes, store.column('telescope_size'), store.column('angular_size'), store.unit('telescope_size'), int(np.prod(store.shape, dtype=np.int64)), 0.0)
@@ -0,0 +1,126 @@
+#!/bin/python3
+
+'''
+HBTWN - TelescopeDatabaseModule
+Module storage predefined telescopes database with resolution tables precomputed for standard wavelengths.
+HBTWN TelescopeDatabaseModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import numpy as np
+
+# Project modules
+import modules.UnitsConstantsModule as HBTWN_UCM
+import modules.CoreNumericalModule as HBTWN_CNM
+import modules.StatusModule as HBTWN_STM
+
+'''
+PREDEFINED_TELESCOPES - predefined telescopes: (name, [ aperture, unit ])
+'''
+PREDEFINED_TELESCOPES = [
+    ('Telescope 5"', [ 5.0, 'inch' ]),
+    ('Telescope 8"', [ 8.0, 'inch' ]),
+    ('Telescope 10"', [ 10.0, 'inch' ]),
+    ('Telescope 16"', [ 16.0, 'inch' ]),
+    ('Telescope 20"', [ 20.0, 'inch' ]),
+    ('Telescope 24"', [ 24.0, 'inch' ]),
+    ('Telescope 1m', [ 1.0, 'm' ]),
+    ('Hubble Space Telescope', [ 2.4, 'm' ]),
+    ('Very Large Telescope (single unit)', [ 8.2, 'm' ]),
+    ('James Webb Space Telescope', [ 6.5, 'm' ]),
+    ('Keck', [ 10.0, 'm' ]),
+    ('Gran Telescopio Canarias', [ 10.4, 'm' ]),
+    ('Giant Magellan Telescope', [ 24.5, 'm' ]),
+    ('Thirty Meter Telescope', [ 30.0, 'm' ]),
+    ('Extremely Large Telescope', [ 39.3, 'm' ]),
+]
+
+'''
+STANDARD_WAVELENGTHS - standard wavelengths (photometric bands) with precomputed resolution tables: name:[ wavelength, unit ]
+'''
+STANDARD_WAVELENGTHS = {
+    'U':[ 365.0, 'nm' ],
+    'B':[ 445.0, 'nm' ],
+    'green':[ 522.0, 'nm' ],
+    'V':[ 551.0, 'nm' ],
+    'R':[ 658.0, 'nm' ],
+    'I':[ 806.0, 'nm' ],
+    'J':[ 1.22, 'um' ],
+    'H':[ 1.63, 'um' ],
+    'K':[ 2.19, 'um' ],
+}
+
+'''
+TelescopeDatabase - predefined telescopes database, telescopes are kept in arrays sorted by aperture
+_telescopes - list of telescopes: (name, [ aperture, unit ]) (default: PREDEFINED_TELESCOPES)
+_wavelengths - dictionary name:[ wavelength, unit ] with precomputed resolution tables (default: STANDARD_WAVELENGTHS)
+Wavelength arguments are standard wavelength name or [ wavelength, unit ], tables for other wavelengths are computed once and cached.
+Fields:
+names - telescopes names sorted by aperture
+apertures_m - telescopes apertures in [m] sorted ascending
+Methods:
+telescope - return telescope name and aperture [ aperture, unit ] for index
+resolution_table - return resolutions of all telescopes for wavelength as array: [ resolutions, arcsec ]
+smallest_resolving - smallest telescope which resolves required angular resolution [ angle, unit ], return index or -1
+smallest_resolving_batch - smallest_resolving for array of required angular resolutions, return array of indices (-1 if no telescope resolves, NaN, infinite and non-positive requirements give -1)
+smallest_resolving_object - smallest telescope which resolves object [ size, unit ] at [ distance, unit ] with number of pixels, return index or -1
+smallest_resolving_objects_batch - smallest_resolving_object for arrays of objects, return array of indices (-1 if no telescope resolves)
+'''
+class TelescopeDatabase:
+    def __init__(self, _telescopes = PREDEFINED_TELESCOPES, _wavelengths = STANDARD_WAVELENGTHS):
+        names = [ name for name, aperture in _telescopes ]
+        apertures_m = np.array([ HBTWN_UCM.DIST_UNITS.convert(np.float64(aperture[0]), aperture[1], 'm') for name, aperture in _telescopes ], dtype=np.float64)
+        order = np.argsort(apertures_m, kind='stable')
+        self.names = np.array(names, dtype=object)[order]
+        self.apertures_m = apertures_m[order]
+        self.apertures_m.flags.writeable = False
+        self._wavelengths = dict(_wavelengths)
+        self._tables = {}
+        for wavelength in self._wavelengths.values():
+            self._table(wavelength)
+
+    def __len__(self):
+        return len(self.names)
+
+    def telescope(self, _index, _unit = 'm'):
+        return self.names[_index], [ HBTWN_UCM.DIST_UNITS.convert(self.apertures_m[_index], 'm', _unit), _unit ]
+
+    def resolution_table(self, _wavelength = 'green'):
+        # Table is kept in ascending resolution order (descending aperture), reverse it back to apertures order
+        return [ self._table(_wavelength)[::-1], 'arcsec' ]
+
+    def smallest_resolving(self, _angular_resolution, _wavelength = 'green'):
+        return int(self.smallest_resolving_batch([ [ _angular_resolution[0] ], _angular_resolution[1] ], _wavelength)[0])
+
+    def smallest_resolving_batch(self, _angular_resolutions, _wavelength = 'green'):
+        required_arcsec = HBTWN_UCM.ANGLE_UNITS.convert_array(_angular_resolutions[0], _angular_resolutions[1], 'arcsec')
+        table = self._table(_wavelength)
+        # table is sorted ascending, number of telescopes with resolution <= required is found by binary search,
+        # they are the largest apertures, so the smallest of them has index len - count in apertures order
+        count = np.searchsorted(table, required_arcsec, side='right')
+        # NaN is sorted after all resolutions, not finite and non-positive requirements are not resolved by any telescope
+        with np.errstate(invalid='ignore'):
+            valid = np.isfinite(required_arcsec) & (required_arcsec > 0.0)
+        return np.where(valid & (count > 0), len(table) - count, -1)
+
+    def smallest_resolving_object(self, _target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 1, _wavelength = 'green'):
+        return int(self.smallest_resolving_objects_batch([ [ _target_obj_physical_size[0] ], _target_obj_physical_size[1] ], [ [ _target_obj_physical_dist[0] ], _target_obj_physical_dist[1] ], _object_shape, _number_of_pixels, _wavelength)[0])
+
+    def smallest_resolving_objects_batch(self, _target_obj_physical_size, _target_obj_physical_dist, _object_shape = HBTWN_UCM.ObjectShape.SPHERICAL, _number_of_pixels = 1, _wavelength = 'green'):
+        # Required resolution is angular size of single pixel of object image
+        size_m = HBTWN_UCM.DIST_UNITS.convert_array(_target_obj_physical_size[0], _target_obj_physical_size[1], 'm')
+        size_scaled_m = size_m*(1.0/np.asarray(_number_of_pixels, dtype=np.float64))
+        angular_size = HBTWN_CNM.calculate_angular_size_batch([ size_scaled_m, 'm' ], _target_obj_physical_dist, _object_shape, 'arcsec', _strict=HBTWN_STM.UNIT_ERRORS)
+        return self.smallest_resolving_batch(angular_size, _wavelength)
+
+    def _table(self, _wavelength):
+        wavelength = self._wavelengths.get(_wavelength, _wavelength) if isinstance(_wavelength, str) else _wavelength
+        if isinstance(wavelength, str):
+            raise ValueError('Unknown standard wavelength: ' + repr(wavelength))
+        key = float(HBTWN_UCM.DIST_UNITS.convert(np.float64(wavelength[0]), wavelength[1], 'm'))
+        table = self._tables.get(key)
+        if table is None:
+            resolutions = HBTWN_CNM.calculate_telescope_resolution_batch([ self.apertures_m, 'm' ], [ key, 'm' ], 'arcsec')[0]
+            table = np.ascontiguousarray(resolutions[::-1])
+            table.flags.writeable = False
+            self._tables[key] = table
+        return table
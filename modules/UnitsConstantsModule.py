@@ -8,8 +8,17 @@ HBTWN UnitsConstantsModule  Copyright (C) 2021  Jan Bielański
 
 # 3-RD party dependency
 import numpy as np
+import logging
 from enum import Enum
 
+# Project modules
+import modules.UnitsTablesModule as HBTWN_UTM
+
+'''
+LOGGER - module logger, legacy scalar functions report failures as warnings (nothing is written to stdout)
+'''
+LOGGER = logging.getLogger(__name__)
+
 '''
 ObjectShape - object shape type, storage three values:
 UNDEFINED - unknowt object type (usage if some errors happened)
@@ -31,23 +40,251 @@ class ObjectShape(Enum):
     def __int__(self):
         return self.value
 
+'''
+object_shape_codes - convert object shapes to array of ObjectShape numerical values
+_shapes - ObjectShape, numerical value, name (FLAT/SPHERICAL/UNDEFINED) or array of them
+@return NumPy integer array with ObjectShape numerical values, unknown names are UNDEFINED (-1)
+'''
+def object_shape_codes(_shapes):
+    shapes = np.asarray(_shapes)
+    if shapes.dtype.kind in 'iuf':
+        return shapes.astype(np.int64)
+    names, inverse = np.unique(shapes.astype(str), return_inverse=True)
+    values = np.array([ _object_shape_value(name) for name in names ], dtype=np.int64)
+    return values[inverse].reshape(shapes.shape)
+
+def _object_shape_value(_name):
+    name = str(_name).strip().upper()
+    for shape in ObjectShape:
+        if name == shape.name or name == str(shape).upper() or name == str(shape.value):
+            return shape.value
+    return ObjectShape.UNDEFINED.value
+
+'''
+UnsupportedUnitError - exception raised by unit registry when unit symbol or unit code is unknown (defined in UnitsTablesModule)
+'''
+UnsupportedUnitError = HBTWN_UTM.UnsupportedUnitError
+
+'''
+UnitRegistry - precompiled units table, created once on module import
+_name - registry name (ex. distance)
+_units - list of pairs: (unit symbol, scale to registry base unit)
+Fields:
+symbols - tuple with units symbols, index of symbol is unit code
+scales - NumPy array with units scales (indexed by unit code, code -1 gives NaN)
+factors - pairwise conversion factor matrix: factors[input code, output code]
+Methods:
+code - return unit code for unit symbol (raise UnsupportedUnitError)
+codes - return NumPy array with unit codes for array of symbols/codes (unknown units raise UnsupportedUnitError or give -1 if _strict is False)
+factor - return conversion factor between two units
+convert - fast scalar path, convert value from input unit to output unit (raise UnsupportedUnitError)
+convert_array - vectorized path, convert array of values with array of units codes (or single unit symbols)
+scales_of - scales of units (symbol, array of symbols or codes) to registry base unit, unknown units raise UnsupportedUnitError or give NaN if _strict is False
+'''
+class UnitRegistry:
+    def __init__(self, _name, _units):
+        self.name = _name
+        self.symbols = tuple(symbol for symbol, scale in _units)
+        self._codes = { symbol:code for code, symbol in enumerate(self.symbols) }
+        self._scales = { symbol:np.float64(scale) for symbol, scale in _units }
+        # Additional NaN scale at the end, unknown unit code -1 converts to NaN
+        self.scales = np.array([ scale for symbol, scale in _units ] + [ np.nan ], dtype=np.float64)
+        self.factors = self.scales[:-1, np.newaxis]/self.scales[np.newaxis, :-1]
+        self.scales.flags.writeable = False
+        self.factors.flags.writeable = False
+
+    def __contains__(self, _unit):
+        return _unit in self._codes
+
+    def code(self, _unit):
+        try:
+            return self._codes[_unit]
+        except KeyError:
+            raise UnsupportedUnitError(_unit, self.name) from None
+
+    def codes(self, _units, _strict = True):
+        units = np.asarray(_units)
+        if units.dtype.kind in 'iu':
+            codes = units.astype(np.intp)
+            unknown = (codes < 0) | (codes >= len(self.symbols))
+        else:
+            symbols, inverse = np.unique(units.astype(str), return_inverse=True)
+            codes = np.array([ self._codes.get(symbol, -1) for symbol in symbols ], dtype=np.intp)[inverse].reshape(units.shape)
+            unknown = codes < 0
+        if np.any(unknown):
+            if _strict:
+                raise UnsupportedUnitError(units[unknown].flat[0], self.name)
+            codes = np.where(unknown, -1, codes)
+        return codes
+
+    def factor(self, _input_unit, _output_unit):
+        return self.factors[self.code(_input_unit), self.code(_output_unit)]
+
+    def convert(self, _input_value, _input_unit, _output_unit):
+        try:
+            a_scale = self._scales[_input_unit]
+            b_scale = self._scales[_output_unit]
+        except KeyError as e:
+            raise UnsupportedUnitError(e.args[0], self.name) from None
+        return (_input_value*a_scale)/b_scale
+
+    def convert_array(self, _input_values, _input_units, _output_units):
+        if isinstance(_input_units, str) and isinstance(_output_units, str):
+            return self.convert(np.asarray(_input_values, dtype=np.float64), _input_units, _output_units)
+        a_scale = self.scales_of(_input_units)
+        b_scale = self.scales_of(_output_units)
+        return (np.asarray(_input_values, dtype=np.float64)*a_scale)/b_scale
+
+    def scales_of(self, _units, _strict = True):
+        if isinstance(_units, str):
+            if not _strict and _units not in self._codes:
+                return self.scales[-1]
+            return self.scales[self.code(_units)]
+        units = np.asarray(_units)
+        if units.dtype.kind in 'iu':
+            if not _strict:
+                units = np.where((units >= 0) & (units < len(self.symbols)), units, -1)
+            # Unit codes are used directly, code -1 gives NaN
+            return self.scales[units]
+        return self.scales[self.codes(units, _strict)]
+
+
+'''
+Registries are compiled from UnitsTablesModule tables:
+DIST_UNITS - distance units registry (base unit [m]): m/cm/mm/um/nm/km/inch/au/ly/pc
+ANGLE_UNITS - angle units registry (base unit [deg]): deg/amin/arcmin/am/MOA/asec/arcsec/as/mas/uas/rad
+TIME_UNITS - time units registry (base unit [s]): s/ms/us/min/h/d
+'''
+DIST_UNITS = UnitRegistry('distance', HBTWN_UTM.DIST_UNITS_TABLE)
+ANGLE_UNITS = UnitRegistry('angle', HBTWN_UTM.ANGLE_UNITS_TABLE)
+TIME_UNITS = UnitRegistry('time', HBTWN_UTM.TIME_UNITS_TABLE)
+
+'''
+UNIT_REGISTRIES - unit symbol:registry for all registries (units symbols are unique between registries)
+registry_of - return registry of unit symbol (raise UnsupportedUnitError)
+'''
+UNIT_REGISTRIES = { symbol:registry for registry in (DIST_UNITS, ANGLE_UNITS, TIME_UNITS) for symbol in registry.symbols }
+
+def registry_of(_unit):
+    try:
+        return UNIT_REGISTRIES[_unit]
+    except (KeyError, TypeError):
+        raise UnsupportedUnitError(_unit) from None
+
+'''
+Quantity - compact scalar quantity (value and unit symbol), replacement of [ value, unit ] list
+Quantity behaves like two elements sequence: quantity[0] is value, quantity[1] is unit, so legacy code works without changes.
+NumPy scalars are stored as Python numbers (no boxed np.float64).
+_value - value
+_unit - unit symbol
+Methods:
+to - convert to other unit of the same registry
+'''
+class Quantity:
+    __slots__ = ('value', 'unit')
+    def __init__(self, _value, _unit):
+        self.value = float(_value) if type(_value) is np.float64 else _value.item() if isinstance(_value, np.generic) else _value
+        self.unit = _unit
+    def __len__(self):
+        return 2
+    def __getitem__(self, _index):
+        return (self.value, self.unit)[_index]
+    def __iter__(self):
+        yield self.value
+        yield self.unit
+    def __eq__(self, _other):
+        try:
+            return len(_other) == 2 and self.value == _other[0] and self.unit == _other[1]
+        except TypeError:
+            return NotImplemented
+    __hash__ = None
+    def __repr__(self):
+        return repr([ self.value, self.unit ])
+    def to(self, _unit):
+        return Quantity(registry_of(self.unit).convert(self.value, self.unit, _unit), _unit)
+
+'''
+QuantityArray - columnar quantity: float64 values buffer and unit code of registry, replacement of [ values, unit ] list for batches
+QuantityArray behaves like two elements sequence (values, unit symbol) and like NumPy array (np.asarray gives values without copy).
+_values - values (float64 arrays are used without copy, float32 arrays of float32 precision mode are kept as float32)
+_unit - unit symbol
+_registry - units registry (default: registry of unit symbol), unknown unit of given registry gives code -1 (unit None)
+Fields:
+values - float64 (or float32) values array
+code - unit code in registry
+registry - units registry
+Methods:
+unit - unit symbol (property)
+to - convert to other unit of the same registry
+quantity - single element as Quantity
+'''
+class QuantityArray:
+    __slots__ = ('values', 'code', 'registry')
+    def __init__(self, _values, _unit, _registry = None):
+        values = np.asarray(_values)
+        self.values = values if values.dtype == np.float32 else np.asarray(values, dtype=np.float64)
+        self.registry = _registry if _registry is not None else registry_of(_unit)
+        self.code = int(_unit) if isinstance(_unit, (int, np.integer)) else self.registry._codes.get(_unit, -1)
+    @property
+    def unit(self):
+        return self.registry.symbols[self.code] if self.code >= 0 else None
+    @property
+    def shape(self):
+        return self.values.shape
+    @property
+    def size(self):
+        return self.values.size
+    def __len__(self):
+        return 2
+    def __getitem__(self, _index):
+        return (self.values, self.unit)[_index]
+    def __iter__(self):
+        yield self.values
+        yield self.unit
+    def __array__(self, dtype = None, copy = None):
+        return self.values if dtype is None else self.values.astype(dtype, copy=bool(copy))
+    def __repr__(self):
+        return 'QuantityArray(' + repr(self.values) + ', ' + repr(self.unit) + ')'
+    def to(self, _unit):
+        return QuantityArray(self.registry.convert(self.values, self.unit, _unit), _unit, self.registry)
+    def quantity(self, _index):
+        return Quantity(self.values[_index], self.unit)
+
+'''
+quantity_records - export columns to NumPy structured array (one record per element)
+_columns - dictionary name:column, column is QuantityArray, Quantity, [ values, unit ] or plain array (ex. status array)
+@return structured array, quantities are float64 fields, units are stored in dtype.metadata['units'] (name:unit)
+'''
+def quantity_records(_columns):
+    names, arrays, units = [], [], {}
+    for name, column in _columns.items():
+        if isinstance(column, (Quantity, QuantityArray)) or (isinstance(column, (list, tuple)) and len(column) == 2 and isinstance(column[1], str)):
+            arrays.append(np.asarray(column[0], dtype=np.float64))
+            units[name] = column[1]
+        else:
+            arrays.append(np.asarray(column))
+        names.append(name)
+    arrays = np.broadcast_arrays(*arrays)
+    dtype = np.dtype([ (name, array.dtype) for name, array in zip(names, arrays) ], metadata={ 'units':units })
+    records = np.empty(arrays[0].shape if arrays else (), dtype=dtype)
+    for name, array in zip(names, arrays):
+        records[name] = array
+    return records
+
 '''
 dist_units_converter - convert distance value in selected units to other unit (default unit in function is [m])
 _input_value - value as number ex. _input_value = 66.6
 _input_unit - one of the unit symbol: m/cm/mm/um/nm/km/inch/au/ly/pc if it wrong the function return None, ex. _input_unit = 'ly'
 _output_unit - one of the unit symbol: m/cm/mm/um/nm/km/inch/au/ly/pc if it wrong the function return None, ex. _input_unit = 'pc'
-@return return array with calculated value and unit as array
+@return return Quantity with calculated value and unit (behaves like array [ value, unit ]), [None, None] on failure
 '''
 def dist_units_converter(_input_value, _input_unit, _output_unit):
-    dist_units_conversion = dict([('m',np.float64(1.0)),('cm',np.float64(0.01)),('mm',np.float64(0.001)),('um',np.float64(0.000001)),('nm',np.float64(0.000000001)),('km',np.float64(1000.0)),('inch',np.float64(0.0254)),('au',np.float64(149597870700.0)),('ly',np.float64(149597870700.0*63241.0)),('pc',np.float64(149597870700.0*206264.8))])
-    a_scale = dist_units_conversion.get(_input_unit)
-    b_scale = dist_units_conversion.get(_output_unit)
     try:
-        res = (_input_value*a_scale)/b_scale
-    except TypeError as e:
-        print('Unsupported UNIT symbol!!!')
+        res = DIST_UNITS.convert(_input_value, _input_unit, _output_unit)
+    except (UnsupportedUnitError, TypeError) as e:
+        LOGGER.warning('Unsupported UNIT symbol!!!')
         return [None, None]
-    return [res, _output_unit]
+    return Quantity(res, _output_unit)
 
 
 '''
@@ -55,15 +292,12 @@ angle_units_converter - convert angle value in selected units to other unit (def
 _input_value - value as number ex. _input_value = 66.6
 _input_unit - one of the unit symbol: deg/amin/arcmin/am/MOA/asec/arcsec/as/mas/uas/rad if it wrong the function return None, ex. _input_unit = 'rad'
 _output_unit - one of the unit symbol: deg/amin/arcmin/am/MOA/asec/arcsec/as/mas/uas/rad if it wrong the function return None, ex. _input_unit = 'deg'
-@return return array with calculated value and unit as array
+@return return Quantity with calculated value and unit (behaves like array [ value, unit ]), [None, None] on failure
 '''
 def angle_units_converter(_input_value, _input_unit, _output_unit):
-    angle_units_conversion = dict([('deg',np.float64(1.0)),('amin',np.float64(1.0/60.0)),('arcmin',np.float64(1.0/60.0)),('am',np.float64(1.0/60.0)),('MOA',np.float64(1.0/60.0)),('asec',np.float64(1.0/3600.0)),('arcsec',np.float64(1.0/3600.0)),('as',np.float64(1.0/3600.0)),('mas',np.float64(1.0/3600000.0)),('uas',np.float64(1.0/3600000000.0)),('rad',np.float64(180.0/np.pi))])
-    a_scale = angle_units_conversion.get(_input_unit)
-    b_scale = angle_units_conversion.get(_output_unit)
     try:
-        res = (_input_value*a_scale)/b_scale
-    except TypeError as e:
-        print('Unsupported UNIT symbol!!!')
+        res = ANGLE_UNITS.convert(_input_value, _input_unit, _output_unit)
+    except (UnsupportedUnitError, TypeError) as e:
+        LOGGER.warning('Unsupported UNIT symbol!!!')
         return [None, None]
-    return [res, _output_unit]
+    return Quantity(res, _output_unit)
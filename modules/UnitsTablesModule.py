@@ -0,0 +1,54 @@
+#!/bin/python3
+
+'''
+HBTWN - UnitsTablesModule
+Module storage units tables (unit symbol, scale to base unit) without any 3-RD party dependency.
+Tables are used by UnitsConstantsModule registries and by pure Python scalar path (ScalarMathModule), so command line queries
+do not import NumPy.
+HBTWN UnitsTablesModule  Copyright (C) 2021  Jan Bielański
+'''
+# 3-RD party dependency
+import math
+
+'''
+UnsupportedUnitError - exception raised when unit symbol or unit code is unknown (also available as UnitsConstantsModule.UnsupportedUnitError)
+'''
+class UnsupportedUnitError(ValueError):
+    def __init__(self, _unit, _registry_name = ''):
+        self.unit = _unit
+        self.registry_name = _registry_name
+        super().__init__('Unsupported ' + str(_registry_name) + ' UNIT symbol: ' + repr(_unit))
+
+'''
+DIST_UNITS_TABLE - distance units (base unit [m]): m/cm/mm/um/nm/km/inch/au/ly/pc
+ANGLE_UNITS_TABLE - angle units (base unit [deg]): deg/amin/arcmin/am/MOA/asec/arcsec/as/mas/uas/rad
+TIME_UNITS_TABLE - time units (base unit [s]): s/ms/us/min/h/d
+'''
+DIST_UNITS_TABLE = (('m',1.0),('cm',0.01),('mm',0.001),('um',0.000001),('nm',0.000000001),('km',1000.0),('inch',0.0254),('au',149597870700.0),('ly',149597870700.0*63241.0),('pc',149597870700.0*206264.8))
+ANGLE_UNITS_TABLE = (('deg',1.0),('amin',1.0/60.0),('arcmin',1.0/60.0),('am',1.0/60.0),('MOA',1.0/60.0),('asec',1.0/3600.0),('arcsec',1.0/3600.0),('as',1.0/3600.0),('mas',1.0/3600000.0),('uas',1.0/3600000000.0),('rad',180.0/math.pi))
+TIME_UNITS_TABLE = (('s',1.0),('ms',0.001),('us',0.000001),('min',60.0),('h',3600.0),('d',86400.0))
+
+'''
+DIST_SCALES / ANGLE_SCALES / TIME_SCALES - dictionaries unit symbol:scale to base unit
+'''
+DIST_SCALES = dict(DIST_UNITS_TABLE)
+ANGLE_SCALES = dict(ANGLE_UNITS_TABLE)
+TIME_SCALES = dict(TIME_UNITS_TABLE)
+
+'''
+convert - convert scalar value between units of single table, the same formula as UnitRegistry.convert: (value * a_scale) / b_scale
+_scales - scales dictionary (ex. DIST_SCALES)
+_registry_name - registry name used in error message
+@return converted value, raise UnsupportedUnitError for unknown unit
+'''
+def convert(_scales, _registry_name, _input_value, _input_unit, _output_unit):
+    return (_input_value*scale_of(_scales, _registry_name, _input_unit))/scale_of(_scales, _registry_name, _output_unit)
+
+'''
+scale_of - scale of unit to base unit, raise UnsupportedUnitError for unknown unit
+'''
+def scale_of(_scales, _registry_name, _unit):
+    try:
+        return _scales[_unit]
+    except (KeyError, TypeError):
+        raise UnsupportedUnitError(_unit, _registry_name) from None